@@ -2,6 +2,10 @@ import sqlite3
 import os
 import shutil
 import sys
+from db import get_connection
+from encoding_cache import EncodingCache
+from face_registry import store_cached_encoding
+from photo_variants import create_variants
 
 DB_NAME = 'facebeam.db'
 KNOWN_FACES_DIR = 'known_faces'
@@ -42,7 +46,7 @@ def register_new_student():
         print(f"✅ Photo successfully copied to '{destination_path}'.")
 
         # 3. Add student details to the database
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection(DB_NAME)
         cursor = conn.cursor()
         
         # NOTE: We use student_id = roll_number, but you can change this
@@ -53,10 +57,23 @@ def register_new_student():
             (full_name, image_filename, student_id_from_user, section, year, roll_number, branch, college_id)
         )
         conn.commit()
-        conn.close()
         
         print(f"\n✅ Student '{full_name}' successfully added to the database!")
 
+        # 4. Encode the new photo now so recognize.py picks it up from the cache, and store the
+        #    encoding in the registry so edge devices syncing from /api/gallery get it too
+        try:
+            encoding_cache = EncodingCache(KNOWN_FACES_DIR)
+            if encoding_cache.update_file(image_filename):
+                print(f"✅ Face encoding for '{full_name}' added to the encoding cache.")
+            if store_cached_encoding(conn, encoding_cache, image_filename):
+                conn.commit()
+        except Exception as e:
+            print(f"⚠️ Warning: Could not store the face encoding ({e}). "
+                  f"Run 'python face_registry.py --sync' to encode and register it.")
+        # 5. Resized copies for the web dashboards
+        create_variants(KNOWN_FACES_DIR, image_filename)
+
     except sqlite3.IntegrityError:
         print(f"\n❌ Database Error: A student with that Name or Student ID may already exist.")
     except Exception as e:
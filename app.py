@@ -1,38 +1,167 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for, send_from_directory
+from flask import Flask, Response, abort, g, render_template, jsonify, request, redirect, url_for, send_file
+from werkzeug.security import safe_join
 import sqlite3
+import db
+from db import get_connection
 import os
 import base64
+import json
+import threading
+import time
 from collections import defaultdict
+from concurrent.futures import TimeoutError as WriteTimeout
 from datetime import datetime
+from encoding_cache import EncodingCache, extra_photos
+from face_registry import gallery_version, pack_gallery, remove_encodings, store_cached_encoding, PAYLOAD_DTYPES
+from attendance_summary import attendance_percentage as get_attendance_percentage
+from attendance_writer import AttendanceWriter, INSERT_ATTENDANCE, WRITE_TIMEOUT_SECONDS
+from live_dashboard import LiveDashboard
+from metrics import MetricsRegistry, PROMETHEUS_CONTENT_TYPE
+from photo_variants import create_variants, get_variant, remove_variants, PHOTO_VARIANTS
+from profiler import SamplingProfiler
+from schedule import Schedule
+from student_directory import StudentDirectory, DEFAULT_PAGE_SIZE, FILTER_COLUMNS
 
 app = Flask(__name__, template_folder='webapp/templates')
 DB_NAME = 'facebeam.db'
 KNOWN_FACES_DIR = 'known_faces'
+MAX_BATCH_SIZE = 1000
+# Full gallery payloads already built for the current gallery version, keyed by dtype
+gallery_payloads = {}
+# Held from loading the encoding cache to saving it, so two registrations handled at once
+# can't each save their own copy and drop the other's new photo
+encoding_cache_lock = threading.Lock()
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Photo URLs from photo_url() carry the photo's mtime, so browsers may keep them for a year;
+# a bare /student_photo URL is revalidated after a minute (a 304 when unchanged)
+PHOTO_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+PHOTO_MAX_AGE = 60
+
+# Route and SQLite query latency histograms, served in the Prometheus text format at /metrics.
+# Set up before anything opens a database connection, so every pooled connection is timed.
+metrics = MetricsRegistry()
+request_seconds = metrics.histogram('http_request_duration_seconds', "Time to answer a request, by route.",
+                                    ('method', 'route', 'status'))
+query_seconds = metrics.histogram('db_query_duration_seconds', "Time to execute a SQLite statement, by statement.",
+                                  ('query',))
+db.set_query_observer(lambda sql, seconds: query_seconds.observe(seconds, query=db.statement_label(sql)))
+metrics.gauge_callback('attendance_group_commits_total', "Transactions committed by the attendance writer.",
+                       lambda: attendance_writer.groups, kind='counter')
+metrics.gauge_callback('attendance_group_commit_events_total', "Events inserted by the attendance writer.",
+                       lambda: attendance_writer.events, kind='counter')
+metrics.gauge_callback('student_list_cache_hits_total', "/api/students pages served from memory.",
+                       lambda: student_directory.hits, kind='counter')
+metrics.gauge_callback('student_list_cache_misses_total', "/api/students pages read from the database.",
+                       lambda: student_directory.misses, kind='counter')
+metrics.gauge_callback('live_dashboard_subscribers', "Browsers connected to the live dashboard stream.",
+                       lambda: len(live_dashboard.subscribers))
+# Opt-in: /debug/profile?seconds=N samples the running server's threads, from localhost only
+PROFILER_ENABLED = False
+profiler = SamplingProfiler()
+
+# The timetable, held in memory and reloaded only when it changes (see schedule.py)
+schedule = Schedule(DB_NAME)
+# Current class and present/absent sets for the admin dashboard, kept in memory and
+# pushed to browsers over Server-Sent Events (see live_dashboard.py)
+live_dashboard = LiveDashboard(DB_NAME, schedule)
+# Single attendance events are inserted by one writer thread in group commits of
+# whatever arrived within a few milliseconds (see attendance_writer.py)
+GROUP_COMMIT = True
+attendance_writer = AttendanceWriter(DB_NAME, on_commit=live_dashboard.record_attendance)
+# Pages of /api/students, cached until the students table changes (see student_directory.py)
+student_directory = StudentDirectory(DB_NAME)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # The route pattern, not the URL, so /student/<student_name> is one series rather than one per student
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.observe(time.perf_counter() - started,
+                                method=request.method, route=route, status=response.status_code)
+    return response
+
+# Routes borrow a pooled, WAL-tuned connection (see db.py) instead of opening and closing
+# their own; here it is rolled back if a failed request left it open and returned to the pool,
+# so the dev server's thread-per-request still reuses connections.
+@app.teardown_appcontext
+def release_db_connection(exception):
+    db.release(DB_NAME)
 
 # Route for the homepage
 @app.route('/')
 def index():
     return render_template('index.html')
 
-# API endpoint to fetch the list of all registered students
+# API endpoint to list registered students, a page at a time
 @app.route('/api/students')
 def api_students():
-    student_names = []
+    """
+    One page of students in name order: {"students": [...], "next_cursor": ..., "version": ...}.
+    ?q= matches the start of a name, roll number or college ID; ?branch=, ?section= and
+    ?year= filter; ?cursor= is the next_cursor of the previous page; ?limit= is the page size.
+    """
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM students ORDER BY name")
-        rows = cursor.fetchall()
-        conn.close()
-        student_names = [row[0] for row in rows]
+        body, etag = student_directory.page(
+            search=request.args.get('q'),
+            filters={column: request.args.get(column) for column in FILTER_COLUMNS},
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except sqlite3.Error as e:
         print(f"Database error fetching student list: {e}")
-    return jsonify(student_names)
+        return jsonify({"status": "error", "message": "Could not load students."}), 500
 
-# Route to serve a specific student's photo
+    # The ETag changes with the page's content, so browsers revalidate and usually get a 304
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype='application/json', headers=headers)
+
+# Route to serve a specific student's photo, optionally resized (?size=thumb or ?size=dashboard).
+# Resized copies are made once and kept in photo_variants/ (see photo_variants.py).
 @app.route('/student_photo/<filename>')
 def student_photo(filename):
-    return send_from_directory(KNOWN_FACES_DIR, filename)
+    source = safe_join(KNOWN_FACES_DIR, filename)
+    if source is None or not os.path.isfile(source):
+        abort(404)
+    size = request.args.get('size')
+    if size is not None and size not in PHOTO_VARIANTS:
+        return f"Unknown size '{size}'. Use one of: {', '.join(PHOTO_VARIANTS)}.", 400
+
+    path = source
+    if size is not None:
+        try:
+            path = get_variant(KNOWN_FACES_DIR, filename, size)
+        except OSError as e:
+            print(f"Error resizing {filename} to '{size}': {e}")
+            abort(404)
+
+    # send_file adds a strong ETag and Last-Modified and answers If-None-Match/If-Modified-Since with a 304
+    versioned = 'v' in request.args
+    response = send_file(os.path.abspath(path), conditional=True, etag=True,
+                         max_age=PHOTO_IMMUTABLE_MAX_AGE if versioned else PHOTO_MAX_AGE)
+    if versioned:
+        response.cache_control.immutable = True
+    return response
+
+@app.template_global()
+def photo_url(filename, size=None):
+    """
+    URL of a student photo, versioned by its modification time so it can be cached for good.
+    Nanoseconds, so a photo replaced within the same second still gets a new URL.
+    """
+    try:
+        version = os.stat(os.path.join(KNOWN_FACES_DIR, filename)).st_mtime_ns
+    except OSError:
+        version = None
+    return url_for('student_photo', filename=filename, size=size, v=version)
 
 # Route for the individual student dashboard (handles GET and POST)
 @app.route('/student/<student_name>', methods=['GET', 'POST'])
@@ -46,8 +175,7 @@ def student_dashboard(student_name):
     attendance_percentage = 0.0
     
     try:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection(DB_NAME)
         cursor = conn.cursor()
 
         # Fetch all subjects for the dropdown
@@ -59,7 +187,7 @@ def student_dashboard(student_name):
             selected_subject = request.form['subject_id']
             selected_date = request.form['date']
             
-            query = "SELECT COUNT(*) FROM attendance WHERE name = ? AND subject_id = ? AND date(timestamp) = ?"
+            query = "SELECT COUNT(*) FROM attendance WHERE name = ? AND subject_id = ? AND date = ?"
             cursor.execute(query, (student_name, selected_subject, selected_date))
             record_count = cursor.fetchone()[0]
             status = 'Present' if record_count > 0 else 'Absent'
@@ -77,22 +205,10 @@ def student_dashboard(student_name):
             }
         
         # CALCULATE OVERALL ATTENDANCE PERCENTAGE
-        cursor.execute("SELECT COUNT(DISTINCT date(timestamp)) FROM attendance")
-        total_days_with_records = cursor.fetchone()[0] or 1
-        
-        cursor.execute("SELECT COUNT(*) FROM timetable")
-        total_scheduled_classes_per_week = cursor.fetchone()[0]
-        
-        total_classes_held = (total_days_with_records / 5) * total_scheduled_classes_per_week
-        if total_classes_held == 0: total_classes_held = 1
-
-        cursor.execute("SELECT COUNT(*) FROM attendance WHERE name = ?", (student_name,))
-        total_attended = cursor.fetchone()[0]
-
-        if total_classes_held > 0:
-            attendance_percentage = round((total_attended / total_classes_held) * 100, 2)
+        # Read from the trigger-maintained summary tables (see attendance_summary.py)
+        # rather than counting over the whole attendance history on every view
+        attendance_percentage = get_attendance_percentage(cursor, student_name)
             
-        conn.close()
     except sqlite3.Error as e:
         print(f"Database error on student dashboard: {e}")
         subjects = []
@@ -108,6 +224,24 @@ def student_dashboard(student_name):
                            attendance_percentage=attendance_percentage)
 
 # --- Student Registration Routes ---
+def update_encoding_cache(filename):
+    """
+    Encodes a freshly registered photo once, here, and stores it in the encoding
+    registry, so edge agents download the encoding instead of the photo.
+    """
+    try:
+        with encoding_cache_lock:
+            encoding_cache = EncodingCache(KNOWN_FACES_DIR)
+            encoding_cache.update_file(filename)
+        conn = get_connection(DB_NAME)
+        if store_cached_encoding(conn, encoding_cache, filename):
+            conn.commit()
+    except ImportError:
+        # face_recognition isn't installed on every server; the edge agent encodes it on next sync
+        print(f"Skipped encoding {filename}: face_recognition is not installed on this server.")
+    except Exception as e:
+        print(f"Error updating encoding cache for {filename}: {e}")
+
 @app.route('/register')
 def register():
     return render_template('register.html')
@@ -135,28 +269,29 @@ def add_student():
         with open(filepath, 'wb') as f:
             f.write(image_bytes)
         
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_connection(DB_NAME)
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO students (name, image_path, student_id, section, year, roll_number, branch, college_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
             (name, filename, student_id, section, year, roll_number, branch, college_id)
         )
         conn.commit()
-        conn.close()
 
     except Exception as e:
         print(f"Error during registration: {e}")
         return "An error occurred during registration.", 500
 
+    live_dashboard.student_added(name)
+    update_encoding_cache(filename)
+    create_variants(KNOWN_FACES_DIR, filename)
+
     return redirect(url_for('student_dashboard', student_name=name))
 
 
 @app.route('/delete_student/<student_name>', methods=['POST'])
 def delete_student(student_name):
-    conn = None 
+    conn = get_connection(DB_NAME)
     try:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row 
         cursor = conn.cursor()
 
         # 1. Find the student in the database first
@@ -170,30 +305,39 @@ def delete_student(student_name):
         student_db_id = student_data['id']
         image_filename = student_data['image_path']
 
-        # 2. Delete the student's image file using the path from the database
+        # 2. Delete the student's image file using the path from the database, plus any extra photos
         filepath = os.path.join(KNOWN_FACES_DIR, image_filename)
         if os.path.exists(filepath):
             os.remove(filepath)
             print(f"Deleted image file: {filepath}")
         else:
             print(f"Warning: Image file not found at {filepath} (might have been deleted previously).")
+        photo_filenames = [image_filename] + extra_photos(KNOWN_FACES_DIR, image_filename)
+        for extra_filename in photo_filenames[1:]:
+            os.remove(os.path.join(KNOWN_FACES_DIR, extra_filename))
+            print(f"Deleted extra photo: {extra_filename}")
 
         # 3. Delete records from the database using the student's ID
         cursor.execute("DELETE FROM attendance WHERE student_db_id = ? OR name = ?", (student_db_id, student_name)) 
         cursor.execute("DELETE FROM students WHERE id = ?", (student_db_id,))
-        
+        remove_encodings(conn, photo_filenames)
+
         conn.commit()
         print(f"Successfully deleted records for student: {student_name} (ID: {student_db_id})")
+        live_dashboard.student_removed(student_name)
 
-        conn.close()
-        conn = None 
+        with encoding_cache_lock:
+            encoding_cache = EncodingCache(KNOWN_FACES_DIR)
+            for photo_filename in photo_filenames:
+                encoding_cache.remove_file(photo_filename)
+        for photo_filename in photo_filenames:
+            remove_variants(photo_filename)
 
         return jsonify({'success': True, 'message': f'Student {student_name} deleted successfully.'})
 
     except Exception as e:
         print(f"Error deleting student '{student_name}': {e}") 
-        if conn:
-            conn.close()
+        conn.rollback()
         return jsonify({'success': False, 'message': f'An error occurred while deleting {student_name}. Check server logs.'}), 500
 
 
@@ -204,89 +348,242 @@ def admin_dashboard():
 
 @app.route('/api/live_class')
 def api_live_class():
-    now = datetime.now()
-    day_of_week = now.weekday()
-    current_time = now.strftime('%H:%M')
-    
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    query = """
-        SELECT s.name as subject_name, t.start_time, t.end_time, t.subject_id
-        FROM timetable t JOIN subjects s ON t.subject_id = s.id
-        WHERE t.day_of_week = ? AND t.start_time <= ? AND t.end_time >= ?
-    """
-    cursor.execute(query, (day_of_week, current_time, current_time))
-    current_class = cursor.fetchone()
-    conn.close()
-    
-    return jsonify(dict(current_class) if current_class else {})
+    return jsonify(schedule.current_class() or {})
 
 @app.route('/api/absentees')
 def api_absentees():
-    now = datetime.now()
-    today_str = now.strftime('%Y-%m-%d')
-    
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    live_class_data = api_live_class().get_json()
-    if not live_class_data:
-        conn.close()
-        return jsonify([])
-
-    cursor.execute("SELECT id FROM subjects WHERE name = ?", (live_class_data['subject_name'],))
-    subject_id_res = cursor.fetchone()
-    if not subject_id_res:
-        conn.close()
-        return jsonify([])
-    subject_id = subject_id_res['id']
+    return jsonify([{'name': name} for name in live_dashboard.snapshot()['absentees']])
 
-    cursor.execute("SELECT name FROM students")
-    all_students = {row['name'] for row in cursor.fetchall()}
+@app.route('/api/live/stream')
+def api_live_stream():
+    """Server-Sent Events feed for the admin dashboard: a snapshot, then deltas as attendance comes in."""
+    return Response(live_dashboard.stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-    query = "SELECT name FROM attendance WHERE subject_id = ? AND date(timestamp) = ?"
-    cursor.execute(query, (subject_id, today_str))
-    present_students = {row['name'] for row in cursor.fetchall()}
 
-    absent_students = sorted(list(all_students - present_students))
-    conn.close()
-    
-    return jsonify([{'name': name} for name in absent_students])
+# --- Edge Gallery Sync ---
+@app.route('/api/gallery')
+def api_gallery():
+    """
+    Known-face encodings for edge agents, as one binary payload (see face_registry.py).
+    ?dtype=float16 halves the size; ?since=<version> returns only what changed after that
+    version. The ETag is the gallery version, so an unchanged gallery costs a 304.
+    """
+    dtype = request.args.get('dtype', 'float32')
+    if dtype not in PAYLOAD_DTYPES:
+        return jsonify({"status": "error", "message": f"dtype must be one of {sorted(PAYLOAD_DTYPES)}"}), 400
+    since = request.args.get('since', type=int)
+
+    conn = get_connection(DB_NAME)
+    version = gallery_version(conn)
+    etag = f'"gallery-{version}-{dtype}"'
+    headers = {'ETag': etag, 'X-Gallery-Version': str(version), 'Cache-Control': 'no-cache'}
+    if etag in request.headers.get('If-None-Match', '') or since == version:
+        return Response(status=304, headers=headers)
+
+    if since is not None and since < version:
+        version, payload = pack_gallery(conn, since=since, dtype=dtype)
+    else:
+        # A device that has never synced (or is ahead of a restored database) gets everything;
+        # that payload is the same for every device, so it is built once per version
+        cached = gallery_payloads.get(dtype)
+        if cached is None or cached[0] != version:
+            cached = gallery_payloads[dtype] = pack_gallery(conn, dtype=dtype)
+        version, payload = cached
+    headers.update({'ETag': f'"gallery-{version}-{dtype}"', 'X-Gallery-Version': str(version)})
+    return Response(payload, mimetype='application/octet-stream', headers=headers)
 
 
 # --- NEW: Cloud Receiver API Endpoint ---
 @app.route('/api/log_attendance', methods=['POST'])
 def receive_attendance():
     """Receives attendance logs from the edge device over HTTP POST requests."""
-    data = request.get_json()
-    
-    name = data.get('name')
-    timestamp = data.get('timestamp')
-    subject_id = data.get('subject_id')
+    row, error = validate_attendance_event(request.get_json(silent=True))
+    if error:
+        return jsonify({"error": error}), 400
+    name, timestamp, subject_id = row
+
+    try:
+        if GROUP_COMMIT:
+            # The writer thread also tells the live dashboard about the new record
+            inserted = attendance_writer.submit(name, timestamp, subject_id).result(timeout=WRITE_TIMEOUT_SECONDS)
+        else:
+            inserted = insert_attendance(name, timestamp, subject_id)
+    except WriteTimeout:
+        print(f"Attendance writer timed out logging {name}")
+        return jsonify({"error": "Attendance store is busy, retry later"}), 503
+    except sqlite3.Error as e:
+        print(f"Database error at cloud receiver endpoint: {e}")
+        return jsonify({"error": "Internal database execution error"}), 500
+
+    if not inserted:
+        return jsonify({"message": "Already logged for this class today"}), 200
+    print(f"☁️ Cloud Endpoint: Received and logged attendance for {name}")
+    return jsonify({"message": "Successfully logged to backend database"}), 200
 
-    if not name or not timestamp:
-        return jsonify({"error": "Missing required payload data"}), 400
 
+def insert_attendance(name, timestamp, subject_id):
+    """One event in its own transaction (GROUP_COMMIT = False). Returns True if it was inserted."""
+    conn = get_connection(DB_NAME)
+    cursor = conn.cursor()
+    # A retried upload hits the (name, subject, date) unique index and is ignored
+    cursor.execute(INSERT_ATTENDANCE, (name, timestamp, subject_id, name))
+    inserted = cursor.rowcount > 0
+    conn.commit()
+    if inserted:
+        live_dashboard.record_attendance([(name, timestamp, subject_id)])
+    return inserted
+
+
+def parse_attendance_batch():
+    """Reads a JSON array (or {"events": [...]}) or an NDJSON body. Returns None if the body is unusable."""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        events = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                events.append(None)  # Reported as invalid in the per-item results
+        return events
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('events')
+    return data if isinstance(data, list) else None
+
+
+def validate_attendance_event(event):
+    """Returns ((name, timestamp, subject_id), None) for a valid event, or (None, error message)."""
+    if not isinstance(event, dict):
+        return None, "Event must be a JSON object"
+    name = event.get('name')
+    timestamp = event.get('timestamp')
+    subject_id = event.get('subject_id')
+
+    if not isinstance(name, str) or not name.strip():
+        return None, "Missing name"
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
+        datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        return None, "timestamp must be formatted as YYYY-MM-DD HH:MM:SS"
+    # Required: the once-per-class unique index treats NULL subjects as all different,
+    # so events without one could never be deduplicated
+    if isinstance(subject_id, bool) or not isinstance(subject_id, int) or not -2**63 <= subject_id < 2**63:
+        return None, "subject_id must be an integer"
+    return (name.strip(), timestamp, subject_id), None
+
+
+def find_logged_attendance(cursor, rows):
+    """Set of (name, subject_id, date) keys among `rows` that are already in the attendance table."""
+    dates = sorted({timestamp[:10] for _, timestamp, _ in rows})
+    names = sorted({name for name, _, _ in rows})
+    logged = set()
+    # Chunked to stay under SQLite's bound-parameter limit on older builds
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        placeholders = ','.join('?' * len(chunk))
         cursor.execute(
-            "INSERT INTO attendance (name, timestamp, subject_id) VALUES (?, ?, ?)",
-            (name, timestamp, subject_id)
+            f"SELECT name, subject_id, date FROM attendance "
+            f"WHERE name IN ({placeholders}) AND date BETWEEN ? AND ?",
+            (*chunk, dates[0], dates[-1])
+        )
+        logged.update(tuple(row) for row in cursor.fetchall())
+    return logged
+
+
+@app.route('/api/log_attendance/batch', methods=['POST'])
+def receive_attendance_batch():
+    """
+    Bulk version of /api/log_attendance for edge devices flushing a backlog.
+
+    Accepts a JSON array of events or an NDJSON stream, validates every event,
+    and inserts the valid ones with one executemany in one transaction. Events
+    already logged for the same student, subject and date are reported as
+    duplicates, so retrying a batch is harmless. Returns per-item results.
+    """
+    events = parse_attendance_batch()
+    if events is None:
+        return jsonify({"error": "Expected a JSON array of events or an NDJSON body"}), 400
+    if len(events) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Batch too large; send at most {MAX_BATCH_SIZE} events per request"}), 413
+
+    results = [None] * len(events)
+    candidates = []  # (index, row)
+    seen = set()
+    for index, event in enumerate(events):
+        row, error = validate_attendance_event(event)
+        if error:
+            results[index] = {"index": index, "status": "invalid", "error": error}
+            continue
+        key = (row[0], row[2], row[1][:10])
+        if key in seen:
+            results[index] = {"index": index, "status": "duplicate"}
+            continue
+        seen.add(key)
+        candidates.append((index, row))
+
+    try:
+        conn = get_connection(DB_NAME)
+        cursor = conn.cursor()
+        # Take the write lock up front so the duplicate check and the insert see the same data
+        cursor.execute("BEGIN IMMEDIATE")
+        logged = find_logged_attendance(cursor, [row for _, row in candidates]) if candidates else set()
+
+        to_insert = []
+        for index, row in candidates:
+            if (row[0], row[2], row[1][:10]) in logged:
+                results[index] = {"index": index, "status": "duplicate"}
+            else:
+                results[index] = {"index": index, "status": "inserted"}
+                to_insert.append(row)
+
+        cursor.executemany(
+            INSERT_ATTENDANCE,
+            [(name, timestamp, subject_id, name) for name, timestamp, subject_id in to_insert]
         )
         conn.commit()
-        conn.close()
-        
-        print(f"☁️ Cloud Endpoint: Received and logged attendance for {name}")
-        return jsonify({"message": "Successfully logged to backend database"}), 200
-        
     except sqlite3.Error as e:
-        print(f"Database error at cloud receiver endpoint: {e}")
+        print(f"Database error at cloud batch receiver endpoint: {e}")
         return jsonify({"error": "Internal database execution error"}), 500
+    live_dashboard.record_attendance(to_insert)
+
+    counts = defaultdict(int)
+    for result in results:
+        counts[result['status']] += 1
+    print(f"☁️ Cloud Endpoint: Batch of {len(events)} events - {counts['inserted']} logged, "
+          f"{counts['duplicate']} duplicates, {counts['invalid']} invalid")
+    return jsonify({
+        "inserted": counts['inserted'],
+        "duplicates": counts['duplicate'],
+        "invalid": counts['invalid'],
+        "results": results
+    }), 200
+
+
+# --- Metrics and Profiling ---
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/debug/profile')
+def debug_profile():
+    """
+    Samples every thread of the running server for ?seconds=N (default 10) and returns
+    the collapsed stacks for a flame graph, or the hottest functions with ?format=top.
+    """
+    if not PROFILER_ENABLED or request.remote_addr not in ('127.0.0.1', '::1'):
+        abort(404)
+    seconds = request.args.get('seconds', 10, type=float)
+    try:
+        profile = profiler.profile(seconds)
+    except RuntimeError as e:
+        return str(e), 409
+    body = profile.report(25) if request.args.get('format') == 'top' else profile.folded()
+    return Response(body, mimetype='text/plain')
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # threaded so open dashboard streams don't hold up other requests
+    app.run(debug=True, threaded=True)
\ No newline at end of file
@@ -0,0 +1,153 @@
+import argparse
+import sys
+
+from db import get_connection
+
+DB_NAME = 'facebeam.db'
+
+# Aggregates kept in step with the attendance table by triggers (created by
+# migration 5), so the student dashboard reads a handful of rows instead of
+# scanning the whole attendance history on every page view.
+#
+#   attendance_days             one row per date with records on it
+#   attendance_totals           single row: number of distinct days with records
+#   student_attendance_summary  records per (student name, subject); NULL subject is stored as 0
+SUMMARY_TABLES = (
+    """CREATE TABLE IF NOT EXISTS attendance_days (
+        date TEXT PRIMARY KEY,
+        records INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS attendance_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        days_with_records INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS student_attendance_summary (
+        name TEXT NOT NULL,
+        subject_id INTEGER NOT NULL,
+        attended INTEGER NOT NULL,
+        PRIMARY KEY (name, subject_id)
+    )""",
+)
+
+# Trigger bodies: take one record away from / add one record to the summaries
+_REMOVE_OLD = """
+    UPDATE attendance_days SET records = records - 1 WHERE date = OLD.date;
+    DELETE FROM attendance_days WHERE date = OLD.date AND records <= 0;
+    UPDATE student_attendance_summary SET attended = attended - 1
+        WHERE name = OLD.name AND subject_id = COALESCE(OLD.subject_id, 0);
+    DELETE FROM student_attendance_summary
+        WHERE name = OLD.name AND subject_id = COALESCE(OLD.subject_id, 0) AND attended <= 0;
+"""
+_ADD_NEW = """
+    INSERT INTO attendance_days (date, records) VALUES (NEW.date, 1)
+        ON CONFLICT (date) DO UPDATE SET records = records + 1;
+    INSERT INTO student_attendance_summary (name, subject_id, attended)
+        VALUES (NEW.name, COALESCE(NEW.subject_id, 0), 1)
+        ON CONFLICT (name, subject_id) DO UPDATE SET attended = attended + 1;
+"""
+
+SUMMARY_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS trg_attendance_days_insert AFTER INSERT ON attendance_days
+    BEGIN
+        UPDATE attendance_totals SET days_with_records = days_with_records + 1 WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_attendance_days_delete AFTER DELETE ON attendance_days
+    BEGIN
+        UPDATE attendance_totals SET days_with_records = days_with_records - 1 WHERE id = 1;
+    END""",
+    f"CREATE TRIGGER IF NOT EXISTS trg_attendance_summary_insert AFTER INSERT ON attendance BEGIN {_ADD_NEW} END",
+    f"CREATE TRIGGER IF NOT EXISTS trg_attendance_summary_delete AFTER DELETE ON attendance BEGIN {_REMOVE_OLD} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_attendance_summary_update "
+    f"AFTER UPDATE OF name, timestamp, subject_id ON attendance BEGIN {_REMOVE_OLD} {_ADD_NEW} END",
+)
+
+
+def create_summary_tables(conn):
+    """Creates the summary tables and their triggers (if missing) and fills them from scratch."""
+    for statement in SUMMARY_TABLES + SUMMARY_TRIGGERS:
+        conn.execute(statement)
+    rebuild_summaries(conn)
+
+
+def rebuild_summaries(conn):
+    """Recomputes every summary table from the attendance table."""
+    conn.execute("DELETE FROM student_attendance_summary")
+    conn.execute("""
+        INSERT INTO student_attendance_summary (name, subject_id, attended)
+        SELECT name, COALESCE(subject_id, 0), COUNT(*) FROM attendance GROUP BY name, COALESCE(subject_id, 0)
+    """)
+    # The per-day triggers adjust the running total as rows come and go; reset it afterwards
+    conn.execute("DELETE FROM attendance_days")
+    conn.execute("INSERT INTO attendance_days (date, records) SELECT date, COUNT(*) FROM attendance GROUP BY date")
+    conn.execute("DELETE FROM attendance_totals")
+    conn.execute("INSERT INTO attendance_totals (id, days_with_records) SELECT 1, COUNT(*) FROM attendance_days")
+
+
+def attendance_percentage(cursor, student_name):
+    """Overall attendance percentage for the dashboard, read from the summary tables."""
+    cursor.execute("SELECT days_with_records FROM attendance_totals WHERE id = 1")
+    row = cursor.fetchone()
+    total_days_with_records = (row[0] if row else 0) or 1
+
+    cursor.execute("SELECT COUNT(*) FROM timetable")
+    total_scheduled_classes_per_week = cursor.fetchone()[0]
+
+    cursor.execute("SELECT COALESCE(SUM(attended), 0) FROM student_attendance_summary WHERE name = ?", (student_name,))
+    total_attended = cursor.fetchone()[0]
+    return _percentage(total_days_with_records, total_scheduled_classes_per_week, total_attended)
+
+
+def attendance_percentage_from_scratch(cursor, student_name):
+    """The same percentage computed directly from the attendance table, for verification."""
+    cursor.execute("SELECT COUNT(DISTINCT date) FROM attendance")
+    total_days_with_records = cursor.fetchone()[0] or 1
+
+    cursor.execute("SELECT COUNT(*) FROM timetable")
+    total_scheduled_classes_per_week = cursor.fetchone()[0]
+
+    cursor.execute("SELECT COUNT(*) FROM attendance WHERE name = ?", (student_name,))
+    total_attended = cursor.fetchone()[0]
+    return _percentage(total_days_with_records, total_scheduled_classes_per_week, total_attended)
+
+
+def _percentage(total_days_with_records, total_scheduled_classes_per_week, total_attended):
+    # Roughly five teaching days a week
+    total_classes_held = (total_days_with_records / 5) * total_scheduled_classes_per_week
+    if total_classes_held == 0: total_classes_held = 1
+    return round((total_attended / total_classes_held) * 100, 2)
+
+
+def verify_summaries(conn):
+    """Compares the maintained summaries with a from-scratch computation. Returns a list of mismatches."""
+    mismatches = []
+    maintained = {(r[0], r[1]): r[2] for r in conn.execute("SELECT name, subject_id, attended FROM student_attendance_summary")}
+    fresh = {(r[0], r[1]): r[2] for r in conn.execute(
+        "SELECT name, COALESCE(subject_id, 0), COUNT(*) FROM attendance GROUP BY name, COALESCE(subject_id, 0)")}
+    for key in sorted(set(maintained) | set(fresh), key=str):
+        if maintained.get(key) != fresh.get(key):
+            mismatches.append(f"{key[0]} / subject {key[1]}: summary {maintained.get(key)} vs actual {fresh.get(key)}")
+
+    days = conn.execute("SELECT days_with_records FROM attendance_totals WHERE id = 1").fetchone()
+    actual_days = conn.execute("SELECT COUNT(DISTINCT date) FROM attendance").fetchone()[0]
+    if (days[0] if days else None) != actual_days:
+        mismatches.append(f"days with records: summary {days[0] if days else None} vs actual {actual_days}")
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Verify or rebuild the attendance summary tables.")
+    parser.add_argument('--rebuild', action='store_true', help="Recompute all summaries from the attendance table")
+    args = parser.parse_args()
+
+    conn = get_connection(DB_NAME)
+    if args.rebuild:
+        rebuild_summaries(conn)
+        conn.commit()
+        print("✅ Attendance summaries rebuilt from scratch.")
+
+    problems = verify_summaries(conn)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ Attendance summaries match the attendance table.")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,120 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from db import get_connection
+
+# A group is committed once it holds this many rows...
+MAX_GROUP_ROWS = 500
+# ...or this long after its first row arrived, whichever comes first
+MAX_GROUP_WAIT_SECONDS = 0.003
+# How long a request handler waits for its row to be committed before giving up
+WRITE_TIMEOUT_SECONDS = 10
+
+INSERT_ATTENDANCE = (
+    "INSERT OR IGNORE INTO attendance (name, timestamp, subject_id, student_db_id) "
+    "VALUES (?, ?, ?, (SELECT id FROM students WHERE name = ?))"
+)
+
+
+class AttendanceWriter:
+    """
+    Group commit for single attendance events. Request handlers submit() a row and
+    wait on the returned Future; one writer thread collects whatever has arrived
+    within a few milliseconds and inserts it in a single transaction. Concurrent
+    requests then share one write lock acquisition and one sync instead of queueing
+    for their own. The writer's connection runs with synchronous=FULL, so a row is
+    durable (WAL synced to disk) by the time its request is answered; it reaches
+    the main database file at the next checkpoint.
+    """
+
+    def __init__(self, db_path, on_commit=None, max_rows=MAX_GROUP_ROWS, max_wait=MAX_GROUP_WAIT_SECONDS):
+        self.db_path = db_path
+        self.on_commit = on_commit  # Called from the writer thread with the rows each group inserted
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.groups = 0   # Transactions committed, and the events they carried
+        self.events = 0
+
+    def start(self):
+        """Starts the writer thread on first use, and again if it ever died."""
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+                self.thread.start()
+
+    def submit(self, name, timestamp, subject_id):
+        """Queues one event. The Future resolves to True if it was inserted, False if it was already logged."""
+        self.start()
+        future = Future()
+        self.queue.put(((name, timestamp, subject_id), future))
+        return future
+
+    def _collect(self):
+        """Blocks for the first row, then takes whatever else arrives until the group is full or its time is up."""
+        group = [self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(group) < self.max_rows:
+            remaining = deadline - time.perf_counter()
+            try:
+                group.append(self.queue.get_nowait() if remaining <= 0 else self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return group
+
+    def _write(self, conn, group):
+        """
+        Inserts a group in one transaction. Returns, per row, True if it was inserted,
+        False if it was already logged, or the exception that row raised; each row runs
+        under its own savepoint, so a row that can't be inserted fails alone.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        results = []
+        for (name, timestamp, subject_id), _ in group:
+            conn.execute("SAVEPOINT event")
+            try:
+                # A retried upload hits the (name, subject, date) unique index and is ignored
+                results.append(conn.execute(INSERT_ATTENDANCE, (name, timestamp, subject_id, name)).rowcount > 0)
+            except Exception as e:
+                conn.execute("ROLLBACK TO event")
+                results.append(e)
+            conn.execute("RELEASE event")
+        conn.commit()
+        return results
+
+    def _run(self):
+        conn = get_connection(self.db_path)
+        conn.execute("PRAGMA synchronous=FULL")  # One sync per group, so it's affordable here
+        while True:
+            group = self._collect()
+            try:
+                results = self._write(conn, group)
+            except Exception as e:
+                # Only this group's requests fail; the thread carries on with the next group
+                try:
+                    if conn.in_transaction:
+                        conn.rollback()
+                except sqlite3.Error:
+                    pass
+                for _, future in group:
+                    future.set_exception(e)
+                continue
+
+            self.groups += 1
+            self.events += len(group)
+            for (_, future), result in zip(group, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            rows = [row for (row, _), result in zip(group, results) if result is True]
+            if self.on_commit and rows:
+                try:
+                    self.on_commit(rows)
+                except Exception as e:
+                    print(f"⚠️ Attendance writer: commit callback failed: {e}")
@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import db
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DURATION_SECONDS = 5
+READERS = 8
+WRITERS = 2
+STUDENTS = 500
+HISTORY_ROWS = 50000  # Existing attendance, so the writers' own rows barely change read cost
+
+
+def make_database(path, wal):
+    """Fresh copy of the real schema with a realistic number of students."""
+    workdir = os.path.dirname(path)
+    subprocess.run([sys.executable, os.path.join(ROOT_DIR, 'populate_database.py')],
+                   cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    os.replace(os.path.join(workdir, 'facebeam.db'), path)
+    conn = sqlite3.connect(path)
+    # populate_database.py goes through db.py, so switch the baseline back to the default rollback journal
+    conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+    conn.executemany("INSERT INTO students (name, image_path) VALUES (?, ?)",
+                     [(f"Student {i}", f"student_{i}.jpg") for i in range(STUDENTS)])
+    conn.executemany("INSERT INTO attendance (name, timestamp, subject_id) VALUES (?, ?, ?)",
+                     [(f"Student {i % STUDENTS}", f"2025-{1 + i // 5000:02d}-{1 + i % 28:02d} 09:00:00", 1 + i % 6)
+                      for i in range(HISTORY_ROWS)])
+    conn.commit()
+    conn.close()
+
+
+def open_per_request(path):
+    """The old pattern: a fresh connection for every request."""
+    return sqlite3.connect(path)
+
+
+def dashboard_read(conn):
+    # What api_absentees does on every poll
+    today = datetime.now().strftime('%Y-%m-%d')
+    {row[0] for row in conn.execute("SELECT name FROM students")}
+    {row[0] for row in conn.execute("SELECT name FROM attendance WHERE subject_id = ? AND date = ?", (1, today))}
+
+
+def attendance_write(conn, n):
+    conn.execute("INSERT OR IGNORE INTO attendance (name, timestamp, subject_id) VALUES (?, ?, ?)",
+                 (f"Writer {threading.get_ident()} {n}", datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 1))
+    conn.commit()
+
+
+def run(path, pooled):
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + DURATION_SECONDS
+
+    def worker(kind):
+        n = 0
+        while time.perf_counter() < stop:
+            conn = db.get_connection(path) if pooled else open_per_request(path)
+            try:
+                if kind == 'reads':
+                    dashboard_read(conn)
+                else:
+                    attendance_write(conn, n)
+                n += 1
+                with lock:
+                    counts[kind] += 1
+            except sqlite3.OperationalError:
+                with lock:
+                    counts['errors'] += 1
+            finally:
+                if not pooled:
+                    conn.close()
+        if pooled:
+            db.close_all()
+
+    threads = [threading.Thread(target=worker, args=('reads',)) for _ in range(READERS)]
+    threads += [threading.Thread(target=worker, args=('writes',)) for _ in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {k: v / DURATION_SECONDS for k, v in counts.items()}
+
+
+def main():
+    tmpdir = tempfile.mkdtemp(prefix='facebeam_dbbench_')
+    before_path = os.path.join(tmpdir, 'before.db')
+    after_path = os.path.join(tmpdir, 'after.db')
+    make_database(before_path, wal=False)
+    make_database(after_path, wal=True)
+
+    print(f"{READERS} dashboard readers + {WRITERS} attendance writers for {DURATION_SECONDS}s each\n")
+    print(f"{'setup':<38} | {'reads/s':>9} | {'writes/s':>9} | {'errors/s':>8}")
+    print("-" * 74)
+    before = run(before_path, pooled=False)
+    print(f"{'connect per request, rollback journal':<38} | {before['reads']:>9.0f} | {before['writes']:>9.0f} | {before['errors']:>8.1f}")
+    after = run(after_path, pooled=True)
+    print(f"{'pooled per thread, WAL + pragmas':<38} | {after['reads']:>9.0f} | {after['writes']:>9.0f} | {after['errors']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+
+from gallery_index import build_index
+
+GALLERY_SIZES = [1000, 10000, 100000]
+N_QUERIES = 500
+FACES_PER_FRAME = 5
+
+# (label, index kind, options) -- n_probe is the recall/latency knob
+CONFIGS = [
+    ('brute', 'brute', {}),
+    ('ivf probe=4', 'ivf', {'n_probe': 4}),
+    ('ivf probe=16', 'ivf', {'n_probe': 16}),
+    ('ivf probe=32', 'ivf', {'n_probe': 32}),
+    ('ivf_pq m=16 probe=16', 'ivf_pq', {'n_probe': 16, 'pq_subvectors': 16}),
+    ('ivf_pq m=32 probe=16', 'ivf_pq', {'n_probe': 16, 'pq_subvectors': 32}),
+]
+
+
+def synthetic_gallery(size, rng):
+    """
+    Clustered 128-d encodings: real face encodings are not uniform noise, students
+    who look alike sit close together. Queries are re-photographs of enrolled students.
+    """
+    n_groups = max(10, size // 50)
+    centers = rng.normal(0, 0.15, size=(n_groups, 128))
+    gallery = centers[rng.integers(0, n_groups, size)] + rng.normal(0, 0.05, size=(size, 128))
+    picks = rng.integers(0, size, N_QUERIES)
+    queries = gallery[picks] + rng.normal(0, 0.02, size=(N_QUERIES, 128))
+    return gallery.astype(np.float32), queries.astype(np.float32)
+
+
+def timed_search(index, queries):
+    """Searches frame-sized batches; returns (indices, ms per query)."""
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), FACES_PER_FRAME):
+        results.append(index.search(queries[i:i + FACES_PER_FRAME], k=1)[1][:, 0])
+    elapsed = time.perf_counter() - start
+    return np.concatenate(results), elapsed / len(queries) * 1000
+
+
+def run_benchmark():
+    rng = np.random.default_rng(0)
+    for size in GALLERY_SIZES:
+        gallery, queries = synthetic_gallery(size, rng)
+        print(f"\n=== {size} enrolled students, {N_QUERIES} queries ===")
+        print(f"{'index':<22} | {'build (s)':>9} | {'recall@1':>8} | {'ms/query':>8} | {'memory (MB)':>11}")
+        print("-" * 72)
+
+        truth = None
+        for label, kind, options in CONFIGS:
+            start = time.perf_counter()
+            index = build_index(gallery, kind, **options)
+            build_s = time.perf_counter() - start
+
+            found, ms_per_query = timed_search(index, queries)
+            if truth is None:
+                truth = found  # brute force runs first and defines the ground truth
+            recall = np.mean(found == truth)
+            print(f"{label:<22} | {build_s:>9.2f} | {recall:>8.3f} | {ms_per_query:>8.3f} | {index.nbytes / 1e6:>11.2f}")
+
+
+if __name__ == '__main__':
+    run_benchmark()
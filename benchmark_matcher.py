@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+
+from face_matcher import FaceMatcher, DEFAULT_TOLERANCE
+
+GALLERY_SIZES = [10, 100, 1000, 10000, 50000]
+FACES_PER_FRAME = 5
+REPEATS = 20
+
+
+def per_face_baseline(known_face_encodings, known_face_names, face_encodings):
+    """What recognize.py used to do: compare_faces + face_distance for every face."""
+    results = []
+    for face_encoding in face_encodings:
+        # face_recognition re-stacks the list on each call, and compare_faces calls face_distance
+        matches = list(np.linalg.norm(np.array(known_face_encodings) - face_encoding, axis=1) <= DEFAULT_TOLERANCE)
+        face_distances = np.linalg.norm(np.array(known_face_encodings) - face_encoding, axis=1)
+        best_match_index = np.argmin(face_distances)
+        name = known_face_names[best_match_index] if matches[best_match_index] else "Unknown"
+        results.append((name, face_distances[best_match_index]))
+    return results
+
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(*args)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def run_benchmark():
+    rng = np.random.default_rng(0)
+    print(f"Matching {FACES_PER_FRAME} faces per frame (mean of {REPEATS} runs)\n")
+    print(f"{'students':>10} | {'per-face (ms)':>14} | {'batched (ms)':>13} | {'speed-up':>8}")
+    print("-" * 55)
+
+    for size in GALLERY_SIZES:
+        gallery = rng.normal(0, 0.1, size=(size, 128))
+        names = [f"student_{i}" for i in range(size)]
+        # Queries are noisy copies of enrolled students so both paths find real matches
+        picks = rng.integers(0, size, FACES_PER_FRAME)
+        faces = gallery[picks] + rng.normal(0, 0.01, size=(FACES_PER_FRAME, 128))
+
+        gallery_list = list(gallery)
+        matcher = FaceMatcher(gallery, names)
+
+        baseline_names = [n for n, _ in per_face_baseline(gallery_list, names, faces)]
+        batched_names = [n for n, _ in matcher.match(faces)]
+        assert baseline_names == batched_names, "Batched matcher disagrees with the per-face baseline"
+
+        baseline_ms = time_call(per_face_baseline, gallery_list, names, faces)
+        batched_ms = time_call(matcher.match, faces)
+        print(f"{size:>10} | {baseline_ms:>14.3f} | {batched_ms:>13.3f} | {baseline_ms / batched_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,55 @@
+import argparse
+import time
+
+from benchmark_replay import RecordingUploader, replay_sequential
+from detection_pipeline import StageTimer, PIPELINE_PRESETS
+from recognize import load_matcher, PIPELINE_MODE
+
+
+def run(source, matcher, settings):
+    """Replays the clip once through the single-threaded pipeline; returns wall time, CPU time, timer and events."""
+    timer = StageTimer(report_every=0, keep_samples=True)
+    uploader = RecordingUploader()
+    wall, cpu = time.perf_counter(), time.process_time()
+    replay_sequential(source, matcher, timer, uploader, settings, workers=1)
+    return time.perf_counter() - wall, time.process_time() - cpu, timer, uploader.events
+
+
+def run_benchmark(source, mode=PIPELINE_MODE):
+    """
+    Replays the same clip with the motion gate off and on and compares throughput,
+    CPU time, how many detections ran, and who was recognized. The single-threaded
+    pipeline is used so that all the work is in this process's CPU time.
+    """
+    matcher = load_matcher()
+    print(f"\nReplaying {source} in '{mode}' mode, single-threaded, as fast as possible\n")
+    print(f"{'motion gate':<12} | {'frames':>6} | {'FPS':>7} | {'CPU s':>7} | {'CPU ms/frame':>12} | "
+          f"{'detections':>10} | {'gated':>6} | recognized")
+    print("-" * 100)
+
+    results = {}
+    for gated in (False, True):
+        settings = dict(PIPELINE_PRESETS[mode], motion_gate=gated)
+        wall, cpu, timer, events = run(source, matcher, settings)
+        frames = max(timer.frames, 1)
+        detections = len(timer.samples.get('detect', []))
+        names = sorted({name for _, name in events})
+        results[gated] = (wall, cpu, frames, names)
+        print(f"{'on' if gated else 'off':<12} | {timer.frames:>6} | {frames / max(wall, 1e-9):>7.1f} | {cpu:>7.2f} | "
+              f"{cpu / frames * 1000:>12.2f} | {detections:>10} | {timer.counters.get('gated', 0):>6} | {', '.join(names)}")
+
+    (wall_off, cpu_off, _, names_off), (wall_on, cpu_on, _, names_on) = results[False], results[True]
+    print(f"\nWith the gate: {wall_off / max(wall_on, 1e-9):.2f}x the frame rate, "
+          f"{(1 - cpu_on / max(cpu_off, 1e-9)):.0%} less CPU time.")
+    if names_off != names_on:
+        print(f"⚠️ Recognized students differ: ungated {names_off}, gated {names_on}")
+    else:
+        print("✅ Both runs recognized the same students.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compares recognition with and without the motion gate on a recorded clip.")
+    parser.add_argument('source', help="Video file or directory of frames.")
+    parser.add_argument('--mode', choices=sorted(PIPELINE_PRESETS), default=PIPELINE_MODE)
+    args = parser.parse_args()
+    run_benchmark(args.source, args.mode)
@@ -0,0 +1,83 @@
+import time
+
+import numpy as np
+
+from face_matcher import FaceMatcher, DEFAULT_TOLERANCE, UNKNOWN_NAME
+from gallery_index import BruteForceIndex
+
+STUDENTS = [100, 1000, 5000]
+PHOTOS_PER_STUDENT = 5
+QUERIES = 2000
+FACES_PER_FRAME = 5
+# Synthetic encodings scaled like real ones: different people ~1.0 apart, photos of the
+# same person ~0.35 from their "true" face, classroom frames a little noisier still
+IDENTITY_SPREAD = 0.0625
+PHOTO_NOISE = 0.031
+FRAME_NOISE = 0.036
+MISLABELLED_PHOTOS = 0.02  # Share of students with one photo of someone else filed under their name
+
+
+class AllPhotosMatcher:
+    """The naive way to use several photos: every photo is its own gallery row."""
+
+    def __init__(self, encodings, names, tolerance=DEFAULT_TOLERANCE):
+        self.index = BruteForceIndex(encodings)
+        self.names = names
+        self.tolerance = tolerance
+
+    def match(self, face_encodings):
+        distances, indices = self.index.search(face_encodings, k=1)
+        return [(self.names[i] if d <= self.tolerance else UNKNOWN_NAME, float(d))
+                for i, d in zip(indices[:, 0], distances[:, 0])]
+
+
+def make_gallery(rng, n_students):
+    identities = rng.normal(0, IDENTITY_SPREAD, size=(n_students, 128))
+    photos = identities[:, None, :] + rng.normal(0, PHOTO_NOISE, size=(n_students, PHOTOS_PER_STUDENT, 128))
+    mislabelled = rng.random(n_students) < MISLABELLED_PHOTOS
+    photos[mislabelled, -1] = rng.normal(0, IDENTITY_SPREAD, size=(mislabelled.sum(), 128))
+    names = [f"student_{i}" for i in range(n_students)]
+    return identities, photos, names
+
+
+def evaluate(matcher, identities, names, rng):
+    """Returns (correct-identification rate, false-accept rate on strangers, ms per frame)."""
+    students = rng.integers(0, len(identities), QUERIES)
+    enrolled = identities[students] + rng.normal(0, FRAME_NOISE, size=(QUERIES, 128))
+    strangers = rng.normal(0, IDENTITY_SPREAD, size=(QUERIES, 128)) + rng.normal(0, FRAME_NOISE, size=(QUERIES, 128))
+
+    start = time.perf_counter()
+    results = []
+    for frame in range(0, QUERIES, FACES_PER_FRAME):
+        results += matcher.match(enrolled[frame:frame + FACES_PER_FRAME])
+    ms_per_frame = (time.perf_counter() - start) * 1000 / (QUERIES / FACES_PER_FRAME)
+
+    correct = np.mean([name == names[s] for (name, _), s in zip(results, students)])
+    false_accepts = np.mean([name != UNKNOWN_NAME for name, _ in matcher.match(strangers)])
+    return correct, false_accepts, ms_per_frame
+
+
+def run_benchmark():
+    print(f"{PHOTOS_PER_STUDENT} photos per student, {QUERIES} enrolled and {QUERIES} stranger faces, "
+          f"{FACES_PER_FRAME} faces per frame\n")
+    print(f"{'students':>8} | {'gallery':<22} | {'correct':>8} | {'false accept':>12} | {'ms/frame':>8}")
+    print("-" * 72)
+    for n_students in STUDENTS:
+        rng = np.random.default_rng(n_students)
+        identities, photos, names = make_gallery(rng, n_students)
+        all_encodings = photos.reshape(-1, 128)
+        all_names = [name for name in names for _ in range(PHOTOS_PER_STUDENT)]
+
+        matchers = [
+            ("single photo", FaceMatcher(photos[:, 0], names)),
+            ("every photo as a row", AllPhotosMatcher(all_encodings, all_names)),
+            ("centroids + refine", FaceMatcher(all_encodings, all_names)),
+        ]
+        for label, matcher in matchers:
+            correct, false_accepts, ms = evaluate(matcher, identities, names, np.random.default_rng(1))
+            print(f"{n_students:>8} | {label:<22} | {correct:>7.1%} | {false_accepts:>11.2%} | {ms:>8.3f}")
+        print("-" * 72)
+
+
+if __name__ == '__main__':
+    run_benchmark()
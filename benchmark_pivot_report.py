@@ -0,0 +1,106 @@
+import csv
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import db
+import generate_pivot_report as report
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+STUDENTS = 300
+ATTENDANCE_RATE = 0.85
+YEAR_START = date(2025, 1, 1)
+RANGES_DAYS = [30, 90, 365]
+
+
+def make_database(workdir):
+    """The real schema and timetable plus a synthetic year of attendance."""
+    subprocess.run([sys.executable, os.path.join(ROOT_DIR, 'populate_database.py')],
+                   cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    path = os.path.join(workdir, 'facebeam.db')
+    conn = db.get_connection(path)
+    names = [f"Student {i:03d}" for i in range(STUDENTS)]
+    conn.executemany("INSERT INTO students (name, image_path) VALUES (?, ?)",
+                     [(name, name.replace(' ', '_').lower() + '.jpg') for name in names])
+    timetable = conn.execute("SELECT day_of_week, subject_id, start_time FROM timetable").fetchall()
+    rng = random.Random(0)
+    rows = []
+    for offset in range(365):
+        day = YEAR_START + timedelta(days=offset)
+        for slot in timetable:
+            if slot['day_of_week'] != day.weekday():
+                continue
+            for name in names:
+                if rng.random() < ATTENDANCE_RATE:
+                    rows.append((name, f"{day.isoformat()} {slot['start_time']}:00", slot['subject_id']))
+    conn.executemany("INSERT OR IGNORE INTO attendance (name, timestamp, subject_id) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    return path
+
+
+def in_memory_range_report(path, start, end, output):
+    """The single-date approach stretched over a range: every row built as a dict in memory first."""
+    conn = db.get_connection(path)
+    students = [row['name'] for row in conn.execute("SELECT name FROM students ORDER BY name")]
+    subjects, by_day = report.report_subjects(conn.cursor())
+    header = ['Date', 'Student Name'] + [name for _, name in subjects]
+    final_report_data = []
+    for day in report.scheduled_days(start, end, by_day):
+        present_set = {(row['name'], row['subject_id']) for row in conn.execute(
+            "SELECT name, subject_id FROM attendance WHERE date = ?", (day.isoformat(),))}
+        for name in students:
+            row_data = {'Date': day.isoformat(), 'Student Name': name}
+            for subject_id, subject_name in subjects:
+                if (name, subject_id) in present_set:
+                    row_data[subject_name] = 'Present'
+                else:
+                    row_data[subject_name] = 'Absent' if subject_id in by_day[day.weekday()] else ''
+            final_report_data.append(row_data)
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=header)
+        writer.writeheader()
+        writer.writerows(final_report_data)
+
+
+def measure(fn, *args):
+    """Wall time of a plain run, then peak Python memory from a second, traced run (tracing slows it down)."""
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as workdir:
+        print("Building a synthetic year of attendance...")
+        path = make_database(workdir)
+        report.DB_NAME = path
+        total = db.get_connection(path).execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+        print(f"{STUDENTS} students, {total} attendance records\n")
+
+        print(f"{'range':>9} | {'method':<22} | {'time':>8} | {'peak Python memory':>18}")
+        for days in RANGES_DAYS:
+            start, end = YEAR_START, YEAR_START + timedelta(days=days - 1)
+            baseline_csv = os.path.join(workdir, 'baseline.csv')
+            streamed_csv = os.path.join(workdir, 'streamed.csv')
+            results = [
+                ("in-memory dicts", measure(in_memory_range_report, path, start, end, baseline_csv)),
+                ("streamed csv", measure(report.generate_range_report, start.isoformat(), end.isoformat(),
+                                         'csv', streamed_csv)),
+                ("streamed npy", measure(report.generate_range_report, start.isoformat(), end.isoformat(),
+                                         'npy', os.path.join(workdir, 'streamed.npy'))),
+            ]
+            for method, (elapsed, peak_mb) in results:
+                print(f"{days:>5} days | {method:<22} | {elapsed:6.2f} s | {peak_mb:15.1f} MB")
+            with open(baseline_csv, encoding='utf-8') as a, open(streamed_csv, encoding='utf-8') as b:
+                assert a.read() == b.read(), "Streamed report differs from the in-memory one"
+        db.close_all()
@@ -0,0 +1,105 @@
+import argparse
+import csv
+import time
+
+from detection_pipeline import DetectionPipeline, StageTimer, PIPELINE_PRESETS
+from edge_pipeline import EdgePipeline
+from frame_sources import open_frame_source
+from recognize import load_matcher, DETECTION_WORKERS, PIPELINE_MODE
+
+REPLAY_SUBJECT_ID = 1  # Replays ignore the timetable: every frame counts as being in class
+PERCENTILES = (50, 90, 99)
+
+
+class RecordingUploader:
+    """Stands in for the OutboxSender: remembers each attendance event and when it arrived."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.events = []  # [(seconds since start, name)]
+
+    def submit(self, name, subject_id):
+        self.events.append((time.perf_counter() - self.start, name))
+
+
+def read_ground_truth(path):
+    """Names of the students in the clip: one per line, or a CSV with a 'name' column."""
+    with open(path, newline='', encoding='utf-8') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    if lines and lines[0].lower().split(',')[0] == 'name':
+        return {row['name'].strip() for row in csv.DictReader(lines) if row['name'].strip()}
+    return set(lines)
+
+
+def replay_concurrent(source, matcher, timer, uploader, settings, workers):
+    pipeline = EdgePipeline([open_frame_source(source)], matcher, uploader, lambda: REPLAY_SUBJECT_ID,
+                            detection_scale=settings['detection_scale'], upsample=settings.get('upsample', 1),
+                            workers=workers, timer=timer, drop_frames=False,
+                            motion_gate=settings.get('motion_gate', False))
+    pipeline.run(show_window=False)
+
+
+def replay_sequential(source, matcher, timer, uploader, settings, workers):
+    pipeline = DetectionPipeline(matcher, timer=timer, **settings)
+    video_capture = open_frame_source(source)
+    while True:
+        with timer.stage('capture'):
+            ret, frame = video_capture.read()
+        if not ret:
+            break
+        for track in pipeline.process(frame):
+            if track.confirmed and track.logged_subject != REPLAY_SUBJECT_ID:
+                track.logged_subject = REPLAY_SUBJECT_ID
+                uploader.submit(track.name, REPLAY_SUBJECT_ID)
+        timer.frame_done()
+    video_capture.release()
+
+
+def run_benchmark(source, truth_path=None, concurrent=True, mode=PIPELINE_MODE, workers=DETECTION_WORKERS):
+    matcher = load_matcher()
+    settings = dict(PIPELINE_PRESETS[mode])
+    timer = StageTimer(report_every=0, keep_samples=True)
+    uploader = RecordingUploader()
+    replay = replay_concurrent if concurrent else replay_sequential
+
+    print(f"\n▶️ Replaying {source} ({'concurrent, %d workers' % workers if concurrent else 'sequential'}, "
+          f"'{mode}' mode) as fast as possible...")
+    start = time.perf_counter()
+    replay(source, matcher, timer, uploader, settings, workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{timer.frames} frames in {elapsed:.2f} s: {timer.frames / max(elapsed, 1e-9):.1f} FPS")
+    print(f"\n{'stage':<10} | " + " | ".join(f"{'p%d ms' % p:>8}" for p in PERCENTILES))
+    print("-" * (13 + 11 * len(PERCENTILES)))
+    for stage, values in timer.percentiles(PERCENTILES).items():
+        print(f"{stage:<10} | " + " | ".join(f"{v:>8.2f}" for v in values))
+    for name, n in timer.counters.items():
+        print(f"{name}: {n}")
+
+    print("\nRecognized:")
+    for seconds, name in uploader.events:
+        print(f"  {seconds:7.2f} s  {name}")
+    if not truth_path:
+        return
+
+    truth = read_ground_truth(truth_path)
+    recognized = {name for _, name in uploader.events}
+    correct = recognized & truth
+    print(f"\nGround truth: {len(truth)} students | recognized {len(correct)} "
+          f"(recall {len(correct) / max(len(truth), 1):.1%}, "
+          f"precision {len(correct) / max(len(recognized), 1):.1%})")
+    for name in sorted(truth - recognized):
+        print(f"  ❌ missed: {name}")
+    for name in sorted(recognized - truth):
+        print(f"  ⚠️ not in ground truth: {name}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replays a recorded clip through the edge pipeline headless and reports throughput and accuracy.")
+    parser.add_argument('source', help="Video file or directory of frames.")
+    parser.add_argument('--truth', help="Students present in the clip: one name per line, or a CSV with a 'name' column.")
+    parser.add_argument('--sequential', action='store_true', help="Use the single-threaded loop instead of the concurrent pipeline.")
+    parser.add_argument('--mode', choices=sorted(PIPELINE_PRESETS), default=PIPELINE_MODE)
+    parser.add_argument('--workers', type=int, default=DETECTION_WORKERS)
+    args = parser.parse_args()
+    run_benchmark(args.source, args.truth, concurrent=not args.sequential, mode=args.mode, workers=args.workers)
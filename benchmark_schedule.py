@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import db
+from schedule import Schedule
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+LOOKUPS = 20000
+START = datetime(2025, 3, 3, 8, 0)  # A Monday morning
+
+
+def make_database(workdir):
+    """Fresh copy of the real schema and timetable."""
+    subprocess.run([sys.executable, os.path.join(ROOT_DIR, 'populate_database.py')],
+                   cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    return os.path.join(workdir, 'facebeam.db')
+
+
+def query_per_frame(path, when):
+    """What recognize.py used to do on every frame: open the database and query the timetable."""
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        time_str = when.strftime('%H:%M')
+        cursor.execute("SELECT subject_id FROM timetable WHERE day_of_week = ? AND start_time <= ? AND end_time >= ?",
+                       (when.weekday(), time_str, time_str))
+        result = cursor.fetchone()
+        return result[0] if result else None
+    finally:
+        conn.close()
+
+
+def pooled_query(path, when):
+    """The same query on the pooled connection (the previous recognize.py)."""
+    time_str = when.strftime('%H:%M')
+    result = db.get_connection(path).execute(
+        "SELECT subject_id FROM timetable WHERE day_of_week = ? AND start_time <= ? AND end_time >= ?",
+        (when.weekday(), time_str, time_str)).fetchone()
+    return result[0] if result else None
+
+
+def run(label, lookup, moments):
+    start = time.perf_counter()
+    answers = [lookup(when) for when in moments]
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} | {elapsed / len(moments) * 1e6:9.2f} µs per frame")
+    return answers
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as workdir:
+        path = make_database(workdir)
+        # One lookup per simulated frame across a school week, so every slot boundary is crossed
+        step = timedelta(days=5) / LOOKUPS
+        moments = [START + step * i for i in range(LOOKUPS)]
+
+        print(f"Current-class lookups: {LOOKUPS} frames spread over a week\n")
+        baseline = run("connect + query per frame", lambda when: query_per_frame(path, when), moments)
+        pooled = run("pooled connection query", lambda when: pooled_query(path, when), moments)
+        schedule = Schedule(path)
+        cached = run("in-memory schedule", schedule.current_subject_id, moments)
+
+        mismatches = sum(1 for a, b in zip(baseline, cached) if a != b)
+        print(f"\nAnswers differing from the SQL query: {mismatches}")
+        assert pooled == baseline and mismatches == 0
+        db.close_all()
@@ -0,0 +1,232 @@
+import argparse
+import csv
+import os
+import shutil
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from db import get_connection
+from encoding_cache import EncodingCache, IMAGE_EXTENSIONS, file_sha1
+from face_registry import store_encodings
+from photo_variants import create_variants
+
+DB_NAME = 'facebeam.db'
+KNOWN_FACES_DIR = 'known_faces'
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# Photos are detected on a copy no larger than this (longest side); encoding still uses the full image
+MAX_DETECTION_SIDE = 1600
+ROSTER_COLUMNS = ('name', 'roll_number', 'branch', 'section', 'year', 'college_id', 'photo')
+REPORT_FILENAME = 'enrollment_report.csv'
+
+
+def check_photo(path):
+    """
+    Worker-process stage: decodes a photo and requires exactly one detectable face.
+    Returns (status, encoding, detail) where status is 'ok', 'unreadable', 'no_face'
+    or 'multiple_faces'.
+    """
+    # Imported in the worker so the parent process never has to load dlib
+    import face_recognition
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        image = np.array(Image.open(path).convert("RGB"))
+    except (OSError, UnidentifiedImageError) as e:
+        return 'unreadable', None, str(e)
+
+    scale = min(1.0, MAX_DETECTION_SIDE / max(image.shape[:2]))
+    small = image
+    if scale < 1.0:
+        small = np.array(Image.fromarray(image).resize(
+            (round(image.shape[1] * scale), round(image.shape[0] * scale))))
+    locations = face_recognition.face_locations(small)
+    if not locations:
+        return 'no_face', None, "No face detected"
+    if len(locations) > 1:
+        return 'multiple_faces', None, f"{len(locations)} faces detected"
+
+    top, right, bottom, left = (round(v / scale) for v in locations[0])
+    encodings = face_recognition.face_encodings(image, [(top, right, bottom, left)])
+    if not encodings:
+        return 'no_face', None, "Face could not be encoded"
+    return 'ok', encodings[0], ""
+
+
+def read_roster(roster_path, photos_dir):
+    """Reads the roster CSV. Returns (candidates, rejected) as lists of dicts with a 'line' number."""
+    with open(roster_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        missing = {'name', 'photo'} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"Roster is missing column(s): {', '.join(sorted(missing))}")
+        rows = [dict(row, line=line) for line, row in enumerate(reader, start=2)]
+
+    candidates, rejected, seen_names, seen_rolls = [], [], set(), set()
+    for row in rows:
+        student = {column: (row.get(column) or '').strip() for column in ROSTER_COLUMNS}
+        student['line'] = row['line']
+        if not student['name'] or not student['photo']:
+            rejected.append(dict(student, status='invalid', detail="Name and photo are required"))
+            continue
+        if student['name'].lower() in seen_names:
+            rejected.append(dict(student, status='duplicate', detail="Name appears earlier in the roster"))
+            continue
+        if student['roll_number'] and student['roll_number'] in seen_rolls:
+            rejected.append(dict(student, status='duplicate', detail="Roll number appears earlier in the roster"))
+            continue
+        seen_names.add(student['name'].lower())
+        seen_rolls.add(student['roll_number'])
+        student['source'] = os.path.join(photos_dir, student['photo'])
+        if not os.path.isfile(student['source']):
+            rejected.append(dict(student, status='missing_photo', detail=f"Photo not found at {student['source']}"))
+            continue
+        if not student['photo'].lower().endswith(IMAGE_EXTENSIONS):
+            rejected.append(dict(student, status='invalid', detail="Unsupported photo type"))
+            continue
+        candidates.append(student)
+    return candidates, rejected
+
+
+def filter_registered(cursor, candidates):
+    """Splits off students whose name or roll number is already in the database."""
+    cursor.execute("SELECT name, student_id FROM students")
+    names, student_ids = set(), set()
+    for row in cursor.fetchall():
+        names.add(row['name'].lower())
+        if row['student_id']:
+            student_ids.add(row['student_id'])
+
+    fresh, rejected = [], []
+    for student in candidates:
+        if student['name'].lower() in names:
+            rejected.append(dict(student, status='duplicate', detail="Already registered"))
+        elif student['roll_number'] and student['roll_number'] in student_ids:
+            rejected.append(dict(student, status='duplicate', detail="Roll number already registered"))
+        else:
+            fresh.append(student)
+    return fresh, rejected
+
+
+def write_report(path, results):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['line', 'name', 'photo', 'status', 'detail'])
+        for result in sorted(results, key=lambda r: r['line']):
+            writer.writerow([result['line'], result['name'], result['photo'], result['status'], result['detail']])
+
+
+def bulk_enroll(roster_path, photos_dir, workers=DEFAULT_WORKERS, report_path=REPORT_FILENAME, dry_run=False):
+    """
+    Registers every student in a roster CSV whose photo has exactly one face.
+    Photos are checked and encoded in a process pool; accepted students are
+    inserted in one transaction, together with their encodings in the server
+    registry (face_registry.py); the encodings also go into the local encoding
+    cache. Everything rejected is listed in the report CSV.
+    Returns the list of per-row results.
+    """
+    print(f"--- FaceBeam: Bulk Enrollment from '{roster_path}' ---")
+    candidates, results = read_roster(roster_path, photos_dir)
+    conn = get_connection(DB_NAME)
+    candidates, already_registered = filter_registered(conn.cursor(), candidates)
+    results += already_registered
+
+    print(f"Checking {len(candidates)} photos with {workers} worker processes...")
+    accepted = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        checks = pool.map(check_photo, [student['source'] for student in candidates], chunksize=4)
+        for student, (status, encoding, detail) in zip(candidates, checks):
+            if status == 'ok':
+                student['encoding'] = encoding
+                accepted.append(student)
+            else:
+                results.append(dict(student, status=status, detail=detail))
+                print(f"⚠️ Line {student['line']} ({student['name']}): {detail}. Skipping.")
+
+    # Never overwrite a photo that is already there: different names can map to the same file
+    # ("Virat Sirohi" and "virat_sirohi"), and a deleted student's photo may have been left behind
+    enrolling, claimed = [], set()
+    for student in accepted:
+        # Same standardized filename as add_student.py and the /add_student route
+        filename = student['name'].replace(' ', '_').lower() + os.path.splitext(student['photo'])[1].lower()
+        if filename in claimed or os.path.exists(os.path.join(KNOWN_FACES_DIR, filename)):
+            detail = (f"Photo file '{filename}' is used by an earlier roster row" if filename in claimed
+                      else f"Photo file '{filename}' already exists in {KNOWN_FACES_DIR}/")
+            results.append(dict(student, status='duplicate', detail=detail))
+            print(f"⚠️ Line {student['line']} ({student['name']}): {detail}. Skipping.")
+            continue
+        claimed.add(filename)
+        student['filename'] = filename
+        enrolling.append(student)
+    accepted = enrolling
+
+    if dry_run:
+        results += [dict(student, status='ok', detail="Dry run: not enrolled") for student in accepted]
+        write_report(report_path, results)
+        print(f"✅ Dry run: {len(accepted)} of {len(results)} rows would be enrolled. Report: '{report_path}'.")
+        return results
+
+    copied = []
+    try:
+        for student in accepted:
+            # 'xb' fails instead of overwriting if the file appeared since the check above;
+            # only files this run created are listed in `copied` and removed on rollback
+            with open(student['source'], 'rb') as src, \
+                    open(os.path.join(KNOWN_FACES_DIR, student['filename']), 'xb') as dst:
+                shutil.copyfileobj(src, dst)
+            copied.append(student['filename'])
+
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "INSERT INTO students (name, image_path, student_id, section, year, roll_number, branch, college_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(s['name'], s['filename'], s['roll_number'] or None, s['section'], s['year'],
+              s['roll_number'], s['branch'], s['college_id']) for s in accepted]
+        )
+        # Same transaction: edge devices syncing from the server see the students and their encodings together
+        store_encodings(conn, [(s['filename'], s['encoding'], file_sha1(os.path.join(KNOWN_FACES_DIR, s['filename'])))
+                               for s in accepted])
+        conn.commit()
+    except (sqlite3.Error, OSError) as e:
+        if conn.in_transaction:
+            conn.rollback()
+        for filename in copied:
+            os.remove(os.path.join(KNOWN_FACES_DIR, filename))
+        print(f"❌ Enrollment failed, no students were added: {e}")
+        results += [dict(student, status='failed', detail=str(e)) for student in accepted]
+        write_report(report_path, results)
+        return results
+
+    try:
+        cache = EncodingCache(KNOWN_FACES_DIR)
+        for student in accepted:
+            cache.add_encoding(student['filename'], student['encoding'])
+        cache.save()
+    except Exception as e:
+        print(f"⚠️ Warning: Could not update the encoding cache ({e}). recognize.py will encode the photos on startup.")
+    for student in accepted:
+        create_variants(KNOWN_FACES_DIR, student['filename'])
+
+    results += [dict(student, status='enrolled', detail="") for student in accepted]
+    write_report(report_path, results)
+    print(f"✅ Enrolled {len(accepted)} of {len(results)} students. "
+          f"{len(results) - len(accepted)} rejected; see '{report_path}'.")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Register many students at once from a roster CSV "
+                    f"(columns: {', '.join(ROSTER_COLUMNS)}) and a directory of photos.")
+    parser.add_argument('roster', help="Roster CSV; 'photo' is a filename inside the photo directory")
+    parser.add_argument('photos_dir', help="Directory containing the roster's photos")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Processes used for face detection")
+    parser.add_argument('--report', default=REPORT_FILENAME, help="Where to write the per-row results CSV")
+    parser.add_argument('--dry-run', action='store_true', help="Check the photos without enrolling anyone")
+    args = parser.parse_args()
+
+    try:
+        bulk_enroll(args.roster, args.photos_dir, args.workers, args.report, args.dry_run)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
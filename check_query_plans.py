@@ -0,0 +1,74 @@
+import sys
+
+from db import get_connection
+from migrations import current_version, LATEST_VERSION
+from student_directory import build_query
+
+DB_NAME = 'facebeam.db'
+
+# (description, SQL, sample parameters, index the plan must use)
+HOT_QUERIES = [
+    ("Dashboard status check",
+     "SELECT COUNT(*) FROM attendance WHERE name = ? AND subject_id = ? AND date = ?",
+     ('virat', 1, '2025-10-18'), 'idx_attendance_once_per_class'),
+    ("Dashboard attended count",
+     "SELECT COUNT(*) FROM attendance WHERE name = ?",
+     ('virat',), 'idx_attendance_once_per_class'),
+    ("Absentees: present today",
+     "SELECT name FROM attendance WHERE subject_id = ? AND date = ?",
+     (1, '2025-10-18'), 'idx_attendance_subject_date'),
+    ("Student history by id",
+     "SELECT subject_id FROM attendance WHERE student_db_id = ? AND date BETWEEN ? AND ?",
+     (1, '2025-10-01', '2025-10-31'), 'idx_attendance_student_date'),
+    ("Pivot report attendance",
+     "SELECT name, subject_id FROM attendance WHERE subject_id IN (?, ?, ?) AND date = ?",
+     (1, 2, 3, '2025-10-18'), 'idx_attendance_subject_date'),
+    ("Range report attendance (no temp sort)",
+     "SELECT date, name, group_concat(subject_id) FROM attendance WHERE date BETWEEN ? AND ? "
+     "GROUP BY date, name ORDER BY date, name",
+     ('2025-01-01', '2025-12-31'), 'idx_attendance_date_name'),
+    ("Live class lookup",
+     "SELECT subject_id FROM timetable WHERE day_of_week = ? AND start_time <= ? AND end_time >= ?",
+     (0, '09:00', '09:00'), 'idx_timetable_day_start'),
+]
+
+
+# /api/students pages, checked with the SQL student_directory.build_query sends:
+# (description, build_query arguments, indexes the plan must use, may sort in a temp B-tree).
+# A search reads three prefix indexes at once, so its matches come back unordered and are
+# sorted; that sort covers only the students matching the prefix, never the whole table.
+CLASS = {'branch': 'CSE', 'section': 'A', 'year': '3'}
+STUDENT_LIST_QUERIES = [
+    ("Student list page after cursor", {'after': 'Virat'}, ('sqlite_autoindex_students',), False),
+    ("Student list by class", {'filters': CLASS, 'after': 'Virat'}, ('idx_students_class',), False),
+    ("Student search in a class", {'search': 'vir', 'filters': CLASS, 'after': 'Virat'}, ('idx_students_class',), False),
+    ("Student prefix search (sorts matches)", {'search': 'vir', 'after': 'Virat'},
+     ('idx_students_name_nocase', 'idx_students_roll_number', 'idx_students_college_id'), True),
+]
+
+
+def _checks():
+    for description, sql, params, index in HOT_QUERIES:
+        yield description, sql, params, (index,), False
+    for description, arguments, indexes, temp_sort in STUDENT_LIST_QUERIES:
+        yield (description, *build_query(**arguments), indexes, temp_sort)
+
+
+def check_query_plans(conn):
+    """Runs EXPLAIN QUERY PLAN on every hot query. Returns True if all of them use their indexes."""
+    all_ok = True
+    for description, sql, params, indexes, temp_sort in _checks():
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        ok = (all(any(index in step for step in plan) for index in indexes)
+              and not any(step.startswith('SCAN') for step in plan)
+              and (temp_sort or not any('TEMP B-TREE' in step for step in plan)))
+        all_ok = all_ok and ok
+        print(f"{'✅' if ok else '❌'} {description}: {' / '.join(plan)}")
+    return all_ok
+
+if __name__ == '__main__':
+    conn = get_connection(DB_NAME)
+    version = current_version(conn)
+    if version < LATEST_VERSION:
+        print(f"⚠️ Schema is at version {version}; run database_setup.py to migrate to {LATEST_VERSION} first.")
+    sys.exit(0 if check_query_plans(conn) else 1)
@@ -1,27 +1,18 @@
 import sqlite3
+from db import get_connection
+from migrations import migrate, current_version, LATEST_VERSION
 
 DB_NAME = 'facebeam.db'
-conn = sqlite3.connect(DB_NAME)
-cursor = conn.cursor()
+# Opening through db.py also switches the file to WAL journal mode
+conn = get_connection(DB_NAME)
 
-# 1. Update Students Table with Admission Details
+# Bring the schema up to date. Each migration runs once and is recorded in
+# PRAGMA user_version, so this script is safe to run after every deploy.
 try:
-    cursor.execute("ALTER TABLE students ADD COLUMN student_id TEXT UNIQUE")
-    cursor.execute("ALTER TABLE students ADD COLUMN section TEXT")
-    cursor.execute("ALTER TABLE students ADD COLUMN year TEXT")
-    print("Columns added to 'students' table.")
-except sqlite3.OperationalError:
-    print("Columns for admission details already exist in 'students' table.")
-
-# 2. Update Attendance Table to use student_id instead of name
-# This is better for data integrity
-try:
-    cursor.execute("ALTER TABLE attendance ADD COLUMN student_db_id INTEGER REFERENCES students(id)")
-    print("Column 'student_db_id' added to 'attendance' table.")
-except sqlite3.OperationalError:
-    print("Column 'student_db_id' already exists in 'attendance' table.")
-
-conn.commit()
-conn.close()
-
-print(f"✅ Database '{DB_NAME}' schema updated successfully.")
\ No newline at end of file
+    print(f"Database '{DB_NAME}' is at schema version {current_version(conn)} (latest: {LATEST_VERSION}).")
+    applied = migrate(conn)
+    if not applied:
+        print("Schema already up to date.")
+    print(f"✅ Database '{DB_NAME}' schema updated successfully.")
+except sqlite3.Error as e:
+    print(f"❌ Migration failed, no changes from the failing step were kept: {e}")
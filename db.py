@@ -0,0 +1,170 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+DB_NAME = 'facebeam.db'
+
+# Applied to every pooled connection. journal_mode=WAL is persistent in the file;
+# the others are per-connection, which is why connections are reused rather than reopened.
+PRAGMAS = (
+    ("journal_mode", "WAL"),        # Readers no longer block the writer (and vice versa)
+    ("synchronous", "NORMAL"),      # Safe with WAL: a crash can't corrupt, only drop the last commits
+    ("cache_size", -16000),         # 16 MB page cache per connection (negative = KiB)
+    ("mmap_size", 268435456),       # Read pages through a 256 MB memory map instead of read() calls
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),         # Wait up to 5 s for the write lock instead of failing immediately
+)
+# Compiled statements kept per connection, keyed by SQL text, so hot queries are prepared once
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+# Connections handed back by release() wait here for the next thread that needs one, so a
+# server that starts a new thread per request (app.run(threaded=True)) still reuses tuned
+# connections. At most this many idle connections are kept per database; extras are closed.
+MAX_IDLE_CONNECTIONS = 8
+_idle = {}
+_idle_lock = threading.Lock()
+# Called as observer(sql, seconds) after each statement on connections opened while it is set
+_query_observer = None
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Reports how long each execute() took (for a SELECT, until the first row is ready) to the query observer."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            observer = _query_observer
+            if observer is not None:
+                observer(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            observer = _query_observer
+            if observer is not None:
+                observer(sql, time.perf_counter() - start)
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def set_query_observer(observer):
+    """
+    Has every statement on connections opened from now on reported as observer(sql, seconds).
+    Set it before the first get_connection(); connections opened without an observer
+    are plain sqlite3 connections and cost nothing extra. None stops the reports.
+    """
+    global _query_observer
+    _query_observer = observer
+
+
+@lru_cache(maxsize=1024)
+def statement_label(sql):
+    """A short, stable name for a statement: whitespace collapsed, `?, ?, ?` lists folded, cut to 120 characters."""
+    sql = ' '.join(sql.split())
+    sql = re.sub(r'\?(\s*,\s*\?)+', '?, ...', sql)
+    return sql if len(sql) <= 120 else sql[:117] + '...'
+
+
+def _open(path):
+    # check_same_thread=False: a released connection is picked up by another thread,
+    # but only ever used by one thread at a time
+    conn = sqlite3.connect(path, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False,
+                           factory=TimedConnection if _query_observer else sqlite3.Connection)
+    conn.row_factory = sqlite3.Row  # Rows work both as tuples (row[0]) and by column name
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def get_connection(db_path=None):
+    """
+    Returns this thread's connection to `db_path` (default facebeam.db). The first call
+    in a thread takes an idle connection from the pool, or opens and tunes a new one;
+    later calls return the same connection until release(). Do not close it.
+    """
+    path = os.path.abspath(db_path or DB_NAME)
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        with _idle_lock:
+            idle = _idle.get(path)
+            conn = idle.pop() if idle else None
+        connections[path] = conn = conn or _open(path)
+    return conn
+
+
+def release(db_path=None):
+    """
+    Rolls back anything a failed caller left uncommitted and hands this thread's
+    connection back to the pool for the next thread. Call it when a unit of work
+    (e.g. a request) is done; long-lived threads can keep their connection instead.
+    """
+    connections = getattr(_local, 'connections', {})
+    paths = [os.path.abspath(db_path)] if db_path else list(connections)
+    for path in paths:
+        conn = connections.pop(path, None)
+        if conn is None:
+            continue
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()  # Not safe to hand on
+            continue
+        with _idle_lock:
+            idle = _idle.setdefault(path, [])
+            if len(idle) < MAX_IDLE_CONNECTIONS:
+                idle.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+
+
+@contextmanager
+def transaction(db_path=None, immediate=False):
+    """
+    Runs a block in one transaction on the pooled connection: commits on success,
+    rolls back on error. `immediate=True` takes the write lock up front.
+    """
+    conn = get_connection(db_path)
+    if immediate and not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def close_all():
+    """Closes this thread's connections and the idle ones in the pool (e.g. before deleting the database file)."""
+    connections = getattr(_local, 'connections', {})
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+    with _idle_lock:
+        idle = [conn for conns in _idle.values() for conn in conns]
+        _idle.clear()
+    for conn in idle:
+        conn.close()
@@ -0,0 +1,258 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import cv2
+import face_recognition
+import numpy as np
+
+from motion_gate import MotionGate
+from track_manager import TrackManager
+
+# Pipeline modes for recognize.py. 'full' is the original behaviour: full-resolution
+# detection and encoding on every frame. The others detect on a downscaled copy,
+# only every Nth frame, and follow faces in between with a template tracker. The
+# motion gate (motion_gate.py) skips detection on frames where nothing moved.
+PIPELINE_PRESETS = {
+    'full':     {'detection_scale': 1.0,  'detect_every': 1, 'tracker': None,       'motion_gate': False},
+    'balanced': {'detection_scale': 0.5,  'detect_every': 3, 'tracker': 'template', 'motion_gate': True},
+    'fast':     {'detection_scale': 0.25, 'detect_every': 5, 'tracker': 'template', 'motion_gate': True},
+}
+
+# Template-match score below which a tracked face is considered lost until the next detection
+TRACK_MIN_SCORE = 0.5
+
+
+def locate_faces(small_rgb, detection_scale, upsample=1, regions=None):
+    """
+    Detects faces on a frame already downscaled by `detection_scale` and returns
+    full-resolution (top, right, bottom, left) boxes. With `regions` (full-resolution
+    boxes from the motion gate) only those parts of the frame are searched.
+    """
+    boxes = []
+    for region in regions if regions is not None else [None]:
+        top, left, crop = 0, 0, small_rgb
+        if region is not None:
+            top, right, bottom, left = (int(round(v * detection_scale)) for v in region)
+            crop = np.ascontiguousarray(small_rgb[top:bottom, left:right])
+            if crop.size == 0:
+                continue
+        for t, r, b, l in face_recognition.face_locations(crop, number_of_times_to_upsample=upsample):
+            boxes.append(tuple(int(round(v / detection_scale)) for v in (t + top, r + left, b + top, l + left)))
+    return boxes
+
+
+class StageTimer:
+    """
+    Accumulates per-stage wall time and prints FPS plus mean ms/frame per stage.
+    Safe to share between the threads of the concurrent edge pipeline.
+    With keep_samples=True every individual timing is also kept (for the whole
+    run, not just the report window) so percentiles() can be computed afterwards.
+    With a MetricsRegistry (see metrics.py) every timing also goes into a per-stage
+    histogram and every counter into a Prometheus counter, for the whole run.
+    """
+
+    def __init__(self, report_every=10.0, keep_samples=False, metrics=None):
+        self.report_every = report_every
+        self.samples = defaultdict(list) if keep_samples else None
+        self._lock = threading.Lock()
+        self.stage_seconds = self.events = self.frames_total = None
+        if metrics is not None:
+            self.stage_seconds = metrics.histogram('edge_stage_seconds', "Time spent in each edge pipeline stage.", ('stage',))
+            self.events = metrics.counter('edge_events_total', "Edge pipeline events (dropped, gated, skipped...).", ('event',))
+            self.frames_total = metrics.counter('edge_frames_total', "Frames processed by the edge pipeline.")
+        self._reset()
+
+    def _reset(self):
+        self.totals = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.frames = 0
+        self.window_start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        """Records time measured elsewhere, e.g. inside a worker process."""
+        with self._lock:
+            self.totals[name] += seconds
+            if self.samples is not None:
+                self.samples[name].append(seconds)
+        if self.stage_seconds is not None:
+            self.stage_seconds.observe(seconds, stage=name)
+
+    def count(self, name, n=1):
+        """Bumps an event counter (dropped frames, queued uploads...) shown in the report."""
+        with self._lock:
+            self.counters[name] += n
+        if self.events is not None:
+            self.events.inc(n, event=name)
+
+    def frame_done(self):
+        """Counts a frame and prints a report once per `report_every` seconds."""
+        if self.frames_total is not None:
+            self.frames_total.inc()
+        with self._lock:
+            self.frames += 1
+            elapsed = time.perf_counter() - self.window_start
+            if not (self.report_every and elapsed >= self.report_every):
+                return
+            report = self._summary()
+            self._reset()
+        print(report)
+
+    def summary(self):
+        with self._lock:
+            return self._summary()
+
+    def percentiles(self, points=(50, 90, 99)):
+        """{stage: [ms at each percentile]} over all kept samples (requires keep_samples=True)."""
+        with self._lock:
+            samples = {name: sorted(values) for name, values in (self.samples or {}).items()}
+        return {
+            name: [values[min(len(values) - 1, int(len(values) * p / 100))] * 1000 for p in points]
+            for name, values in samples.items() if values
+        }
+
+    def _summary(self):
+        elapsed = max(time.perf_counter() - self.window_start, 1e-9)
+        frames = max(self.frames, 1)
+        parts = [f"{name} {total / frames * 1000:.1f} ms" for name, total in self.totals.items()]
+        parts += [f"{name} {n}" for name, n in self.counters.items()]
+        return f"📊 {self.frames / elapsed:.1f} FPS | " + " | ".join(parts)
+
+
+class DetectionPipeline:
+    """
+    Turns frames into tracked, recognized faces.
+
+    Detection runs on a copy downscaled by `detection_scale` and only on every
+    `detect_every`-th frame; boxes are mapped back to full resolution. Between
+    detections, the 'template' tracker follows each face by template matching on
+    the small grayscale frame. Faces are encoded at full resolution, but only until
+    their track has collected enough agreeing matches (see track_manager.py).
+    With `motion_gate`, detection frames where nothing moved are skipped and small
+    changes are only searched where they happened.
+    """
+
+    def __init__(self, matcher, detection_scale=0.25, detect_every=5, tracker='template',
+                 upsample=1, timer=None, motion_gate=False):
+        self.matcher = matcher
+        self.detection_scale = detection_scale
+        self.detect_every = max(1, detect_every)
+        self.tracker = tracker
+        self.upsample = upsample
+        self.timer = timer or StageTimer(report_every=0)
+        self.tracks = TrackManager()
+        self.gate = MotionGate() if motion_gate else None
+        self.frame_index = 0
+        self.next_matcher = None  # Set from the gallery watcher's thread, swapped in between frames
+
+    @classmethod
+    def from_preset(cls, matcher, mode, timer=None, **overrides):
+        settings = dict(PIPELINE_PRESETS[mode], **overrides)
+        return cls(matcher, timer=timer, **settings)
+
+    def set_matcher(self, matcher):
+        """Hands over a matcher built from an updated gallery; it takes effect from the next frame."""
+        self.next_matcher = matcher
+
+    def _swap_matcher(self):
+        matcher, self.next_matcher = self.next_matcher, None
+        removed = set(self.matcher.names) - set(matcher.names)
+        self.matcher = matcher
+        self.tracks.gallery_changed(removed)
+
+    def _to_full(self, box):
+        s = self.detection_scale
+        return tuple(int(round(v / s)) for v in box)
+
+    def _to_small(self, box):
+        s = self.detection_scale
+        return tuple(int(round(v * s)) for v in box)
+
+    def _shrink(self, rgb_frame):
+        if self.detection_scale == 1.0:
+            return rgb_frame
+        return cv2.resize(rgb_frame, (0, 0), fx=self.detection_scale, fy=self.detection_scale,
+                          interpolation=cv2.INTER_AREA)
+
+    def _detect(self, small_rgb, regions=None):
+        with self.timer.stage('detect'):
+            boxes = locate_faces(small_rgb, self.detection_scale, self.upsample, regions)
+
+        self.tracks.update(boxes, regions)
+
+    def _follow(self, small_gray):
+        """Moves every track to the best template match near its previous position."""
+        with self.timer.stage('track'):
+            height, width = small_gray.shape[:2]
+            for track in self.tracks.visible:
+                if track.template is None or track.lost:
+                    continue
+                top, right, bottom, left = self._to_small(track.box)
+                th, tw = track.template.shape[:2]
+                pad_y, pad_x = th // 2, tw // 2
+                y0, y1 = max(0, top - pad_y), min(height, bottom + pad_y)
+                x0, x1 = max(0, left - pad_x), min(width, right + pad_x)
+                window = small_gray[y0:y1, x0:x1]
+                if window.shape[0] < th or window.shape[1] < tw:
+                    track.lost = True
+                    continue
+                scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+                _, best_score, _, (dx, dy) = cv2.minMaxLoc(scores)
+                if best_score < TRACK_MIN_SCORE:
+                    track.lost = True
+                    continue
+                track.box = self._to_full((y0 + dy, x0 + dx + tw, y0 + dy + th, x0 + dx))
+
+    def _encode_and_match(self, rgb_frame, small_gray):
+        visible = self.tracks.visible
+        stale = [t for t in visible if self.tracks.needs_encoding(t)]
+        if len(stale) < len(visible):
+            self.timer.count('skipped', len(visible) - len(stale))
+        if stale:
+            with self.timer.stage('encode'):
+                encodings = face_recognition.face_encodings(rgb_frame, [t.box for t in stale])
+            with self.timer.stage('match'):
+                results = self.matcher.match(encodings)
+            for track, (name, distance) in zip(stale, results):
+                self.tracks.record(track, name, distance)
+
+        if self.tracker == 'template':
+            for track in visible:
+                top, right, bottom, left = self._to_small(track.box)
+                patch = small_gray[max(0, top):bottom, max(0, left):right]
+                track.template = patch.copy() if patch.size else None
+
+    def process(self, frame):
+        """Runs one BGR frame through the pipeline and returns the visible tracks."""
+        if self.next_matcher is not None:
+            self._swap_matcher()
+        with self.timer.stage('resize'):
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            small_rgb = self._shrink(rgb_frame)
+            small_gray = cv2.cvtColor(small_rgb, cv2.COLOR_RGB2GRAY) if self.tracker == 'template' else None
+
+        # Without a tracker, boxes simply hold still until the next detection
+        if self.frame_index % self.detect_every == 0:
+            detect, regions = True, None
+            if self.gate:
+                with self.timer.stage('gate'):
+                    detect, regions = self.gate.check(frame, settled=self.tracks.settled)
+            if detect:
+                self._detect(small_rgb, regions)
+                self._encode_and_match(rgb_frame, small_gray)
+            else:
+                self.timer.count('gated')
+        elif self.tracker == 'template':
+            self._follow(small_gray)
+        self.frame_index += 1
+
+        return [t for t in self.tracks.visible if not t.lost]
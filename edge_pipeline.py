@@ -0,0 +1,341 @@
+import datetime
+import os
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+import cv2
+import face_recognition
+
+from detection_pipeline import StageTimer, locate_faces
+from motion_gate import MotionGate
+from track_manager import TrackManager, box_iou, TRACK_IOU
+
+DEFAULT_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+def put_latest(q, item):
+    """Puts an item on a bounded queue, discarding the oldest entries instead of blocking. Returns how many were dropped."""
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+def detect_and_encode(frame, detection_scale=1.0, upsample=1, skip_boxes=(), regions=None):
+    """
+    Worker-process stage: detects faces on a downscaled copy of a BGR frame (only
+    inside `regions` if given) and encodes them at full resolution. Faces overlapping
+    one of `skip_boxes` (tracks whose identity is already confirmed) are not encoded;
+    their encoding is None. Returns (boxes, encodings, detect_s, encode_s).
+    """
+    start = time.perf_counter()
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    small = rgb_frame
+    if detection_scale != 1.0:
+        small = cv2.resize(rgb_frame, (0, 0), fx=detection_scale, fy=detection_scale, interpolation=cv2.INTER_AREA)
+    boxes = locate_faces(small, detection_scale, upsample, regions)
+    detected = time.perf_counter()
+    to_encode = [i for i, box in enumerate(boxes)
+                 if not any(box_iou(box, skip) >= TRACK_IOU for skip in skip_boxes)]
+    encodings = [None] * len(boxes)
+    if to_encode:
+        for i, encoding in zip(to_encode, face_recognition.face_encodings(rgb_frame, [boxes[i] for i in to_encode])):
+            encodings[i] = encoding
+    return boxes, encodings, detected - start, time.perf_counter() - detected
+
+
+def draw_overlay(frame, faces, current_subject_id):
+    """Draws name boxes and the class-in-session banner onto a BGR frame in place."""
+    for (top, right, bottom, left), name in faces:
+        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+        cv2.rectangle(frame, (left, bottom - 35), (right, bottom), (0, 255, 0), cv2.FILLED)
+        font = cv2.FONT_HERSHEY_DUPLEX
+        cv2.putText(frame, name, (left + 6, bottom - 6), font, 1.0, (255, 255, 255), 1)
+
+    display_text = "No Scheduled Class"
+    if current_subject_id:
+        display_text = f"Class In Session (Subject ID: {current_subject_id})"
+    cv2.putText(frame, display_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
+
+class CameraStream:
+    """One camera of the edge pipeline: its capture, freshest-frame slot and face tracks."""
+
+    def __init__(self, label, video_capture, drop_frames=True):
+        self.label = label
+        self.video_capture = video_capture
+        # Live sources drop frames the workers can't keep up with; recordings are replayed frame by frame
+        self.drop_frames = drop_frames
+        self.frame_queue = queue.Queue(maxsize=1)
+        self.done = threading.Event()   # No more frames: finish what's in flight, then stop
+        self.tracks = TrackManager()    # Only touched by the matcher thread
+        self.skip_boxes = []            # Confirmed tracks' boxes, read by the dispatcher
+        self.settled = True             # Every visible face confirmed (see TrackManager.settled), read by the dispatcher
+        self.gate = None                # MotionGate, used by the dispatcher only
+        self.latest_frame = (0, None)   # (frame number, BGR frame) for display
+        self.latest_faces = []          # [(box, name)] from the most recent processed frame
+
+
+class EdgePipeline:
+    """
+    Concurrent edge agent: capture -> detect/encode -> match -> upload, with display on the main thread.
+    Any number of cameras share one gallery, one matcher and one worker pool.
+
+    - A capture thread per camera reads into a one-slot queue, replacing any frame
+      that has not been picked up yet, so stale frames are dropped instead of queued.
+    - A dispatcher hands frames to a process pool (dlib holds the GIL for most of
+      detection) but only when a worker is free: that is the backpressure. Cameras
+      take turns (round robin), so a busy or fast camera can't starve the others.
+      An optional motion gate (motion_gate.py) holds back frames where nothing moved.
+    - A matcher thread collects results in order, follows faces across frames with a
+      TrackManager (track_manager.py) per camera, matches the new encodings against
+      the gallery and votes them into each track. Workers skip encoding faces on
+      confirmed tracks. Each confirmed identity goes to the uploader (an OutboxSender)
+      once per class, however many cameras see the student; it only writes to the
+      local outbox, posting happens on the sender's own thread.
+    - The main thread shows each camera's latest frame with its latest boxes; 'q' shuts down.
+    """
+
+    def __init__(self, video_captures, matcher, uploader, subject_provider,
+                 detection_scale=0.5, upsample=1, workers=DEFAULT_WORKERS, timer=None, drop_frames=True,
+                 motion_gate=False):
+        """
+        `video_captures` is a list of open sources; `drop_frames` is one flag for all or a list
+        with one per source. With `motion_gate`, frames where nothing moved never reach a worker.
+        """
+        if not isinstance(drop_frames, (list, tuple)):
+            drop_frames = [drop_frames] * len(video_captures)
+        self.streams = [CameraStream(f"cam{i + 1}" if len(video_captures) > 1 else 'camera', capture, drop)
+                        for i, (capture, drop) in enumerate(zip(video_captures, drop_frames))]
+        for stream in self.streams:
+            stream.gate = MotionGate() if motion_gate else None
+        self.matcher = matcher
+        self.next_matcher = None            # Set from the gallery watcher's thread, swapped in by the matcher thread
+        self.uploader = uploader
+        self.subject_provider = subject_provider
+        self.detection_scale = detection_scale
+        self.upsample = upsample
+        self.workers = workers
+        self.timer = timer or StageTimer(report_every=0)
+
+        self.stop_event = threading.Event()
+        self.dispatch_done = threading.Event()
+        self.frame_ready = threading.Condition()   # Signalled by capture threads, waited on by the dispatcher
+        self.result_queue = queue.Queue(maxsize=workers + 1)
+        self.slots = threading.BoundedSemaphore(workers)
+        self.pool = None
+        self.next_stream = 0                # Round-robin position of the dispatcher
+
+        self._lock = threading.Lock()
+        self.current_subject_id = None
+        self.logged = set()                 # (name, subject_id) already uploaded today, across all cameras
+        self.logged_date = None
+
+    def set_matcher(self, matcher):
+        """Hands over a matcher built from an updated gallery; the matcher thread swaps it in before its next frame."""
+        self.next_matcher = matcher
+
+    def _swap_matcher(self):
+        matcher, self.next_matcher = self.next_matcher, None
+        removed = set(self.matcher.names) - set(matcher.names)
+        self.matcher = matcher
+        for stream in self.streams:
+            stream.tracks.gallery_changed(removed)
+            stream.skip_boxes = stream.tracks.skip_boxes()  # Reset tracks need encoding again
+            stream.settled = stream.tracks.settled
+
+    # --- Stages ---
+    def _capture(self, stream):
+        frame_number = 0
+        while not self.stop_event.is_set():
+            with self.timer.stage('capture'):
+                ret, frame = stream.video_capture.read()
+            if not ret:
+                print(f"⚠️ Frame source of {stream.label} returned no frame. Finishing queued frames and stopping it.")
+                stream.done.set()
+                with self.frame_ready:
+                    self.frame_ready.notify()
+                break
+            frame_number += 1
+            with self._lock:
+                stream.latest_frame = (frame_number, frame)
+            if stream.drop_frames:
+                dropped = put_latest(stream.frame_queue, frame)
+                if dropped:
+                    self.timer.count('dropped', dropped)
+            else:
+                while not self.stop_event.is_set():
+                    try:
+                        stream.frame_queue.put(frame, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+            with self.frame_ready:
+                self.frame_ready.notify()
+
+    def _next_frame(self):
+        """Takes a frame from the next camera in turn that has one. Returns (stream, frame) or (None, None)."""
+        count = len(self.streams)
+        for offset in range(count):
+            stream = self.streams[(self.next_stream + offset) % count]
+            try:
+                frame = stream.frame_queue.get_nowait()
+            except queue.Empty:
+                continue
+            self.next_stream = (self.next_stream + offset + 1) % count
+            return stream, frame
+        return None, None
+
+    def _dispatch(self):
+        while not self.stop_event.is_set():
+            # Wait for a free worker first, then take whatever frame is freshest by then
+            if not self.slots.acquire(timeout=0.1):
+                continue
+            stream, frame = self._next_frame()
+            if stream is None:
+                with self.frame_ready:
+                    stream, frame = self._next_frame()
+                    if stream is None:
+                        self.frame_ready.wait(timeout=0.1)
+                if stream is None:
+                    self.slots.release()
+                    if all(s.done.is_set() and s.frame_queue.empty() for s in self.streams):
+                        break
+                    continue
+            regions = None
+            if stream.gate:
+                with self.timer.stage('gate'):
+                    detect, regions = stream.gate.check(frame, settled=stream.settled)
+                if not detect:
+                    # Nothing moved and every face is known: keep the worker for another camera
+                    self.slots.release()
+                    self.timer.count('gated')
+                    continue
+            future = self.pool.submit(detect_and_encode, frame, self.detection_scale, self.upsample,
+                                      stream.skip_boxes, regions)
+            future.add_done_callback(lambda _: self.slots.release())
+            # Never blocks for long: at most `workers` futures exist at a time
+            self.result_queue.put((stream, future, regions))
+        self.dispatch_done.set()
+
+    def _log(self, tracks, current_subject_id):
+        """Uploads each newly confirmed identity once per class, merging sightings from all cameras."""
+        today = datetime.date.today()
+        if today != self.logged_date:
+            self.logged, self.logged_date = set(), today
+        for track in tracks:
+            if not track.confirmed or track.logged_subject == current_subject_id:
+                continue
+            track.logged_subject = current_subject_id
+            key = (track.name, current_subject_id)
+            if key in self.logged:
+                self.timer.count('merged')  # Already reported from another camera (or an earlier track)
+                continue
+            self.logged.add(key)
+            self.uploader.submit(track.name, current_subject_id)
+
+    def _match(self):
+        while not (self.stop_event.is_set() and self.result_queue.empty()):
+            try:
+                stream, future, regions = self.result_queue.get(timeout=0.1)
+            except queue.Empty:
+                if self.dispatch_done.is_set():
+                    self.stop_event.set()  # Every source exhausted and every frame matched
+                continue
+            try:
+                boxes, encodings, detect_s, encode_s = future.result()
+            except CancelledError:
+                continue
+            except Exception as e:
+                print(f"⚠️ Detection worker failed: {e}")
+                continue
+            self.timer.add('detect', detect_s)
+            self.timer.add('encode', encode_s)
+            if self.next_matcher is not None:
+                self._swap_matcher()
+
+            with self.timer.stage('match'):
+                tracks = stream.tracks.update(boxes, regions)
+                pending = [(track, encoding) for track, encoding in zip(tracks, encodings) if encoding is not None]
+                if pending:
+                    results = self.matcher.match([encoding for _, encoding in pending])
+                    for (track, _), (name, distance) in zip(pending, results):
+                        stream.tracks.record(track, name, distance)
+                stream.skip_boxes = stream.tracks.skip_boxes()
+                stream.settled = stream.tracks.settled
+            if len(pending) < len(tracks):
+                self.timer.count('skipped', len(tracks) - len(pending))
+            # Includes faces outside the searched regions, which stay where they were
+            tracks = stream.tracks.visible
+            with self.timer.stage('schedule'):
+                current_subject_id = self.subject_provider()
+
+            faces = [(track.box, track.name) for track in tracks]
+            with self._lock:
+                stream.latest_faces = faces
+                self.current_subject_id = current_subject_id
+
+            if current_subject_id is not None:
+                self._log(tracks, current_subject_id)
+            if len(self.streams) > 1:
+                self.timer.count(stream.label)  # Frames processed per camera, to show the sharing is fair
+            self.timer.frame_done()
+
+    # --- Lifecycle ---
+    def run(self, show_window=True):
+        """
+        Runs until 'q' is pressed (or Ctrl+C / every frame source ends), then shuts
+        everything down. With show_window=False nothing is drawn (headless mode).
+        """
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        threads = [threading.Thread(target=self._capture, args=(stream,), name=f'capture-{stream.label}', daemon=True)
+                   for stream in self.streams]
+        threads += [threading.Thread(target=target, name=name, daemon=True)
+                    for name, target in (('dispatch', self._dispatch), ('match', self._match))]
+        for thread in threads:
+            thread.start()
+
+        shown = [0] * len(self.streams)
+        try:
+            while not self.stop_event.is_set():
+                if not show_window:
+                    time.sleep(0.05)
+                    continue
+                for i, stream in enumerate(self.streams):
+                    with self._lock:
+                        frame_number, frame = stream.latest_frame
+                        faces, current_subject_id = stream.latest_faces, self.current_subject_id
+                    if frame is None or frame_number == shown[i]:
+                        continue
+                    shown[i] = frame_number
+                    with self.timer.stage('display'):
+                        frame = frame.copy()
+                        draw_overlay(frame, faces, current_subject_id)
+                        title = 'FaceBeam' if len(self.streams) == 1 else f'FaceBeam - {stream.label}'
+                        cv2.imshow(title, frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown(threads, close_window=show_window)
+
+    def shutdown(self, threads=(), close_window=True):
+        self.stop_event.set()
+        for thread in threads:
+            thread.join(timeout=2)
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        for stream in self.streams:
+            stream.video_capture.release()
+        if close_window:
+            cv2.destroyAllWindows()
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+KNOWN_FACES_DIR = 'known_faces'
+ENCODING_CACHE_DIR = 'encoding_cache'
+MATRIX_FILENAME = 'encodings.npy'
+INDEX_FILENAME = 'index.json'
+ENCODING_SIZE = 128
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+# Extra photos of the same student: 'virat_sirohi__2.jpg', 'virat_sirohi__lab.jpg', ...
+EXTRA_PHOTO_SEPARATOR = '__'
+
+
+def name_from_filename(filename):
+    """Turns 'virat_sirohi.jpg' (or an extra photo such as 'virat_sirohi__2.jpg') into the display name 'Virat Sirohi'."""
+    stem = os.path.splitext(filename)[0].split(EXTRA_PHOTO_SEPARATOR)[0]
+    return stem.replace('_', ' ').title()
+
+
+def extra_photos(faces_dir, filename):
+    """Filenames of the additional photos stored alongside a student's main photo."""
+    prefix = os.path.splitext(filename)[0] + EXTRA_PHOTO_SEPARATOR
+    return sorted(f for f in os.listdir(faces_dir) if f.startswith(prefix))
+
+
+def file_sha1(path, chunk_size=1 << 16):
+    """Content hash used to tell a re-saved photo from a genuinely new one."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_image_file(path):
+    """Returns the 128-d encoding of the first face in the photo, or None."""
+    # Imported lazily so the Flask server can use the cache without dlib installed
+    import face_recognition
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        pil_image = Image.open(path).convert("RGB")
+    except (OSError, UnidentifiedImageError):
+        return None
+    encodings = face_recognition.face_encodings(np.array(pil_image))
+    return encodings[0] if encodings else None
+
+
+class EncodingCache:
+    """
+    Persistent store of known-face encodings.
+
+    The encodings live in one .npy matrix (memory-mapped on load) next to a
+    JSON index that records, for every photo in known_faces/, its display name,
+    mtime, size, content hash and matrix row. Only photos that were added or
+    changed since the last run are re-encoded; deleted photos are dropped.
+    """
+
+    def __init__(self, faces_dir=KNOWN_FACES_DIR, cache_dir=ENCODING_CACHE_DIR):
+        self.faces_dir = faces_dir
+        self.cache_dir = cache_dir
+        self.matrix_path = os.path.join(cache_dir, MATRIX_FILENAME)
+        self.index_path = os.path.join(cache_dir, INDEX_FILENAME)
+        self._entries = {}   # filename -> index entry
+        self._vectors = {}   # filename -> encoding row (absent for photos with no face)
+        self._matrix = None  # memory-mapped matrix as loaded from disk
+        self._dirty = False
+        self.load()
+
+    # --- Persistence ---
+    def load(self):
+        """Reads the index and memory-maps the matrix; a missing or corrupt cache starts empty."""
+        self._entries, self._vectors, self._matrix = {}, {}, None
+        if not (os.path.exists(self.index_path) and os.path.exists(self.matrix_path)):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            matrix = np.load(self.matrix_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Warning: Encoding cache unreadable ({e}). Rebuilding from scratch.")
+            return
+
+        for entry in index.get('entries', []):
+            row = entry.get('row')
+            if row is not None:
+                if row >= len(matrix):
+                    continue
+                self._vectors[entry['filename']] = matrix[row]
+            self._entries[entry['filename']] = entry
+        self._matrix = matrix
+
+    def save(self):
+        """Writes matrix and index atomically so a crash never leaves them out of step."""
+        if not self._dirty:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        filenames = sorted(self._entries)
+        rows = []
+        for filename in filenames:
+            entry = self._entries[filename]
+            if filename in self._vectors:
+                entry['row'] = len(rows)
+                # A copy, not a view: nothing may still reference the memory map when its file is replaced
+                rows.append(np.array(self._vectors[filename], dtype=np.float64, copy=True))
+            else:
+                entry['row'] = None
+        matrix = np.stack(rows) if rows else np.empty((0, ENCODING_SIZE), dtype=np.float64)
+        del rows
+
+        # Point at the fresh in-memory matrix and let go of the memory map, which Windows
+        # won't let os.replace overwrite while it is still mapped
+        self._vectors = {f: matrix[self._entries[f]['row']] for f in filenames if self._entries[f]['row'] is not None}
+        self._matrix = matrix
+
+        # Unique temp names, so two processes saving at once never write into the same file
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, prefix=MATRIX_FILENAME, suffix='.tmp', delete=False) as tmp:
+            np.save(tmp, matrix)
+        os.replace(tmp.name, self.matrix_path)
+
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.cache_dir, prefix=INDEX_FILENAME,
+                                         suffix='.tmp', delete=False) as tmp:
+            json.dump({'version': 1, 'entries': [self._entries[f] for f in filenames]}, tmp, indent=1)
+        os.replace(tmp.name, self.index_path)
+        self._dirty = False
+
+    # --- Incremental updates ---
+    def _is_image(self, filename):
+        return not filename.startswith('.') and filename.lower().endswith(IMAGE_EXTENSIONS)
+
+    def _refresh(self, filename, encode=encode_image_file):
+        """Re-encodes a single photo if it changed. Returns 'cached', 'encoded' or 'failed'."""
+        path = os.path.join(self.faces_dir, filename)
+        stat = os.stat(path)
+        entry = self._entries.get(filename)
+
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return 'cached' if filename in self._vectors else 'failed'
+
+        sha1 = file_sha1(path)
+        if entry and entry['sha1'] == sha1:
+            # Touched or copied over with identical bytes: keep the encoding, record the new stat
+            entry['mtime'], entry['size'] = stat.st_mtime, stat.st_size
+            self._dirty = True
+            return 'cached' if filename in self._vectors else 'failed'
+
+        encoding = encode(path)
+        self._entries[filename] = {
+            'filename': filename,
+            'name': name_from_filename(filename),
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'sha1': sha1,
+            'row': None,
+        }
+        if encoding is None:
+            self._vectors.pop(filename, None)
+            status = 'failed'
+        else:
+            self._vectors[filename] = encoding
+            status = 'encoded'
+        self._dirty = True
+        return status
+
+    def update_file(self, filename):
+        """Encodes one newly written photo and persists the cache. Returns True if a face was found."""
+        status = self._refresh(filename)
+        self.save()
+        if status == 'failed':
+            print(f"⚠️ Warning: No face found in {filename}. It will not be recognized.")
+        return status != 'failed'
+
+    def add_encoding(self, filename, encoding):
+        """Records an encoding computed elsewhere (e.g. by a worker process) for a photo in faces_dir. Call save() after."""
+        path = os.path.join(self.faces_dir, filename)
+        stat = os.stat(path)
+        self._entries[filename] = {
+            'filename': filename,
+            'name': name_from_filename(filename),
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'sha1': file_sha1(path),
+            'row': None,
+        }
+        self._vectors[filename] = np.asarray(encoding, dtype=np.float64)
+        self._dirty = True
+
+    def remove_file(self, filename):
+        """Drops a deleted photo from the cache."""
+        if self._entries.pop(filename, None) is not None:
+            self._vectors.pop(filename, None)
+            self._dirty = True
+            self.save()
+
+    def sync(self, encode=encode_image_file):
+        """
+        Brings the cache in line with known_faces/ and returns (encodings, names).
+        `encode(path)` computes new encodings; pass one that runs in another process to keep this thread light.
+        """
+        on_disk = {f for f in os.listdir(self.faces_dir) if self._is_image(f)}
+        stats = {'cached': 0, 'encoded': 0, 'failed': 0}
+
+        for filename in sorted(on_disk):
+            previously_failed = filename in self._entries and filename not in self._vectors
+            status = self._refresh(filename, encode)
+            stats[status] += 1
+            if status == 'failed' and not previously_failed:
+                print(f"⚠️ Warning: Could not process {filename}. Skipping.")
+
+        removed = [f for f in self._entries if f not in on_disk]
+        for filename in removed:
+            del self._entries[filename]
+            self._vectors.pop(filename, None)
+        if removed:
+            self._dirty = True
+
+        self.save()
+        print(f"♻️ Encoding cache: {stats['cached']} reused, {stats['encoded']} encoded, "
+              f"{stats['failed']} without a face, {len(removed)} removed.")
+        return self.encodings, self.names
+
+    # --- Gallery access ---
+    def entry(self, filename):
+        """Index entry of one photo (name, mtime, size, sha1, row), or None."""
+        return self._entries.get(filename)
+
+    def encoding(self, filename):
+        """Encoding of one photo, or None if it isn't cached or has no face."""
+        return self._vectors.get(filename)
+
+    @property
+    def filenames(self):
+        return [f for f in sorted(self._entries) if f in self._vectors]
+
+    @property
+    def names(self):
+        return [self._entries[f]['name'] for f in self.filenames]
+
+    @property
+    def encodings(self):
+        filenames = self.filenames
+        if not filenames:
+            return np.empty((0, ENCODING_SIZE), dtype=np.float64)
+        # Unchanged since load/save: hand back the matrix itself instead of copying rows
+        if self._matrix is not None and len(self._matrix) == len(filenames) and not self._dirty:
+            return self._matrix
+        return np.stack([self._vectors[f] for f in filenames])
@@ -0,0 +1,128 @@
+import numpy as np
+
+from encoding_cache import ENCODING_SIZE
+from gallery_index import build_index, kmeans
+
+DEFAULT_TOLERANCE = 0.6  # Same default as face_recognition.compare_faces
+UNKNOWN_NAME = "Unknown"
+
+# Students with several photos are matched through centroids of their encodings.
+# A centroid this far inside the tolerance is accepted as is; closer calls are
+# re-checked against the student's individual photos.
+REFINE_MARGIN = 0.1
+# How many nearest centroids each face is checked against
+REFINE_CANDIDATES = 5
+# One extra centroid per this many photos (up to MAX_CENTROIDS_PER_STUDENT), so a
+# student photographed both with and without glasses isn't averaged into neither
+PHOTOS_PER_CENTROID = 4
+MAX_CENTROIDS_PER_STUDENT = 3
+# A photo further than this from the centroid of the student's other photos is
+# treated as mislabelled or unusable and left out (needs at least 3 photos to tell)
+OUTLIER_DISTANCE = DEFAULT_TOLERANCE
+
+
+def find_outliers(samples, max_distance=OUTLIER_DISTANCE):
+    """Boolean mask of samples that are far from the centroid of the remaining ones."""
+    if len(samples) < 3:
+        return np.zeros(len(samples), dtype=bool)
+    total = samples.sum(axis=0)
+    # Leave-one-out centroids: (sum - sample) / (n - 1) for every sample at once
+    others = (total[None, :] - samples) / (len(samples) - 1)
+    return np.linalg.norm(samples - others, axis=1) > max_distance
+
+
+class FaceMatcher:
+    """
+    Matches every face in a frame against the known-face gallery in one go.
+
+    A student may have any number of photos (several (encoding, name) pairs with
+    the same name). Each student's encodings are summarised as one or a few
+    centroids plus a spread (the largest distance from a centroid to its photos),
+    and only the centroids go into the gallery index (see gallery_index.py), so
+    search cost grows with the number of students rather than photos. A face
+    whose nearest centroid is a near-threshold call is compared with that
+    student's individual photos, which are kept in one contiguous float32 array.
+    With a single photo per student this is exactly the old one-vector match.
+    """
+
+    def __init__(self, encodings, names, tolerance=DEFAULT_TOLERANCE, index_kind='brute', index_options=None):
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        if len(encodings) != len(names):
+            raise ValueError(f"Got {len(encodings)} encodings but {len(names)} names.")
+        self.tolerance = tolerance
+
+        by_name = {}
+        for row, name in enumerate(names):
+            by_name.setdefault(name, []).append(row)
+
+        self.names = list(by_name)           # One entry per student
+        self.outliers = []                   # Input rows left out as outliers
+        centroids, owners, radii, offsets, samples = [], [], [], [0], []
+        for student, rows in enumerate(by_name.values()):
+            student_samples = encodings[rows]
+            outliers = find_outliers(student_samples)
+            self.outliers.extend(row for row, outlier in zip(rows, outliers) if outlier)
+            student_samples = student_samples[~outliers]
+
+            n_centroids = min(MAX_CENTROIDS_PER_STUDENT, max(1, len(student_samples) // PHOTOS_PER_CENTROID))
+            if n_centroids > 1:
+                centers = kmeans(student_samples, n_centroids)
+                labels = np.linalg.norm(student_samples[:, None, :] - centers[None, :, :], axis=2).argmin(axis=1)
+            else:
+                labels = np.zeros(len(student_samples), dtype=np.int64)
+
+            for label in np.unique(labels):
+                members = student_samples[labels == label]
+                centroid = members.mean(axis=0)
+                centroids.append(centroid)
+                owners.append(student)
+                radii.append(float(np.linalg.norm(members - centroid, axis=1).max()))
+                samples.append(members)
+                offsets.append(offsets[-1] + len(members))
+
+        self.index = build_index(np.array(centroids, dtype=np.float32).reshape(-1, ENCODING_SIZE),
+                                 index_kind, **(index_options or {}))
+        self.owners = np.array(owners, dtype=np.int64)
+        self.radii = np.array(radii, dtype=np.float32)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.samples = (np.ascontiguousarray(np.concatenate(samples), dtype=np.float32) if samples
+                        else np.empty((0, ENCODING_SIZE), dtype=np.float32))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _nearest_sample(self, encoding, centroid):
+        samples = self.samples[self.offsets[centroid]:self.offsets[centroid + 1]]
+        return float(np.sqrt(((samples - encoding) ** 2).sum(axis=1).min()))
+
+    def match(self, face_encodings):
+        """Returns one (name, distance) per face; name is 'Unknown' above the tolerance."""
+        if len(face_encodings) == 0:
+            return []
+        if len(self.names) == 0:
+            return [(UNKNOWN_NAME, float('inf'))] * len(face_encodings)
+
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        distances, indices = self.index.search(queries, k=min(REFINE_CANDIDATES, len(self.index)))
+        results = []
+        for query, row_distances, row_indices in zip(queries, distances, indices):
+            best_student, best_distance = -1, float(row_distances[0])
+            for distance, centroid in zip(row_distances, row_indices):
+                if centroid < 0:
+                    continue
+                distance = float(distance)
+                # No photo behind this centroid can be closer than (centroid distance - spread)
+                if distance - self.radii[centroid] > self.tolerance:
+                    continue
+                if distance > self.tolerance - REFINE_MARGIN and self.radii[centroid] > 0:
+                    distance = min(distance, self._nearest_sample(query, centroid))
+                if best_student < 0 or distance < best_distance:
+                    best_student, best_distance = self.owners[centroid], distance
+                # Sorted by centroid distance: a clear match on the nearest one settles it
+                if distance <= self.tolerance - REFINE_MARGIN:
+                    break
+            if best_student >= 0 and best_distance <= self.tolerance:
+                results.append((self.names[best_student], best_distance))
+            else:
+                results.append((UNKNOWN_NAME, best_distance))
+        return results
@@ -0,0 +1,185 @@
+import argparse
+import json
+import struct
+
+import numpy as np
+
+from db import get_connection
+from encoding_cache import EncodingCache, ENCODING_SIZE, name_from_filename
+
+DB_NAME = 'facebeam.db'
+KNOWN_FACES_DIR = 'known_faces'
+
+# Server-side registry of face encodings (created by migration 8). Encodings are computed
+# once, when a student registers, and stored as float32 BLOBs. Every change takes the next
+# gallery version; deleted photos leave a tombstone, so an edge device that last synced at
+# version V can be sent just the rows and tombstones newer than V.
+REGISTRY_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS face_encodings (
+        filename TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        sha1 TEXT,
+        encoding BLOB NOT NULL,
+        version INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_face_encodings_version ON face_encodings (version)",
+    """CREATE TABLE IF NOT EXISTS face_encodings_removed (
+        filename TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_face_encodings_removed_version ON face_encodings_removed (version)",
+    """CREATE TABLE IF NOT EXISTS gallery_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )""",
+    "INSERT OR IGNORE INTO gallery_version (id, version) VALUES (1, 0)",
+)
+
+# Gallery payload served to edge devices:
+#   b'FBGL' | uint32 little-endian header length | JSON header | n x 128 little-endian matrix
+# The header carries the version, whether it's a delta ('since'), the dtype, the filename
+# and name of every matrix row, and (for deltas) the filenames removed since then.
+PAYLOAD_MAGIC = b'FBGL'
+PAYLOAD_DTYPES = {'float32': '<f4', 'float16': '<f2'}
+
+
+def create_registry_tables(conn):
+    for statement in REGISTRY_SCHEMA:
+        conn.execute(statement)
+
+
+def gallery_version(conn):
+    return conn.execute("SELECT version FROM gallery_version WHERE id = 1").fetchone()[0]
+
+
+def _next_version(conn):
+    conn.execute("UPDATE gallery_version SET version = version + 1 WHERE id = 1")
+    return gallery_version(conn)
+
+
+def store_encodings(conn, rows):
+    """
+    Adds or replaces encodings, given as (filename, encoding, sha1) tuples, under one new
+    gallery version. Runs inside the caller's transaction; the caller commits.
+    """
+    if not rows:
+        return
+    version = _next_version(conn)
+    conn.executemany(
+        "INSERT INTO face_encodings (filename, name, sha1, encoding, version) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(filename) DO UPDATE SET name = excluded.name, sha1 = excluded.sha1, "
+        "encoding = excluded.encoding, version = excluded.version",
+        [(filename, name_from_filename(filename), sha1,
+          np.asarray(encoding, dtype='<f4').reshape(ENCODING_SIZE).tobytes(), version)
+         for filename, encoding, sha1 in rows]
+    )
+    conn.executemany("DELETE FROM face_encodings_removed WHERE filename = ?", [(row[0],) for row in rows])
+
+
+def store_cached_encoding(conn, encoding_cache, filename):
+    """
+    Stores the encoding an EncodingCache holds for one photo, as every registration
+    path does right after encoding it. Returns False if no face was found in it. The caller commits.
+    """
+    encoding = encoding_cache.encoding(filename)
+    if encoding is None:
+        return False
+    store_encodings(conn, [(filename, encoding, encoding_cache.entry(filename)['sha1'])])
+    return True
+
+
+def remove_encodings(conn, filenames):
+    """Deletes encodings and records tombstones under one new gallery version. The caller commits."""
+    filenames = [f for f in filenames
+                 if conn.execute("SELECT 1 FROM face_encodings WHERE filename = ?", (f,)).fetchone()]
+    if not filenames:
+        return
+    version = _next_version(conn)
+    conn.executemany("DELETE FROM face_encodings WHERE filename = ?", [(f,) for f in filenames])
+    conn.executemany(
+        "INSERT INTO face_encodings_removed (filename, version) VALUES (?, ?) "
+        "ON CONFLICT(filename) DO UPDATE SET version = excluded.version",
+        [(f, version) for f in filenames]
+    )
+
+
+def pack_gallery(conn, since=None, dtype='float32'):
+    """
+    Builds the gallery payload: everything, or with `since` only what changed after that
+    version. Returns (version, payload bytes). Reads in one transaction so the rows and
+    the version number agree.
+    """
+    with_transaction = not conn.in_transaction
+    if with_transaction:
+        conn.execute("BEGIN")
+    try:
+        version = gallery_version(conn)
+        if since is None:
+            rows = conn.execute("SELECT filename, name, encoding FROM face_encodings ORDER BY filename").fetchall()
+            removed = []
+        else:
+            rows = conn.execute("SELECT filename, name, encoding FROM face_encodings WHERE version > ? "
+                                "ORDER BY filename", (since,)).fetchall()
+            removed = [r[0] for r in conn.execute(
+                "SELECT filename FROM face_encodings_removed WHERE version > ? ORDER BY filename", (since,))]
+    finally:
+        if with_transaction:
+            conn.rollback()
+
+    matrix = np.frombuffer(b''.join(row[2] for row in rows), dtype='<f4').reshape(-1, ENCODING_SIZE)
+    header = json.dumps({
+        'version': version,
+        'since': since,
+        'dtype': dtype,
+        'filenames': [row[0] for row in rows],
+        'names': [row[1] for row in rows],
+        'removed': removed,
+    }).encode('utf-8')
+    body = matrix.astype(PAYLOAD_DTYPES[dtype]).tobytes()
+    return version, PAYLOAD_MAGIC + struct.pack('<I', len(header)) + header + body
+
+
+def unpack_gallery(payload):
+    """Inverse of pack_gallery: returns (header dict, float32 matrix)."""
+    if payload[:4] != PAYLOAD_MAGIC:
+        raise ValueError("Not a FaceBeam gallery payload.")
+    (header_length,) = struct.unpack('<I', payload[4:8])
+    header = json.loads(payload[8:8 + header_length].decode('utf-8'))
+    matrix = np.frombuffer(payload[8 + header_length:], dtype=PAYLOAD_DTYPES[header['dtype']])
+    return header, matrix.reshape(-1, ENCODING_SIZE).astype(np.float32)
+
+
+def sync_from_cache(conn, encoding_cache):
+    """
+    Makes the registry match an EncodingCache: stores new or changed encodings and removes
+    ones whose photo is gone. Used to fill the registry on existing installs. Returns (stored, removed).
+    """
+    registered = {row[0]: row[1] for row in conn.execute("SELECT filename, sha1 FROM face_encodings")}
+    encodings = encoding_cache.encodings
+    cached = {}
+    for row, filename in enumerate(encoding_cache.filenames):
+        cached[filename] = (encodings[row], encoding_cache.entry(filename)['sha1'])
+    changed = [(f, encoding, sha1) for f, (encoding, sha1) in cached.items() if registered.get(f, '') != sha1]
+    gone = [f for f in registered if f not in cached]
+    store_encodings(conn, changed)
+    remove_encodings(conn, gone)
+    return len(changed), len(gone)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fill or check the server-side face encoding registry.")
+    parser.add_argument('--sync', action='store_true',
+                        help="Encode new photos in known_faces/ and copy every encoding into the registry")
+    args = parser.parse_args()
+
+    conn = get_connection(DB_NAME)
+    if args.sync:
+        encoding_cache = EncodingCache(KNOWN_FACES_DIR)
+        encoding_cache.sync()
+        conn.execute("BEGIN IMMEDIATE")
+        stored, removed = sync_from_cache(conn, encoding_cache)
+        conn.commit()
+        print(f"✅ Registry updated: {stored} encodings stored, {removed} removed.")
+
+    count = conn.execute("SELECT COUNT(*) FROM face_encodings").fetchone()[0]
+    print(f"📦 Registry holds {count} encodings at gallery version {gallery_version(conn)}.")
@@ -0,0 +1,61 @@
+import os
+
+import cv2
+
+from encoding_cache import IMAGE_EXTENSIONS
+
+STREAM_PREFIXES = ('rtsp://', 'rtsps://', 'http://', 'https://')
+
+
+class ImageDirectorySource:
+    """Reads the images in a directory in name order, with the same read()/release() interface as cv2.VideoCapture."""
+
+    def __init__(self, path):
+        self.paths = [os.path.join(path, f) for f in sorted(os.listdir(path))
+                      if f.lower().endswith(IMAGE_EXTENSIONS)]
+        self.position = 0
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        while self.position < len(self.paths):
+            frame = cv2.imread(self.paths[self.position])
+            self.position += 1
+            if frame is not None:
+                return True, frame
+            print(f"⚠️ Warning: Could not read {self.paths[self.position - 1]}. Skipping.")
+        return False, None
+
+    def release(self):
+        self.position = len(self.paths)
+
+
+def is_live_source(source):
+    """Cameras and network streams produce frames in real time; files and directories can be read as fast as we like."""
+    source = str(source)
+    return source.isdigit() or source.lower().startswith(STREAM_PREFIXES)
+
+
+def open_frame_source(source):
+    """
+    Opens a camera index (0, '1'), an RTSP/HTTP stream URL, a video file or a
+    directory of images. Returns an object with read() and release().
+    """
+    source = str(source)
+    if source.isdigit():
+        capture = cv2.VideoCapture(int(source))
+    elif source.lower().startswith(STREAM_PREFIXES):
+        capture = cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+        # Keep only the newest frame buffered so a slow consumer doesn't fall further and further behind
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    elif os.path.isdir(source):
+        capture = ImageDirectorySource(source)
+    elif os.path.isfile(source):
+        capture = cv2.VideoCapture(source)
+    else:
+        raise ValueError(f"Frame source '{source}' is not a camera index, stream URL, video file or image directory.")
+
+    if not capture.isOpened():
+        raise ValueError(f"Could not open frame source '{source}'.")
+    return capture
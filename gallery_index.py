@@ -0,0 +1,244 @@
+import numpy as np
+
+from encoding_cache import ENCODING_SIZE
+
+# Cap on how many gallery vectors k-means trains on; assignment still covers everyone
+KMEANS_TRAIN_SIZE = 20000
+KMEANS_ITERATIONS = 15
+# Codebooks only have 256 entries per sub-space, so a smaller sample trains them well
+PQ_TRAIN_SIZE = 10000
+
+
+def _as_matrix(vectors):
+    return np.ascontiguousarray(np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_SIZE))
+
+
+def squared_distances(queries, vectors, vector_sq_norms=None):
+    """(M, N) matrix of squared Euclidean distances via one matrix product."""
+    if vector_sq_norms is None:
+        vector_sq_norms = np.einsum('ij,ij->i', vectors, vectors)
+    query_sq_norms = np.einsum('ij,ij->i', queries, queries)
+    sq = query_sq_norms[:, None] + vector_sq_norms[None, :] - 2.0 * (queries @ vectors.T)
+    # Rounding can push exact matches slightly below zero
+    np.maximum(sq, 0.0, out=sq)
+    return sq
+
+
+def _top_k(sq, k):
+    """Indices of the k smallest entries per row, sorted ascending."""
+    k = min(k, sq.shape[1])
+    if k < sq.shape[1]:
+        candidates = np.argpartition(sq, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(sq.shape[1]), (sq.shape[0], 1))
+    order = np.take_along_axis(sq, candidates, axis=1).argsort(axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def _assign(vectors, centroids, chunk_size=8192):
+    """Nearest centroid for every vector, chunked to bound the temporary distance matrix."""
+    centroid_sq_norms = np.einsum('ij,ij->i', centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = vectors[start:start + chunk_size]
+        labels[start:start + chunk_size] = squared_distances(chunk, centroids, centroid_sq_norms).argmin(axis=1)
+    return labels
+
+
+def kmeans(vectors, n_clusters, n_iter=KMEANS_ITERATIONS, seed=0):
+    """Plain Lloyd's k-means in NumPy. Returns float32 centroids of shape (n_clusters, dim)."""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        labels = _assign(vectors, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        filled = counts > 0
+        # Sum each cluster's members with one reduceat over label-sorted vectors
+        order = np.argsort(labels, kind='stable')
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        sums = np.add.reduceat(vectors[order], starts, axis=0)
+        centroids[filled] = sums / counts[filled, None]
+        # Re-seed empty clusters on random points so no list stays permanently empty
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+    return centroids
+
+
+def _training_sample(vectors, size, seed=0):
+    if len(vectors) <= size:
+        return vectors
+    rng = np.random.default_rng(seed)
+    return vectors[rng.choice(len(vectors), size, replace=False)]
+
+
+class BruteForceIndex:
+    """Exact search: every query is compared with every gallery vector."""
+
+    def __init__(self, encodings):
+        self.vectors = _as_matrix(encodings)
+        self._sq_norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + self._sq_norms.nbytes
+
+    def search(self, queries, k=1):
+        """Returns (distances, indices), both shaped (len(queries), k)."""
+        queries = _as_matrix(queries)
+        sq = squared_distances(queries, self.vectors, self._sq_norms)
+        indices = _top_k(sq, k)
+        return np.sqrt(np.take_along_axis(sq, indices, axis=1)), indices
+
+
+class ProductQuantizer:
+    """
+    Splits each 128-d vector into `n_subvectors` chunks and stores one byte per
+    chunk (its nearest of 256 sub-centroids). 128 float32s (512 B) become e.g. 16 B.
+    """
+
+    def __init__(self, n_subvectors=16, n_centroids=256):
+        if ENCODING_SIZE % n_subvectors:
+            raise ValueError(f"n_subvectors must divide {ENCODING_SIZE}.")
+        self.n_subvectors = n_subvectors
+        self.n_centroids = n_centroids
+        self.sub_dim = ENCODING_SIZE // n_subvectors
+        self.codebooks = None
+
+    def _split(self, vectors):
+        return vectors.reshape(len(vectors), self.n_subvectors, self.sub_dim)
+
+    def train(self, vectors):
+        sub = self._split(_training_sample(vectors, PQ_TRAIN_SIZE))
+        self.codebooks = np.stack([
+            kmeans(np.ascontiguousarray(sub[:, j]), self.n_centroids, seed=j)
+            for j in range(self.n_subvectors)
+        ])
+        return self
+
+    def encode(self, vectors):
+        sub = self._split(vectors)
+        codes = np.empty((len(vectors), self.n_subvectors), dtype=np.uint8)
+        for j in range(self.n_subvectors):
+            codes[:, j] = _assign(np.ascontiguousarray(sub[:, j]), self.codebooks[j])
+        return codes
+
+    def distance_tables(self, query):
+        """(n_subvectors, n_centroids) squared distances from each query chunk to each sub-centroid."""
+        sub = query.reshape(self.n_subvectors, 1, self.sub_dim)
+        return ((self.codebooks - sub) ** 2).sum(axis=2)
+
+    def asymmetric_sq_distances(self, tables, codes):
+        """Approximate squared distances from one query to many encoded vectors."""
+        return tables[np.arange(self.n_subvectors), codes].sum(axis=1)
+
+
+class IVFIndex:
+    """
+    Inverted-file index: k-means splits the gallery into `n_lists` cells and a
+    query only scans the `n_probe` cells whose centroids are closest.
+
+    Raising n_probe trades latency for recall (n_probe == n_lists is exact).
+    With `pq_subvectors` set, cells hold product-quantized codes instead of raw
+    vectors, shrinking memory at the cost of approximate distances (quantization
+    error inflates them, so re-check the match tolerance when enabling it).
+    """
+
+    def __init__(self, encodings, n_lists=None, n_probe=8, pq_subvectors=None, seed=0):
+        vectors = _as_matrix(encodings)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(len(vectors))))
+        self.n_lists = max(1, min(n_lists, len(vectors)))
+        self.n_probe = n_probe
+        self.size = len(vectors)
+
+        if self.size == 0:
+            self.centroids = np.empty((0, ENCODING_SIZE), dtype=np.float32)
+            self.ids = np.empty(0, dtype=np.int64)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.vectors, self.codes, self.pq = vectors, None, None
+            self._sq_norms = np.empty(0, dtype=np.float32)
+            return
+
+        self.centroids = kmeans(_training_sample(vectors, KMEANS_TRAIN_SIZE, seed), self.n_lists, seed=seed)
+        labels = _assign(vectors, self.centroids)
+
+        # Store cells contiguously: ids[offsets[c]:offsets[c + 1]] are the members of cell c
+        self.ids = np.argsort(labels, kind='stable')
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=self.n_lists))])
+
+        if pq_subvectors:
+            self.pq = ProductQuantizer(pq_subvectors).train(vectors)
+            self.codes = self.pq.encode(vectors[self.ids])
+            self.vectors = None
+        else:
+            self.pq, self.codes = None, None
+            self.vectors = np.ascontiguousarray(vectors[self.ids])
+            self._sq_norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        payload = self.codes.nbytes + self.pq.codebooks.nbytes if self.pq else self.vectors.nbytes + self._sq_norms.nbytes
+        return payload + self.centroids.nbytes + self.ids.nbytes + self.offsets.nbytes
+
+    def _scan(self, query, cells):
+        """Squared distances from one query to every member of the probed cells, plus their rows."""
+        rows, sq = [], []
+        for c in cells:
+            start, end = self.offsets[c], self.offsets[c + 1]
+            if start == end:
+                continue
+            if self.pq:
+                sq.append(self.pq.asymmetric_sq_distances(query, self.codes[start:end]))
+            else:
+                # Cells are contiguous, so each one is scanned through a view without copying
+                sq.append(squared_distances(query[None, :], self.vectors[start:end], self._sq_norms[start:end])[0])
+            rows.append(np.arange(start, end))
+        if not rows:
+            return None, None
+        return np.concatenate(rows), np.concatenate(sq)
+
+    def search(self, queries, k=1):
+        """Returns (distances, indices), both shaped (len(queries), k); missing slots are inf / -1."""
+        queries = _as_matrix(queries)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        if self.size == 0:
+            return distances, indices
+
+        n_probe = min(self.n_probe, self.n_lists)
+        probed = _top_k(squared_distances(queries, self.centroids), n_probe)
+
+        for q, cells in enumerate(probed):
+            query = self.pq.distance_tables(queries[q]) if self.pq else queries[q]
+            rows, sq = self._scan(query, cells)
+            if rows is None:
+                continue
+            best = _top_k(sq[None, :], k)[0]
+            distances[q, :len(best)] = np.sqrt(np.maximum(sq[best], 0.0))
+            indices[q, :len(best)] = self.ids[rows[best]]
+        return distances, indices
+
+
+INDEX_TYPES = {
+    'brute': BruteForceIndex,
+    'ivf': IVFIndex,
+}
+
+
+def build_index(encodings, kind='brute', **options):
+    """Builds a gallery index by name: 'brute', 'ivf', or 'ivf_pq' (IVF with pq_subvectors=16 by default)."""
+    if kind == 'ivf_pq':
+        options.setdefault('pq_subvectors', 16)
+        kind = 'ivf'
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown gallery index '{kind}'. Choose from: brute, ivf, ivf_pq.")
+    return INDEX_TYPES[kind](encodings, **options)
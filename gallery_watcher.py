@@ -0,0 +1,89 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from encoding_cache import encode_image_file
+from remote_gallery import RemoteGallery
+
+POLL_SECONDS = 5.0
+
+
+def directory_signature(path):
+    """(filename, mtime, size) of every file in a directory: changes whenever a photo is added, replaced or deleted."""
+    signature = set()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    signature.add((entry.name, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                continue  # Deleted while we were listing
+    return frozenset(signature)
+
+
+class GalleryWatcher(threading.Thread):
+    """
+    Background thread that keeps the edge agent's matcher in step with known_faces/.
+
+    Every `interval` seconds it compares a cheap listing of the directory with the
+    last one. When a photo was added, replaced or deleted (by /add_student,
+    add_student.py, bulk_enroll.py or /delete_student), the EncodingCache encodes
+    just those photos, in a separate process so the video threads keep the CPU
+    and the GIL, and drops deleted ones. A new matcher is then built off to the side
+    and handed to `on_update`, which swaps it in between two frames.
+
+    Given a RemoteGallery instead of an EncodingCache, each check is a conditional
+    request to the server's /api/gallery, which only returns what changed.
+    """
+
+    def __init__(self, gallery, build_matcher, on_update, interval=POLL_SECONDS):
+        super().__init__(name='gallery-watcher', daemon=True)
+        self.gallery = gallery
+        self.build_matcher = build_matcher
+        self.on_update = on_update
+        self.interval = interval
+        self.remote = isinstance(gallery, RemoteGallery)
+        self.signature = None if self.remote else directory_signature(gallery.faces_dir)
+        self.pool = None
+        self._stop_event = threading.Event()
+
+    def _encode(self, path):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=1)
+        return self.pool.submit(encode_image_file, path).result()
+
+    def _directory_changed(self):
+        signature = directory_signature(self.gallery.faces_dir)
+        if signature == self.signature:
+            return False
+        # Taken before syncing, so a photo written meanwhile triggers another reload next time
+        self.signature = signature
+        self.gallery.sync(encode=self._encode)
+        return True
+
+    def check(self):
+        """Reloads the gallery if it changed since the last check. Returns True if it did."""
+        changed = self.gallery.refresh() if self.remote else self._directory_changed()
+        if not changed:
+            return False
+        matcher = self.build_matcher(self.gallery)
+        print(f"🔄 Gallery changed: now recognizing {len(matcher.names)} students.")
+        self.on_update(matcher)
+        return True
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # A half-written photo or a full disk shouldn't take recognition down; retry next time
+                print(f"⚠️ Gallery reload failed: {e}")
+                self.signature = None
+
+    def close(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout=self.interval)
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
@@ -1,8 +1,15 @@
+import argparse
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 import csv
+from itertools import islice
+from db import get_connection
 
 DB_NAME = 'facebeam.db'
+REPORT_FORMATS = ('csv', 'parquet', 'npy')
+CHUNK_ROWS = 10000  # Rows per Parquet row group / NumPy write
+# Cell values in range reports; NumPy output stores the matching int8 code
+STATUS_CODES = {'Present': 1, 'Absent': 0, '': -1}  # '' = subject not scheduled that day
 
 def generate_pivot_report(report_date_str):
     """
@@ -19,8 +26,7 @@ def generate_pivot_report(report_date_str):
 
     print(f"Generating pivot report for {report_date_str}...")
     
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row # Access columns by name
+    conn = get_connection(DB_NAME) # Rows can be accessed by column name
     cursor = conn.cursor()
 
     try:
@@ -47,8 +53,11 @@ def generate_pivot_report(report_date_str):
             return
 
         # 3. Get all attendance records for the specified date
-        query_attendance = "SELECT name, subject_id FROM attendance WHERE date(timestamp) = ?"
-        cursor.execute(query_attendance, (report_date_str,))
+        # Filtering on the scheduled subjects lets SQLite use the (subject_id, date) index
+        subject_ids = [s['subject_id'] for s in scheduled_subjects]
+        placeholders = ','.join('?' * len(subject_ids))
+        query_attendance = f"SELECT name, subject_id FROM attendance WHERE subject_id IN ({placeholders}) AND date = ?"
+        cursor.execute(query_attendance, (*subject_ids, report_date_str))
         present_records = cursor.fetchall()
         
         # Create a set for quick lookup: {(student_name, subject_id)}
@@ -78,8 +87,6 @@ def generate_pivot_report(report_date_str):
     except sqlite3.Error as e:
         print(f"❌ Database error: {e}")
         return
-    finally:
-        conn.close()
 
     # 5. Write the final report to a CSV file
     output_filename = f'pivot_report_{report_date_str}.csv'
@@ -94,6 +101,182 @@ def generate_pivot_report(report_date_str):
         print(f"❌ Error writing CSV file: {e}")
 
 
+def report_subjects(cursor):
+    """
+    Every subject on the weekly timetable as (id, name) in order of first appearance,
+    and the set of subject ids scheduled on each weekday.
+    """
+    cursor.execute("""
+        SELECT t.day_of_week, s.id, s.name
+        FROM timetable t JOIN subjects s ON t.subject_id = s.id
+        ORDER BY t.day_of_week, t.start_time
+    """)
+    subjects, by_day = {}, {}
+    for row in cursor.fetchall():
+        subjects.setdefault(row['id'], row['name'])
+        by_day.setdefault(row['day_of_week'], set()).add(row['id'])
+    return list(subjects.items()), by_day
+
+
+def scheduled_days(start_date, end_date, by_day):
+    """Dates in the range that have classes on the timetable."""
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in by_day:
+            yield day
+        day += timedelta(days=1)
+
+
+def iter_range_rows(conn, start_date, end_date, students, subjects, by_day):
+    """
+    Yields [date, student name, status per subject] for every student on every day
+    with classes. Attendance comes from one query grouped by (date, name) and read in
+    index order, merged with the sorted student list as it streams, so memory use
+    doesn't grow with the length of the range.
+    """
+    subject_ids = [subject_id for subject_id, _ in subjects]
+    attendance = conn.execute("""
+        SELECT date, name, group_concat(subject_id) AS subject_ids
+        FROM attendance
+        WHERE date BETWEEN ? AND ?
+        GROUP BY date, name
+        ORDER BY date, name
+    """, (start_date.isoformat(), end_date.isoformat()))
+    pending = next(attendance, None)
+
+    for day in scheduled_days(start_date, end_date, by_day):
+        date_str = day.isoformat()
+        scheduled = by_day[day.weekday()]
+        for name in students:
+            # Skip records for days without classes and for names no longer registered
+            while pending is not None and (pending['date'], pending['name']) < (date_str, name):
+                pending = next(attendance, None)
+            present = set()
+            if pending is not None and pending['date'] == date_str and pending['name'] == name:
+                present = {int(subject_id) for subject_id in (pending['subject_ids'] or '').split(',') if subject_id}
+                pending = next(attendance, None)
+            yield [date_str, name] + [
+                'Present' if subject_id in present else 'Absent' if subject_id in scheduled else ''
+                for subject_id in subject_ids
+            ]
+
+
+def write_csv(path, header, rows, row_count):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def write_parquet(path, header, rows, row_count):
+    # Optional dependency, only needed for this output format
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(column, pa.string()) for column in header])
+    with pq.ParquetWriter(path, schema) as writer:
+        while True:
+            chunk = list(islice(rows, CHUNK_ROWS))
+            if not chunk:
+                break
+            columns = [pa.array(column, type=pa.string()) for column in zip(*chunk)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+
+def write_npy(path, header, rows, row_count, name_width=64):
+    """
+    A structured .npy array with one field per column (subjects as int8 codes from
+    STATUS_CODES), written through a memory map so it is never held in memory whole.
+    Load with np.load(path, mmap_mode='r') and index by column name.
+    """
+    import numpy as np
+
+    dtype = [(header[0], 'U10'), (header[1], f'U{name_width}')] + [(column, 'i1') for column in header[2:]]
+    table = np.lib.format.open_memmap(path, mode='w+', dtype=np.dtype(dtype), shape=(row_count,))
+    position = 0
+    while True:
+        chunk = list(islice(rows, CHUNK_ROWS))
+        if not chunk:
+            break
+        table[position:position + len(chunk)] = [
+            (row[0], row[1], *(STATUS_CODES[cell] for cell in row[2:])) for row in chunk
+        ]
+        position += len(chunk)
+    table.flush()
+    del table
+
+
+REPORT_WRITERS = {'csv': write_csv, 'parquet': write_parquet, 'npy': write_npy}
+
+
+def generate_range_report(start_date_str, end_date_str, output_format='csv', output_filename=None):
+    """
+    Generates a term-wide report with one row per student per day with classes and
+    one column per subject (Present / Absent, empty where the subject wasn't
+    scheduled that day), streamed to CSV, Parquet or a NumPy .npy file.
+    Returns the output filename, or None on failure.
+    """
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    except ValueError:
+        print("❌ Error: Invalid date format. Please use YYYY-MM-DD.")
+        return None
+    if end_date < start_date:
+        print("❌ Error: The end date is before the start date.")
+        return None
+    if output_format not in REPORT_WRITERS:
+        print(f"❌ Error: Unknown format '{output_format}'. Choose from {', '.join(REPORT_FORMATS)}.")
+        return None
+
+    print(f"Generating pivot report for {start_date_str} to {end_date_str} ({output_format})...")
+    output_filename = output_filename or f'pivot_report_{start_date_str}_to_{end_date_str}.{output_format}'
+    conn = get_connection(DB_NAME)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT name FROM students ORDER BY name")
+        students = [row['name'] for row in cursor.fetchall()]
+        if not students:
+            print("⚠️ Warning: No students found in the database.")
+            return None
+        subjects, by_day = report_subjects(cursor)
+        if not subjects:
+            print("ℹ️ The timetable is empty.")
+            return None
+
+        header = ['Date', 'Student Name'] + [name for _, name in subjects]
+        row_count = sum(1 for _ in scheduled_days(start_date, end_date, by_day)) * len(students)
+        rows = iter_range_rows(conn, start_date, end_date, students, subjects, by_day)
+        writer = REPORT_WRITERS[output_format]
+        if output_format == 'npy':
+            writer(output_filename, header, rows, row_count, name_width=max(len(name) for name in students))
+        else:
+            writer(output_filename, header, rows, row_count)
+    except sqlite3.Error as e:
+        print(f"❌ Database error: {e}")
+        return None
+    except ImportError as e:
+        print(f"❌ The {output_format} format needs an extra package ({e.name}). Install it or use --format csv.")
+        return None
+    except IOError as e:
+        print(f"❌ Error writing report file: {e}")
+        return None
+
+    print(f"✅ Report '{output_filename}' generated successfully ({row_count} rows)!")
+    return output_filename
+
+
 if __name__ == '__main__':
-    date_input = input("Enter the date for the pivot report (YYYY-MM-DD): ")
-    generate_pivot_report(date_input)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Attendance pivot report for one date or a date range.")
+    parser.add_argument('--from', dest='start', help="First date of a range report (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end', help="Last date of a range report (default: same as --from)")
+    parser.add_argument('--format', choices=REPORT_FORMATS, default='csv', help="Output format for range reports")
+    parser.add_argument('--output', help="Output filename for range reports")
+    args = parser.parse_args()
+
+    if args.start:
+        generate_range_report(args.start, args.end or args.start, args.format, args.output)
+    else:
+        date_input = input("Enter the date for the pivot report (YYYY-MM-DD): ")
+        generate_pivot_report(date_input)
@@ -0,0 +1,186 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+from db import get_connection
+from schedule import Schedule
+
+# How often the clock thread checks whether the timetable slot has changed (an in-memory lookup)
+TICK_SECONDS = 5
+# How often the student and present sets are re-read from the database, to pick up changes
+# made by other processes (another server worker, scripts) that never pass through this one
+RESYNC_SECONDS = 60
+# Idle streams get a comment line this often so proxies don't close them
+KEEPALIVE_SECONDS = 15
+# Events buffered per browser; a client this far behind is sent a fresh snapshot instead
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def format_event(event, data):
+    """One Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class LiveDashboard:
+    """
+    In-memory state behind the admin live dashboard: the class in session and who is
+    present or absent for it. One clock thread follows the timetable and the attendance
+    endpoints report new records, so database work is the same whether one browser or
+    a hundred are watching. Browsers subscribe to a stream of small deltas:
+
+        snapshot  {"class": {...} or {}, "absentees": [names]}   on connect and when the slot changes
+        present   {"name": ...}                                  a student was just logged
+        absent    {"name": ...}                                  a student was registered mid-class
+        removed   {"name": ...}                                  a student was deleted
+    """
+
+    def __init__(self, db_path, schedule=None):
+        self.db_path = db_path
+        self.schedule = schedule or Schedule(db_path)
+        self.lock = threading.Lock()
+        self.current_class = {}
+        self.date = None
+        self.students = set()
+        self.present = set()
+        self.subscribers = set()
+        self.thread = None
+        self.last_resync = 0.0
+
+    def start(self):
+        """Starts the clock thread on first use."""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._run, name="live-dashboard", daemon=True)
+        self._refresh(force=True)
+        self.thread.start()
+
+    # --- State -------------------------------------------------------------
+
+    def _load_slot(self, now):
+        slot = self.schedule.current_class(now)
+        return dict(slot) if slot else {}
+
+    def _load_students(self):
+        conn = get_connection(self.db_path)
+        return {row['name'] for row in conn.execute("SELECT name FROM students")}
+
+    def _load_present(self, subject_id, date):
+        conn = get_connection(self.db_path)
+        rows = conn.execute("SELECT name FROM attendance WHERE subject_id = ? AND date = ?", (subject_id, date))
+        return {row['name'] for row in rows}
+
+    def _refresh(self, force=False):
+        """Follows the timetable; on a slot change reloads everything and sends a snapshot."""
+        now = datetime.now()
+        current_class = self._load_slot(now)
+        date = now.strftime('%Y-%m-%d')
+        with self.lock:
+            changed = force or current_class != self.current_class or date != self.date
+        if changed:
+            students = self._load_students()
+            present = self._load_present(current_class['subject_id'], date) if current_class else set()
+            with self.lock:
+                self.current_class, self.date = current_class, date
+                self.students, self.present = students, present
+                self.last_resync = time.monotonic()
+                self._broadcast_locked('snapshot', self._snapshot_locked())
+        elif current_class and time.monotonic() - self.last_resync >= RESYNC_SECONDS:
+            students = self._load_students()
+            present = self._load_present(current_class['subject_id'], date)
+            with self.lock:
+                self.last_resync = time.monotonic()
+                # Students registered or deleted by other processes (bulk_enroll.py, add_student.py)
+                for name in self.students - students:
+                    self.students.discard(name)
+                    self.present.discard(name)
+                    self._broadcast_locked('removed', {'name': name})
+                for name in students - self.students:
+                    self.students.add(name)
+                    if name not in present:
+                        self._broadcast_locked('absent', {'name': name})
+                for name in present - self.present:
+                    self.present.add(name)
+                    self._broadcast_locked('present', {'name': name})
+
+    def _run(self):
+        while True:
+            time.sleep(TICK_SECONDS)
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"Live dashboard refresh failed: {e}")
+
+    def _snapshot_locked(self):
+        absentees = sorted(self.students - self.present) if self.current_class else []
+        return {'class': self.current_class, 'absentees': absentees}
+
+    def snapshot(self):
+        self.start()
+        with self.lock:
+            return self._snapshot_locked()
+
+    # --- Updates from the write paths ----------------------------------------
+
+    def record_attendance(self, rows):
+        """Called after new attendance rows are committed: (name, timestamp, subject_id) tuples."""
+        if self.thread is None:
+            return  # Nobody has opened the dashboard yet; the first snapshot reads the database
+        with self.lock:
+            if not self.current_class:
+                return
+            for name, timestamp, subject_id in rows:
+                if (subject_id == self.current_class['subject_id'] and timestamp[:10] == self.date
+                        and name not in self.present):
+                    self.present.add(name)
+                    self._broadcast_locked('present', {'name': name})
+
+    def student_added(self, name):
+        if self.thread is None:
+            return
+        with self.lock:
+            self.students.add(name)
+            if self.current_class and name not in self.present:
+                self._broadcast_locked('absent', {'name': name})
+
+    def student_removed(self, name):
+        if self.thread is None:
+            return
+        with self.lock:
+            self.students.discard(name)
+            self.present.discard(name)
+            self._broadcast_locked('removed', {'name': name})
+
+    # --- Subscribers ---------------------------------------------------------
+
+    def _broadcast_locked(self, event, data):
+        message = format_event(event, data)
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Too far behind to catch up with deltas; start it over from a snapshot
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait(format_event('snapshot', self._snapshot_locked()))
+
+    def stream(self):
+        """Generator of SSE messages for one browser: a snapshot, then deltas as they happen."""
+        self.start()
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            first = format_event('snapshot', self._snapshot_locked())
+        try:
+            yield first
+            while True:
+                try:
+                    yield subscriber.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            # Runs when the browser disconnects and the server closes the generator
+            with self.lock:
+                self.subscribers.discard(subscriber)
@@ -0,0 +1,176 @@
+import argparse
+import contextlib
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+from werkzeug.serving import make_server
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def make_events(count, prefix):
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return [{"name": f"{prefix} Student {i}", "timestamp": now, "subject_id": 1 + i % 6} for i in range(count)]
+
+
+def load_app_with_temp_db():
+    """Imports app.py pointed at a throwaway copy of the schema. Returns the module."""
+    tmpdir = tempfile.mkdtemp(prefix='facebeam_loadtest_')
+    # populate_database.py always writes ./facebeam.db, so run it inside the temp dir
+    subprocess.run([sys.executable, os.path.join(ROOT_DIR, 'populate_database.py')],
+                   cwd=tmpdir, check=True, stdout=subprocess.DEVNULL)
+    sys.path.insert(0, ROOT_DIR)
+    import app as app_module
+    app_module.DB_NAME = os.path.join(tmpdir, 'facebeam.db')
+    app_module.attendance_writer.db_path = app_module.DB_NAME
+    return app_module
+
+
+class InProcessClient:
+    """Drives app.py through Flask's test client against a throwaway copy of the schema."""
+
+    def __init__(self):
+        self.client = load_app_with_temp_db().app.test_client()
+
+    def post(self, path, payload):
+        return self.client.post(path, json=payload).status_code
+
+
+class HttpClient:
+    """Drives a running server over one keep-alive session."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def post(self, path, payload):
+        return self.session.post(self.base_url + path, json=payload, timeout=30).status_code
+
+
+def run_single(client, events):
+    for event in events:
+        if client.post('/api/log_attendance', event) != 200:
+            raise RuntimeError("Single-row endpoint returned an error")
+
+
+def run_batch(client, events, batch_size):
+    for start in range(0, len(events), batch_size):
+        if client.post('/api/log_attendance/batch', events[start:start + batch_size]) != 200:
+            raise RuntimeError("Batch endpoint returned an error")
+
+
+def timed(label, fn, rows):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} | {rows:>7} rows | {elapsed:>7.2f} s | {rows / elapsed:>9.0f} rows/s")
+    return rows / elapsed
+
+
+def run_devices(base_url, devices, events_per_device, prefix):
+    """
+    `devices` threads, each an edge device with its own keep-alive session posting single
+    events to /api/log_attendance back to back. Returns (per-request latencies, elapsed seconds).
+    """
+    latencies, errors = [], []
+    start_line = threading.Barrier(devices + 1)
+
+    def device(d):
+        client = HttpClient(base_url)
+        events = make_events(events_per_device, f"{prefix} D{d}")
+        mine = []
+        start_line.wait()
+        for event in events:
+            sent = time.perf_counter()
+            status = client.post('/api/log_attendance', event)
+            mine.append(time.perf_counter() - sent)
+            if status != 200:
+                errors.append(status)
+        latencies.extend(mine)
+
+    threads = [threading.Thread(target=device, args=(d,)) for d in range(devices)]
+    for thread in threads:
+        thread.start()
+    start_line.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise RuntimeError(f"{len(errors)} requests failed, e.g. HTTP {errors[0]}")
+    return latencies, elapsed
+
+
+def report_devices(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{label:<22} | {len(latencies):>7} requests | {len(latencies) / elapsed:>8.0f} req/s | "
+          f"p50 {p50:>7.1f} ms | p99 {p99:>7.1f} ms")
+
+
+def run_concurrent_test(args, run_id):
+    """Many edge devices posting single events at once; in-process, group commit is compared with one commit per request."""
+    print(f"{args.devices} concurrent devices, {args.events_per_device} single events each\n")
+    if args.url:
+        latencies, elapsed = run_devices(args.url, args.devices, args.events_per_device, f"C{run_id}")
+        report_devices(args.url, latencies, elapsed)
+        return
+
+    app_module = load_app_with_temp_db()
+    # A real threaded server, so requests overlap the way they do in production
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # No access log line per request
+    try:
+        for group_commit in (False, True):
+            app_module.GROUP_COMMIT = group_commit
+            # The endpoint prints a line per event; keep that out of the timings and the report
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                latencies, elapsed = run_devices(base_url, args.devices, args.events_per_device,
+                                                 f"C{run_id}{'G' if group_commit else 'S'}")
+            report_devices("group commit" if group_commit else "commit per request", latencies, elapsed)
+        writer = app_module.attendance_writer
+        print(f"\nGroup commit wrote {writer.events} events in {writer.groups} transactions "
+              f"({writer.events / max(writer.groups, 1):.1f} per commit).")
+    finally:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the single-row and bulk attendance endpoints.")
+    parser.add_argument('--rows', type=int, default=2000, help="Events to send per run")
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--url', help="Base URL of a running server (default: in-process against a temp DB)")
+    parser.add_argument('--concurrent', action='store_true',
+                        help="Measure latency and req/s with many devices posting single events at once")
+    parser.add_argument('--devices', type=int, default=100, help="Simulated edge devices for --concurrent")
+    parser.add_argument('--events-per-device', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.concurrent:
+        run_concurrent_test(args, datetime.now().strftime('%H%M%S'))
+        return
+
+    client = HttpClient(args.url) if args.url else InProcessClient()
+    run_id = datetime.now().strftime('%H%M%S')
+
+    single_rate = timed("single-row /api/log_attendance", lambda: run_single(client, make_events(args.rows, f"S{run_id}")), args.rows)
+    batch_rate = timed(f"batch of {args.batch_size}", lambda: run_batch(client, make_events(args.rows, f"B{run_id}"), args.batch_size), args.rows)
+    # Re-sending the same batch must only report duplicates
+    replay = make_events(args.rows, f"B{run_id}")
+    timed("batch replay (all duplicates)", lambda: run_batch(client, replay, args.batch_size), args.rows)
+    print(f"\nBulk ingestion is {batch_rate / single_rate:.1f}x the single-row throughput.")
+
+
+if __name__ == '__main__':
+    main()
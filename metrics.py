@@ -0,0 +1,282 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Upper bounds (seconds) of the latency histogram buckets, from a fast SQLite lookup up to a slow upload
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Label combinations kept per metric; anything beyond is counted under label value "other",
+# so a stream of unexpected URLs or queries can't grow memory without bound
+MAX_SERIES = 500
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(pairs):
+    pairs = list(pairs)
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named metric with a fixed set of label names; one series per combination of label values."""
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=(), max_series=MAX_SERIES):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        if key not in self.series and len(self.series) >= self.max_series:
+            key = ('other',) * len(self.labelnames)
+        return key
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def _series(self, labels):
+        """This label combination's state, created on first use. Call with the lock held."""
+        key = self._key(labels)
+        state = self.series.get(key)
+        if state is None:
+            state = self.series[key] = self._new_series()
+        return key, state
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def _new_series(self):
+        return [0]
+
+    def inc(self, n=1, **labels):
+        with self._lock:
+            self._series(labels)[1][0] += n
+
+    def render(self):
+        with self._lock:
+            series = [(key, state[0]) for key, state in self.series.items()]
+        return [f"{self.name}{_format_labels(zip(self.labelnames, key))} {_format_value(value)}" for key, value in series]
+
+    def snapshot(self):
+        with self._lock:
+            return [dict(zip(self.labelnames, key), value=state[0]) for key, state in self.series.items()]
+
+
+class Histogram(Metric):
+    """Cumulative bucket counts plus sum and count per series, as Prometheus expects."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS, max_series=MAX_SERIES):
+        super().__init__(name, help_text, labelnames, max_series)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        # Non-cumulative count per bucket (the last one is +Inf), then sum and count
+        return {'buckets': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+
+    def observe(self, seconds, **labels):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            state = self._series(labels)[1]
+            state['buckets'][index] += 1
+            state['sum'] += seconds
+            state['count'] += 1
+
+    def _copy(self):
+        with self._lock:
+            return [(key, list(state['buckets']), state['sum'], state['count']) for key, state in self.series.items()]
+
+    def render(self):
+        lines = []
+        for key, buckets, total, count in self._copy():
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), buckets):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {count}")
+        return lines
+
+    def quantile(self, buckets, count, q):
+        """Estimates a quantile from bucket counts by linear interpolation, like PromQL's histogram_quantile()."""
+        rank, cumulative, lower = q * count, 0, 0.0
+        for bound, n in zip(self.buckets, buckets):
+            if n and cumulative + n >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / n
+            cumulative += n
+            lower = bound
+        return self.buckets[-1]  # In the +Inf bucket: all that is known is that it's above the last bound
+
+    def snapshot(self):
+        rows = []
+        for key, buckets, total, count in self._copy():
+            row = dict(zip(self.labelnames, key), count=count, mean_ms=round(total / count * 1000, 3) if count else None)
+            for q in (0.5, 0.9, 0.99):
+                row[f"p{int(q * 100)}_ms"] = round(self.quantile(buckets, count, q) * 1000, 3) if count else None
+            rows.append(row)
+        return rows
+
+
+class CallbackGauge:
+    """A value read from the application at scrape time, e.g. a queue length or a counter another class keeps."""
+
+    def __init__(self, name, help_text, read, kind='gauge'):
+        self.name = name
+        self.help = help_text
+        self.read = read
+        self.kind = kind
+
+    def render(self):
+        try:
+            return [f"{self.name} {_format_value(self.read())}"]
+        except Exception as e:
+            return [f"# {self.name} unavailable: {_escape(e)}"]
+
+    def snapshot(self):
+        try:
+            return [{'value': self.read()}]
+        except Exception as e:
+            return [{'error': str(e)}]
+
+
+class MetricsRegistry:
+    """
+    The metrics of one process, rendered in the Prometheus text format for /metrics
+    or as a JSON-friendly dict for the edge agent's stats file. Asking for a metric
+    that already exists returns it, so modules can share one registry without
+    coordinating who creates what. Safe to share between threads.
+    """
+
+    def __init__(self, prefix='facebeam_'):
+        self.prefix = prefix
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _get(self, cls, name, *args, **kwargs):
+        name = self.prefix + name
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get(Counter, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, labelnames, buckets)
+
+    def gauge_callback(self, name, help_text, read, kind='gauge'):
+        return self._get(CallbackGauge, name, help_text, read, kind)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'metrics': {metric.name: metric.snapshot() for metric in metrics},
+        }
+
+
+def write_stats(registry, path):
+    """Writes registry.snapshot() as JSON, replacing the file in one step so readers never see half of it."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(registry.snapshot(), f, indent=2)
+    os.replace(tmp, path)
+
+
+class StatsWriter(threading.Thread):
+    """Rewrites the stats file every `interval` seconds, and once more on close()."""
+
+    def __init__(self, registry, path, interval=10.0):
+        super().__init__(name="stats-writer", daemon=True)
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self._write()
+
+    def _write(self):
+        try:
+            write_stats(self.registry, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not write stats to {self.path}: {e}")
+
+    def close(self):
+        self._stop_event.set()
+        self._write()
+
+
+def serve_metrics(registry, port, host='127.0.0.1', profiler=None):
+    """
+    Starts a small HTTP server in a background thread with /metrics (Prometheus text)
+    and /stats (JSON). With a profiler, /profile?seconds=N also samples this process
+    for N seconds and returns the collapsed stacks. Returns the server; call shutdown() to stop it.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/metrics':
+                self._reply(200, registry.render(), PROMETHEUS_CONTENT_TYPE)
+            elif url.path == '/stats':
+                self._reply(200, json.dumps(registry.snapshot(), indent=2), 'application/json')
+            elif url.path == '/profile' and profiler is not None:
+                try:
+                    seconds = float(parse_qs(url.query).get('seconds', ['10'])[0])
+                    self._reply(200, profiler.profile(seconds).folded(), 'text/plain; charset=utf-8')
+                except (ValueError, RuntimeError) as e:
+                    self._reply(409 if isinstance(e, RuntimeError) else 400, f"{e}\n", 'text/plain; charset=utf-8')
+            else:
+                self._reply(404, "Not found\n", 'text/plain; charset=utf-8')
+
+        def _reply(self, status, body, content_type):
+            body = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # A scraper polling every few seconds shouldn't fill the console
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
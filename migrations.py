@@ -0,0 +1,115 @@
+import sqlite3
+
+from attendance_summary import create_summary_tables
+from face_registry import create_registry_tables
+from schedule import create_version_tracking
+from student_directory import create_student_indexes
+
+# The schema version is stored in SQLite's built-in PRAGMA user_version.
+# Databases created before migrations existed report version 0, so every
+# migration is written to cope with a column or index already being there.
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_column(conn, table, column, definition):
+    if column not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _admission_details(conn):
+    # SQLite can't ADD COLUMN ... UNIQUE, so uniqueness of student_id comes from an index
+    for column in ('student_id', 'section', 'year', 'roll_number', 'branch', 'college_id'):
+        _add_column(conn, 'students', column, 'TEXT')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_students_student_id ON students (student_id)")
+    _add_column(conn, 'attendance', 'student_db_id', 'INTEGER REFERENCES students(id)')
+
+
+def _once_per_class(conn):
+    # Keep the earliest record of each (student, subject, day) so the unique index can be built.
+    # Rows with no subject are left alone: the index treats NULLs as distinct and accepts them.
+    # The later duplicates are copied to attendance_duplicates before they go, so nothing is lost.
+    duplicates = """
+        subject_id IS NOT NULL AND id NOT IN (
+            SELECT MIN(id) FROM attendance WHERE subject_id IS NOT NULL GROUP BY name, subject_id, date(timestamp)
+        )
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS attendance_duplicates AS SELECT * FROM attendance WHERE 0")
+    moved = conn.execute(f"INSERT INTO attendance_duplicates SELECT * FROM attendance WHERE {duplicates}").rowcount
+    conn.execute(f"DELETE FROM attendance WHERE {duplicates}")
+    if moved:
+        print(f"⚠️ Moved {moved} duplicate attendance record(s) to the attendance_duplicates table.")
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_once_per_class "
+        "ON attendance (name, subject_id, date(timestamp))"
+    )
+
+
+def _attendance_date_indexes(conn):
+    # A virtual generated column is computed on read and, unlike date(timestamp) in a
+    # WHERE clause, can be indexed and matched by plain `date = ?` filters
+    if sqlite3.sqlite_version_info < (3, 31, 0):
+        raise sqlite3.OperationalError(
+            f"SQLite {sqlite3.sqlite_version} has no generated columns; version 3.31 or newer is required."
+        )
+    _add_column(conn, 'attendance', 'date', 'TEXT GENERATED ALWAYS AS (date(timestamp)) VIRTUAL')
+    conn.execute("DROP INDEX IF EXISTS idx_attendance_once_per_class")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_once_per_class ON attendance (name, subject_id, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_subject_date ON attendance (subject_id, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_student_date ON attendance (student_db_id, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_timetable_day_start ON timetable (day_of_week, start_time)")
+
+
+def _backfill_student_db_id(conn):
+    conn.execute("""
+        UPDATE attendance
+        SET student_db_id = (SELECT id FROM students WHERE students.name = attendance.name)
+        WHERE student_db_id IS NULL
+    """)
+
+
+def _date_ordered_index(conn):
+    # Lets date-range reports read attendance already grouped by (date, name)
+    # straight off the index, without a temporary sort the size of the range
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_date_name ON attendance (date, name, subject_id)")
+
+
+# (version, description, function). Append new migrations; never edit or reorder applied ones.
+MIGRATIONS = [
+    (1, "Admission details on students, student_db_id on attendance", _admission_details),
+    (2, "One attendance record per student, subject and day", _once_per_class),
+    (3, "Indexed attendance date column and query indexes", _attendance_date_indexes),
+    (4, "Backfill attendance.student_db_id from name", _backfill_student_db_id),
+    (5, "Trigger-maintained attendance summary tables", create_summary_tables),
+    (6, "Timetable change counter for in-memory schedules", create_version_tracking),
+    (7, "Attendance index in (date, name) order for range reports", _date_ordered_index),
+    (8, "Server-side face encoding registry for edge gallery sync", create_registry_tables),
+    (9, "Student search indexes and change counter for the cached student list", create_student_indexes),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, verbose=True):
+    """Applies every pending migration, each in its own transaction. Returns the versions applied."""
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if version <= current_version(conn):
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append(version)
+        if verbose:
+            print(f"Applied migration {version}: {description}")
+    return applied
@@ -0,0 +1,109 @@
+import time
+
+import cv2
+import numpy as np
+
+# Frames are compared on a blurred grayscale thumbnail this many pixels wide
+THUMBNAIL_WIDTH = 160
+# Gray-level change (0-255) for a thumbnail pixel to count as moved; above sensor noise
+PIXEL_THRESHOLD = 18
+# Share of thumbnail pixels that must change before detection runs at all
+MIN_CHANGED_SHARE = 0.002
+# Changed areas are grown by this share of their size on each side, so a face that moved is fully inside
+REGION_MARGIN = 0.5
+# When the changed regions cover more than this share of the frame, the whole frame is detected instead
+MAX_REGION_SHARE = 0.4
+# The whole frame is detected at least this often, whatever the motion
+FORCE_DETECT_SECONDS = 5.0
+
+
+def merge_rects(rects):
+    """Merges overlapping (x0, y0, x1, y1) rectangles until none overlap."""
+    rects = list(rects)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return rects
+
+
+class MotionGate:
+    """
+    Cheap check ahead of face detection. Each frame is shrunk to a small blurred
+    grayscale thumbnail and compared with the thumbnail of the last frame that was
+    detected. Nothing changed: detection is skipped. A few small areas changed:
+    detection runs only inside them. Faces that are still being identified, large
+    changes and a periodic forced refresh always get the whole frame.
+    """
+
+    def __init__(self, pixel_threshold=PIXEL_THRESHOLD, min_changed_share=MIN_CHANGED_SHARE,
+                 force_every=FORCE_DETECT_SECONDS):
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_share = min_changed_share
+        self.force_every = force_every
+        self.reference = None
+        self.last_full = 0.0
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        scale = THUMBNAIL_WIDTH / width
+        small = cv2.resize(frame, (THUMBNAIL_WIDTH, max(1, int(round(height * scale)))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0), scale
+
+    def _regions(self, mask, scale, frame_shape):
+        """Full-frame (top, right, bottom, left) boxes around the changed areas, or None if they cover too much."""
+        mask = cv2.dilate(mask, None, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        thumb_h, thumb_w = mask.shape
+        rects = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            pad_x, pad_y = int(w * REGION_MARGIN) + 1, int(h * REGION_MARGIN) + 1
+            rects.append((max(0, x - pad_x), max(0, y - pad_y), min(thumb_w, x + w + pad_x), min(thumb_h, y + h + pad_y)))
+        rects = merge_rects(rects)
+        if sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects) > MAX_REGION_SHARE * thumb_w * thumb_h:
+            return None
+
+        height, width = frame_shape[:2]
+        return [(max(0, int(y0 / scale)), min(width, int(np.ceil(x1 / scale))),
+                 min(height, int(np.ceil(y1 / scale))), max(0, int(x0 / scale)))
+                for x0, y0, x1, y1 in rects]
+
+    def check(self, frame, settled=True):
+        """
+        Returns (detect, regions) for a BGR frame. `detect` is False when nothing
+        changed since the last detection; `regions` is None for the whole frame or
+        a list of full-frame (top, right, bottom, left) boxes to detect in. Pass
+        settled=False while any visible face is unconfirmed: it then always detects
+        the whole frame, so a student sitting still still gets identified.
+        """
+        thumbnail, scale = self._thumbnail(frame)
+        now = time.monotonic()
+        if (self.reference is None or self.reference.shape != thumbnail.shape
+                or now - self.last_full >= self.force_every):
+            self.reference, self.last_full = thumbnail, now
+            return True, None
+
+        mask = (cv2.absdiff(thumbnail, self.reference) > self.pixel_threshold).astype(np.uint8)
+        if cv2.countNonZero(mask) < self.min_changed_share * mask.size:
+            # Small changes are not taken into the reference, so slow drift adds up and triggers eventually
+            if settled:
+                return False, None
+            self.reference, self.last_full = thumbnail, now
+            return True, None
+
+        self.reference = thumbnail
+        regions = self._regions(mask, scale, frame.shape) if settled else None
+        if regions is None:
+            self.last_full = now
+        return True, regions
@@ -0,0 +1,312 @@
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import requests
+
+from detection_pipeline import StageTimer
+
+OUTBOX_DB = 'edge_outbox.db'
+BATCH_SIZE = 50
+UPLOAD_TIMEOUT_SECONDS = 5
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 300
+# Sent events are kept this long so restarts still know who was already logged
+KEEP_SENT_DAYS = 7
+
+
+class Outbox:
+    """
+    Durable local queue of attendance events, stored in its own SQLite file.
+
+    Every event gets a UUID event_id, used only to track it in this queue. The
+    (name, subject, date) unique key means a student is recorded at most once
+    per class per day, even across restarts of the edge agent.
+    """
+
+    def __init__(self, db_path=OUTBOX_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")  # An acknowledged event must survive power loss
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                event_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                subject_id INTEGER,
+                date TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',  -- pending, sent or rejected
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_outbox_once_per_class
+                ON outbox (name, subject_id, date);
+            CREATE INDEX IF NOT EXISTS idx_outbox_due
+                ON outbox (status, next_attempt_at);
+        """)
+        self.conn.commit()
+
+    def add(self, name, subject_id, when=None):
+        """Records an event. Returns its event_id, or None if this student was already recorded for the class today."""
+        when = when or datetime.now()
+        event_id = str(uuid.uuid4())
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO outbox (event_id, name, timestamp, subject_id, date, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (event_id, name, when.strftime('%Y-%m-%d %H:%M:%S'), subject_id, when.strftime('%Y-%m-%d'), time.time())
+            )
+            self.conn.commit()
+        return event_id if cursor.rowcount else None
+
+    def recorded_names(self, date):
+        """{subject_id: {names}} already recorded on a date, to warm the in-memory duplicate check."""
+        with self._lock:
+            rows = self.conn.execute("SELECT subject_id, name FROM outbox WHERE date = ?", (date,)).fetchall()
+        recorded = {}
+        for row in rows:
+            recorded.setdefault(row['subject_id'], set()).add(row['name'])
+        return recorded
+
+    def due(self, limit=BATCH_SIZE):
+        """Oldest pending events whose backoff has expired."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT * FROM outbox WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY created_at LIMIT ?",
+                (time.time(), limit)
+            ).fetchall()
+
+    def mark_sent(self, event_ids):
+        self._set_status(event_ids, 'sent')
+
+    def mark_rejected(self, event_ids, error):
+        """The server refused these for good (e.g. 400); keep them for inspection but stop retrying."""
+        self._set_status(event_ids, 'rejected', error)
+
+    def _set_status(self, event_ids, status, error=None):
+        if not event_ids:
+            return
+        with self._lock:
+            self.conn.executemany(
+                "UPDATE outbox SET status = ?, last_error = ? WHERE event_id = ?",
+                [(status, error, event_id) for event_id in event_ids]
+            )
+            self.conn.commit()
+
+    def mark_failed(self, rows, error):
+        """Schedules a retry with exponential backoff (plus jitter so devices don't retry in lockstep)."""
+        if not rows:
+            return
+        now = time.time()
+        updates = []
+        for row in rows:
+            delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** row['attempts'])
+            updates.append((now + delay * random.uniform(0.5, 1.0), str(error)[:500], row['event_id']))
+        with self._lock:
+            self.conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE event_id = ?",
+                updates
+            )
+            self.conn.commit()
+
+    def next_attempt_in(self):
+        """Seconds until the earliest pending retry, or None if nothing is pending."""
+        with self._lock:
+            row = self.conn.execute("SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def pending_count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def purge(self, keep_days=KEEP_SENT_DAYS):
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM outbox WHERE status != 'pending' AND created_at < ?",
+                (time.time() - keep_days * 86400,)
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class OutboxSender(threading.Thread):
+    """
+    Background thread that drains the outbox to the cloud API.
+
+    submit() only writes to local SQLite, so the video loop never waits on the
+    network. The sender drains due events in batches over one keep-alive
+    requests.Session: with `batch_url` set, each batch is one request to the
+    bulk endpoint; otherwise events are posted one by one. It backs off
+    exponentially while the server is unreachable. Resending an event that
+    already landed is harmless: the server deduplicates on the same
+    (name, subject, date) key and answers with success.
+    """
+
+    def __init__(self, api_url, batch_url=None, outbox=None, timer=None, batch_size=BATCH_SIZE):
+        super().__init__(name='outbox-sender', daemon=True)
+        self.api_url = api_url
+        self.batch_url = batch_url
+        self.outbox = outbox or Outbox()
+        self.timer = timer or StageTimer(report_every=0)
+        self.batch_size = batch_size
+        self.session = requests.Session()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._recorded_date = None
+        self._recorded = {}
+
+    def submit(self, name, subject_id):
+        """Records a sighting durably (once per student per class per day). Never touches the network."""
+        now = datetime.now()
+        today = now.strftime('%Y-%m-%d')
+        if today != self._recorded_date:
+            self._recorded = self.outbox.recorded_names(today)
+            self._recorded_date = today
+        names = self._recorded.setdefault(subject_id, set())
+        if name in names:
+            return
+        names.add(name)
+        if self.outbox.add(name, subject_id, now):
+            print(f"📥 Queued attendance for '{name}' (Subject ID {subject_id}). {self.outbox.pending_count()} pending upload.")
+            self._wake.set()
+
+    def run(self):
+        self.outbox.purge()
+        pending = self.outbox.pending_count()
+        if pending:
+            print(f"📤 Resuming upload of {pending} attendance event(s) stored offline.")
+
+        while not self._stop_event.is_set():
+            rows = self.outbox.due(self.batch_size)
+            if rows:
+                try:
+                    self._send_batch(rows)
+                except Exception as e:
+                    # Never let one bad batch stop uploads for good: back it off and carry on
+                    print(f"🚨 Unexpected error uploading {len(rows)} event(s); they stay queued. {e}")
+                    try:
+                        self.outbox.mark_failed(rows, e)
+                    except Exception:
+                        pass
+                    self._stop_event.wait(BACKOFF_BASE_SECONDS)
+                continue
+            # Sleep until new work arrives or the next backoff expires
+            wait = self.outbox.next_attempt_in()
+            self._wake.wait(timeout=1.0 if wait is None else min(wait, 1.0))
+            self._wake.clear()
+
+    def _send_batch(self, rows):
+        if self.batch_url:
+            self._send_bulk(rows)
+        else:
+            self._send_one_by_one(rows)
+
+    def _send_bulk(self, rows):
+        """Posts the whole batch to the bulk endpoint in one request and applies its per-item results."""
+        payload = [
+            {"name": row['name'], "timestamp": row['timestamp'], "subject_id": row['subject_id']}
+            for row in rows
+        ]
+        try:
+            with self.timer.stage('upload'):
+                response = self.session.post(self.batch_url, json=payload, timeout=UPLOAD_TIMEOUT_SECONDS)
+        except requests.exceptions.RequestException as e:
+            print(f"🚨 Network Error: Could not reach the cloud server. {len(rows)} event(s) stay queued. {e}")
+            self.outbox.mark_failed(rows, e)
+            return
+
+        if response.status_code == 404:
+            # Older server without the bulk endpoint: fall back to one request per event
+            print("ℹ️ Cloud server has no bulk endpoint. Uploading events one at a time.")
+            self.batch_url = None
+            self._send_one_by_one(rows)
+            return
+        if response.status_code != 200:
+            print(f"⚠️ Failed to send batch to cloud. Server responded: {response.status_code} - {response.text}")
+            self.outbox.mark_failed(rows, f"HTTP {response.status_code}")
+            return
+
+        # A 200 that isn't the bulk endpoint's answer (e.g. a captive portal's HTML page) counts as a failed attempt
+        try:
+            statuses = {}
+            for result in response.json()['results']:
+                index = int(result['index'])
+                if 0 <= index < len(rows):
+                    statuses[index] = (result['status'], result.get('error'))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Cloud server sent an unreadable batch response. {len(rows)} event(s) stay queued. {e}")
+            self.outbox.mark_failed(rows, f"Unreadable response: {e}")
+            return
+
+        sent, rejected, missing = [], [], []
+        for index, row in enumerate(rows):
+            status, error = statuses.get(index, (None, None))
+            if status is None:
+                missing.append(row)
+            elif status == 'invalid':
+                rejected.append(row['event_id'])
+                print(f"⚠️ Cloud rejected event for '{row['name']}': {error}")
+            else:
+                # 'duplicate' means an earlier attempt already landed, which is just as good
+                sent.append(row['event_id'])
+        self.outbox.mark_sent(sent)
+        self.outbox.mark_rejected(rejected, "rejected by server")
+        # Retried later rather than re-posted straight away
+        self.outbox.mark_failed(missing, "no result for this event in the batch response")
+        print(f"📡 Sent {len(sent)} attendance event(s) to Cloud API in one batch.")
+
+    def _send_one_by_one(self, rows):
+        sent, rejected = [], []
+        for index, row in enumerate(rows):
+            payload = {
+                "name": row['name'],
+                "timestamp": row['timestamp'],
+                "subject_id": row['subject_id']
+            }
+            try:
+                with self.timer.stage('upload'):
+                    response = self.session.post(self.api_url, json=payload, timeout=UPLOAD_TIMEOUT_SECONDS)
+            except requests.exceptions.RequestException as e:
+                # The server is unreachable: don't pay a timeout per event, back the rest off together
+                print(f"🚨 Network Error: Could not reach the cloud server. {len(rows) - index} event(s) stay queued. {e}")
+                self.outbox.mark_sent(sent)
+                self.outbox.mark_failed(rows[index:], e)
+                return
+
+            if response.status_code == 200:
+                sent.append(row['event_id'])
+                print(f"📡 Sent to Cloud API: '{row['name']}' for Subject ID {row['subject_id']}")
+            elif 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+                rejected.append(row['event_id'])
+                print(f"⚠️ Cloud rejected event for '{row['name']}': {response.status_code} - {response.text}")
+            else:
+                print(f"⚠️ Failed to send to cloud. Server responded: {response.status_code} - {response.text}")
+                self.outbox.mark_sent(sent)
+                self.outbox.mark_rejected(rejected, f"HTTP {response.status_code}")
+                self.outbox.mark_failed(rows[index:], f"HTTP {response.status_code}")
+                return
+
+        self.outbox.mark_sent(sent)
+        self.outbox.mark_rejected(rejected, "rejected by server")
+
+    def close(self, timeout=UPLOAD_TIMEOUT_SECONDS):
+        """Stops the sender; anything still pending stays in the outbox for the next run."""
+        self._stop_event.set()
+        self._wake.set()
+        if self.is_alive():
+            self.join(timeout)
+        self.session.close()
+        if not self.is_alive():
+            self.outbox.close()
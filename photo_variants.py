@@ -0,0 +1,63 @@
+import os
+import threading
+
+from PIL import Image, ImageOps
+
+PHOTO_VARIANTS_DIR = 'photo_variants'
+# Longest side in pixels. 'dashboard' is twice the 150 px avatar on the student page, for high-DPI screens
+PHOTO_VARIANTS = {'thumb': 64, 'dashboard': 300}
+JPEG_QUALITY = 82
+
+
+def variant_path(filename, variant, variants_dir=PHOTO_VARIANTS_DIR):
+    # The original's extension stays in the name, so alice.jpg and alice.png don't share a variant
+    return os.path.join(variants_dir, variant, filename + '.jpg')
+
+
+def make_variant(source, target, size):
+    """Writes a resized JPEG copy of `source` with the same modification time as the original."""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image.thumbnail((size, size), Image.LANCZOS)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Unique temp name: two requests may be generating the same variant at once
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        image.save(tmp, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    mtime = os.stat(source).st_mtime_ns
+    os.utime(tmp, ns=(mtime, mtime))
+    os.replace(tmp, target)
+
+
+def get_variant(faces_dir, filename, variant, variants_dir=PHOTO_VARIANTS_DIR):
+    """
+    Path of a resized copy of a photo in faces_dir, made on first use and remade whenever
+    the original is replaced (a variant carries its original's mtime, so any difference
+    means it is stale). Raises FileNotFoundError if the original doesn't exist.
+    """
+    source = os.path.join(faces_dir, filename)
+    source_mtime = os.stat(source).st_mtime_ns
+    target = variant_path(filename, variant, variants_dir)
+    try:
+        if os.stat(target).st_mtime_ns == source_mtime:
+            return target
+    except FileNotFoundError:
+        pass
+    make_variant(source, target, PHOTO_VARIANTS[variant])
+    return target
+
+
+def create_variants(faces_dir, filename, variants_dir=PHOTO_VARIANTS_DIR):
+    """Makes every size variant of a newly registered photo, so the first page view doesn't wait for it."""
+    try:
+        for variant in PHOTO_VARIANTS:
+            get_variant(faces_dir, filename, variant, variants_dir)
+    except OSError as e:
+        print(f"⚠️ Warning: Could not resize {filename} ({e}). It will be resized on first request.")
+
+
+def remove_variants(filename, variants_dir=PHOTO_VARIANTS_DIR):
+    for variant in PHOTO_VARIANTS:
+        try:
+            os.remove(variant_path(filename, variant, variants_dir))
+        except FileNotFoundError:
+            pass
@@ -1,5 +1,7 @@
 import sqlite3
 import os
+from db import get_connection
+from migrations import migrate
 
 DB_NAME = 'facebeam.db'
 
@@ -7,6 +9,10 @@ DB_NAME = 'facebeam.db'
 if os.path.exists(DB_NAME):
     os.remove(DB_NAME)
     print(f"Removed old database '{DB_NAME}'.")
+# WAL mode keeps a write-ahead log and shared-memory index beside the database
+for leftover in (DB_NAME + '-wal', DB_NAME + '-shm'):
+    if os.path.exists(leftover):
+        os.remove(leftover)
 
 # SQL script to create all tables and insert all data
 sql_script = """
@@ -95,11 +101,12 @@ INSERT INTO attendance (name, timestamp, subject_id, student_db_id) VALUES
 
 try:
     # Connect to the database and execute the script
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_connection(DB_NAME)
     cursor = conn.cursor()
     cursor.executescript(sql_script)
     conn.commit()
-    conn.close()
+    # Indexes, the attendance date column and later columns all come from the migrations
+    migrate(conn, verbose=False)
     print(f"✅ Database '{DB_NAME}' has been created and populated successfully.")
 except sqlite3.Error as e:
     print(f"An error occurred: {e}")
\ No newline at end of file
@@ -0,0 +1,118 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Time between stack samples. Each sample walks every thread's stack, so this stays
+# coarse enough that a profile costs the running process only a few percent
+SAMPLE_INTERVAL_SECONDS = 0.005
+# Longest profile one request can ask for
+MAX_PROFILE_SECONDS = 120
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class Profile:
+    """Stack samples collected by a SamplingProfiler, keyed by thread name and call stack (outermost first)."""
+
+    def __init__(self, stacks, samples, seconds):
+        self.stacks = stacks
+        self.samples = samples
+        self.seconds = seconds
+
+    def folded(self):
+        """Collapsed stacks, one `thread;outer;...;inner count` line each (flamegraph.pl and speedscope read this)."""
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, n=15):
+        """
+        The `n` innermost functions seen in the most samples, as (label, share). Idle
+        threads count too, typically as threading.py:wait or a socket call.
+        """
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack[-1]] += count
+        total = max(sum(leaves.values()), 1)
+        return [(label, count / total) for label, count in leaves.most_common(n)]
+
+    def report(self, n=15):
+        lines = [f"🔥 {self.samples} samples over {self.seconds:.1f} s. Innermost functions, all threads:"]
+        lines += [f"   {share:6.1%}  {label}" for label, share in self.top(n)]
+        return '\n'.join(lines)
+
+
+class SamplingProfiler:
+    """
+    Samples the call stacks of every thread in this process at a fixed interval,
+    for a limited time and only when asked, so it can stay installed in production
+    and be switched on without a restart. Only code running in this process is seen;
+    work in the edge agent's detection worker processes shows up as the pipeline
+    waiting for their results. One profile runs at a time.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL_SECONDS, max_seconds=MAX_PROFILE_SECONDS):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._running = threading.Lock()
+
+    @property
+    def running(self):
+        return self._running.locked()
+
+    def profile(self, seconds):
+        """Samples for `seconds` (blocking) and returns a Profile. Raises RuntimeError if a profile is already running."""
+        seconds = min(max(float(seconds), self.interval), self.max_seconds)
+        if not self._running.acquire(blocking=False):
+            raise RuntimeError("A profile is already running.")
+        try:
+            return self._sample(seconds)
+        finally:
+            self._running.release()
+
+    def _sample(self, seconds):
+        me = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stacks[tuple(reversed(stack))] += 1
+            samples += 1
+            time.sleep(self.interval)
+        return Profile(stacks, samples, time.perf_counter() - start)
+
+    def start(self, seconds, path=None):
+        """
+        Profiles in a background thread and prints the hottest functions when done;
+        with `path`, the collapsed stacks are also written there. Returns False if a
+        profile is already running.
+        """
+        if self.running:
+            return False
+
+        def run():
+            try:
+                profile = self.profile(seconds)
+            except RuntimeError:
+                return
+            print(profile.report())
+            if path:
+                with open(path, 'w') as f:
+                    f.write(profile.folded())
+                print(f"🔥 Collapsed stacks written to {path}")
+
+        threading.Thread(target=run, name="sampling-profiler", daemon=True).start()
+        return True
@@ -1,11 +1,19 @@
-import face_recognition
+import argparse
+import signal
+import time
+
 import cv2
-import os
-import numpy as np
-from PIL import Image, UnidentifiedImageError
-from datetime import datetime
-import sqlite3
-import requests # <-- NEW: Import the requests library to send data over the web
+from encoding_cache import EncodingCache
+from face_matcher import FaceMatcher
+from detection_pipeline import DetectionPipeline, StageTimer, PIPELINE_PRESETS
+from edge_pipeline import EdgePipeline, draw_overlay, DEFAULT_WORKERS
+from frame_sources import open_frame_source, is_live_source
+from gallery_watcher import GalleryWatcher
+from metrics import MetricsRegistry, StatsWriter, serve_metrics
+from profiler import SamplingProfiler
+from remote_gallery import RemoteGallery
+from outbox import OutboxSender
+from schedule import Schedule
 
 DB_NAME = 'facebeam.db'
 KNOWN_FACES_DIR = "known_faces"
@@ -14,106 +22,203 @@ KNOWN_FACES_DIR = "known_faces"
 # Keep this pointing to localhost for now. When you deploy the web app to the cloud, 
 # you will change this to your live URL (e.g., "https://facebeam.onrender.com/api/log_attendance")
 CLOUD_API_URL = "https://jat.pythonanywhere.com/api/log_attendance"
+# Bulk endpoint used to flush the offline outbox; set to None to always send one event per request
+CLOUD_BATCH_API_URL = CLOUD_API_URL + "/batch"
+
+# Gallery search: 'brute' is exact and fastest up to a few thousand students.
+# For campus-wide galleries use 'ivf' (raise n_probe for recall, lower it for speed)
+# or 'ivf_pq' to also cut memory, e.g. {'n_probe': 8, 'pq_subvectors': 32}.
+GALLERY_INDEX = 'brute'
+GALLERY_INDEX_OPTIONS = {}
+
+# Detection pipeline: 'full' (every frame, full resolution), 'balanced' or 'fast'.
+# Individual settings (detection_scale, detect_every, tracker, motion_gate) can be overridden below.
+PIPELINE_MODE = 'balanced'
+PIPELINE_OVERRIDES = {}
+STATS_INTERVAL_SECONDS = 10  # How often FPS and per-stage timings are printed; 0 disables
+# Per-stage latency histograms and event counters for the whole run are written here
+# as JSON every STATS_INTERVAL_SECONDS (and on exit); None disables
+STATS_PATH = 'edge_stats.json'
+# A port (e.g. 9108) serves the same metrics on localhost: /metrics for Prometheus, /stats as JSON
+METRICS_PORT = None
+# Opt-in sampling profiler: once enabled, `kill -USR2 <pid>` (or /profile?seconds=N on
+# METRICS_PORT) profiles the running agent for PROFILE_SECONDS without a restart
+PROFILER_ENABLED = False
+PROFILE_SECONDS = 30
+
+# Concurrent mode runs capture, detection/encoding (in DETECTION_WORKERS processes),
+# matching and uploading in parallel. It uses the mode's detection_scale and always
+# detects on the freshest frame a worker can take; detect_every/tracker apply only
+# to the single-threaded loop (CONCURRENT_PIPELINE = False).
+CONCURRENT_PIPELINE = True
+DETECTION_WORKERS = DEFAULT_WORKERS
+
+# Where frames come from: camera indexes (0), RTSP/HTTP stream URLs, video files or
+# directories of images. Large halls can list several cameras, e.g. [0, 'rtsp://...'];
+# they share one gallery and worker pool (concurrent mode only). Both settings can be
+# overridden with --source / --headless.
+FRAME_SOURCES = [0]
+# Headless mode skips drawing and the preview window, e.g. on a Raspberry Pi with no screen
+HEADLESS = False
+
+# Where the known faces come from: None encodes the photos in known_faces/ locally;
+# a server URL downloads the encodings the server computed at registration instead
+# (no photos are copied to this device), e.g. "https://jat.pythonanywhere.com/api/gallery"
+GALLERY_API_URL = None
+# How often the gallery is checked for new, replaced or deleted students while running;
+# changes are encoded (or downloaded) in the background and swapped in without a restart. 0 disables.
+GALLERY_RELOAD_SECONDS = 5
+
+schedule = Schedule(DB_NAME)
 
 def get_current_subject():
-    now = datetime.now()
-    current_day = now.weekday()
-    current_time = now.strftime('%H:%M')
-    try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        query = "SELECT subject_id FROM timetable WHERE day_of_week = ? AND start_time <= ? AND end_time >= ?"
-        cursor.execute(query, (current_day, current_time, current_time))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else None
-    except sqlite3.Error as e:
-        print(f"Database error checking schedule: {e}")
-    return None
-
-print("Loading known faces...")
-known_face_encodings = []
-known_face_names = []
-logged_names_today = {}
-
-for filename in os.listdir(KNOWN_FACES_DIR):
+    # Called on every processed frame: answered from the in-memory timetable,
+    # which re-reads the database only when the timetable has changed
+    return schedule.current_subject_id()
+
+def build_matcher(gallery):
+    """Matcher over the encodings currently in an EncodingCache or RemoteGallery (also used by the gallery watcher)."""
+    known_face_encodings, known_face_names = gallery.encodings, gallery.names
+    matcher = FaceMatcher(known_face_encodings, known_face_names,
+                          index_kind=GALLERY_INDEX, index_options=GALLERY_INDEX_OPTIONS)
+    for row in matcher.outliers:
+        print(f"⚠️ Warning: {gallery.filenames[row]} doesn't look like the other photos of "
+              f"{known_face_names[row]}. Ignoring it.")
+    return matcher
+
+def load_gallery():
+    if GALLERY_API_URL:
+        return RemoteGallery(GALLERY_API_URL)
+    # Encodings are cached on disk; only new or changed photos in known_faces/ are re-encoded
+    return EncodingCache(KNOWN_FACES_DIR)
+
+def load_matcher(gallery=None):
+    print("Loading known faces...")
+    gallery = gallery or load_gallery()
+    gallery.sync()
+    matcher = build_matcher(gallery)
+    print("✅ Known faces loaded.")
+    return matcher
+
+
+def start_metrics(metrics):
+    """Starts the stats file writer, the local metrics server and the profiler trigger as configured."""
+    stats_writer = metrics_server = None
+    if STATS_PATH:
+        stats_writer = StatsWriter(metrics, STATS_PATH, interval=STATS_INTERVAL_SECONDS or 10)
+        stats_writer.start()
+
+    profiler = SamplingProfiler() if PROFILER_ENABLED else None
+    if profiler and hasattr(signal, 'SIGUSR2'):  # Not on Windows; use METRICS_PORT there
+        signal.signal(signal.SIGUSR2, lambda signum, frame: profiler.start(
+            PROFILE_SECONDS, path=f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded"))
+
+    if METRICS_PORT:
+        try:
+            metrics_server = serve_metrics(metrics, METRICS_PORT, profiler=profiler)
+            print(f"📈 Metrics at http://127.0.0.1:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"⚠️ Could not serve metrics on port {METRICS_PORT}: {e}")
+    return stats_writer, metrics_server
+
+
+def run_sequential(video_capture, pipeline, uploader, timer, show_window=True):
+    """Single-threaded loop: every stage runs in turn on the main thread."""
+
+    while True:
+        with timer.stage('schedule'):
+            current_subject_id = get_current_subject()
+        with timer.stage('capture'):
+            ret, frame = video_capture.read()
+        if not ret: break
+
+        # Detection, tracking, encoding and matching; known faces keep their name between detections
+        tracks = pipeline.process(frame)
+
+        if current_subject_id is not None:
+            for track in tracks:
+                # Once per confirmed track and class; written to the local outbox, so the
+                # video loop never waits on the network (the outbox also skips anyone already logged today)
+                if track.confirmed and track.logged_subject != current_subject_id:
+                    track.logged_subject = current_subject_id
+                    uploader.submit(track.name, current_subject_id)
+
+        timer.frame_done()
+        if not show_window:
+            continue
+
+        with timer.stage('display'):
+            draw_overlay(frame, [(track.box, track.name) for track in tracks], current_subject_id)
+            cv2.imshow('FaceBeam', frame)
+            key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'):
+            break
+
+    video_capture.release()
+    if show_window:
+        cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FaceBeam edge agent: recognizes faces and logs attendance.")
+    parser.add_argument('--source', nargs='+', default=FRAME_SOURCES,
+                        help="One or more camera indexes, RTSP/HTTP URLs, video files or image directories (default: %(default)s).")
+    parser.add_argument('--headless', action='store_true', default=HEADLESS,
+                        help="Run without a preview window.")
+    args = parser.parse_args()
+
+    if len(args.source) > 1 and not CONCURRENT_PIPELINE:
+        print("❌ Error: Several cameras need the concurrent pipeline (CONCURRENT_PIPELINE = True).")
+        return
     try:
-        image_path = os.path.join(KNOWN_FACES_DIR, filename)
-        pil_image = Image.open(image_path).convert("RGB")
-        image = np.array(pil_image)
-        encoding = face_recognition.face_encodings(image)[0]
-        name = os.path.splitext(filename)[0].replace('_', ' ').title()
-        known_face_encodings.append(encoding)
-        known_face_names.append(name)
-    except (IndexError, UnidentifiedImageError):
-        print(f"⚠️ Warning: Could not process {filename}. Skipping.")
-
-print("✅ Known faces loaded.")
-video_capture = cv2.VideoCapture(0)
-
-while True:
-    current_subject_id = get_current_subject()
-    ret, frame = video_capture.read()
-    if not ret: break
-
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    face_locations = face_recognition.face_locations(rgb_frame)
-    face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-
-    for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-        matches = face_recognition.compare_faces(known_face_encodings, face_encoding)
-        name = "Unknown"
-
-        face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-        if len(face_distances) > 0:
-            best_match_index = np.argmin(face_distances)
-            if matches[best_match_index]:
-                name = known_face_names[best_match_index]
-
-                if current_subject_id is not None:
-                    if logged_names_today.get(current_subject_id) is None:
-                        logged_names_today[current_subject_id] = []
-
-                    if name not in logged_names_today[current_subject_id]:
-                        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        
-                        # --- MODIFIED: Edge-to-Cloud API Request ---
-                        # 1. Package the data into a JSON dictionary
-                        payload = {
-                            "name": name,
-                            "timestamp": timestamp,
-                            "subject_id": current_subject_id
-                        }
-                        
-                        # 2. Send the data to the Flask server via HTTP POST
-                        try:
-                            response = requests.post(CLOUD_API_URL, json=payload, timeout=5)
-                            
-                            if response.status_code == 200:
-                                logged_names_today[current_subject_id].append(name)
-                                print(f"📡 Sent to Cloud API: '{name}' for Subject ID {current_subject_id}")
-                            else:
-                                print(f"⚠️ Failed to send to cloud. Server responded: {response.status_code} - {response.text}")
-                                
-                        except requests.exceptions.RequestException as e:
-                            print(f"🚨 Network Error: Could not reach the cloud server. Make sure app.py is running. {e}")
-
-
-        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-        cv2.rectangle(frame, (left, bottom - 35), (right, bottom), (0, 255, 0), cv2.FILLED)
-        font = cv2.FONT_HERSHEY_DUPLEX
-        cv2.putText(frame, name, (left + 6, bottom - 6), font, 1.0, (255, 255, 255), 1)
-
-    display_text = "No Scheduled Class"
-    if current_subject_id:
-        display_text = f"Class In Session (Subject ID: {current_subject_id})"
-    
-    cv2.putText(frame, display_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-    cv2.imshow('FaceBeam', frame)
-
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-video_capture.release()
-cv2.destroyAllWindows()
-print("👋 Program terminated.")
\ No newline at end of file
+        video_captures = [open_frame_source(source) for source in args.source]
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return
+
+    gallery = load_gallery()
+    matcher = load_matcher(gallery)
+    metrics = MetricsRegistry()
+    timer = StageTimer(report_every=STATS_INTERVAL_SECONDS, metrics=metrics)
+    # Attendance events are stored in a local SQLite outbox and uploaded in the background,
+    # so they survive network outages and restarts
+    uploader = OutboxSender(CLOUD_API_URL, batch_url=CLOUD_BATCH_API_URL, timer=timer)
+    uploader.start()
+    metrics.gauge_callback('edge_outbox_pending', "Attendance events waiting to be uploaded.", uploader.outbox.pending_count)
+    stats_writer, metrics_server = start_metrics(metrics)
+
+    if CONCURRENT_PIPELINE:
+        settings = dict(PIPELINE_PRESETS[PIPELINE_MODE], **PIPELINE_OVERRIDES)
+        pipeline = EdgePipeline(video_captures, matcher, uploader, get_current_subject,
+                                detection_scale=settings['detection_scale'],
+                                upsample=settings.get('upsample', 1),
+                                workers=DETECTION_WORKERS, timer=timer,
+                                drop_frames=[is_live_source(source) for source in args.source],
+                                motion_gate=settings.get('motion_gate', False))
+    else:
+        pipeline = DetectionPipeline.from_preset(matcher, PIPELINE_MODE, timer=timer, **PIPELINE_OVERRIDES)
+
+    # New registrations and deletions are picked up while running; the matcher is swapped between frames
+    watcher = None
+    if GALLERY_RELOAD_SECONDS:
+        watcher = GalleryWatcher(gallery, build_matcher, pipeline.set_matcher,
+                                 interval=GALLERY_RELOAD_SECONDS)
+        watcher.start()
+
+    if CONCURRENT_PIPELINE:
+        pipeline.run(show_window=not args.headless)
+    else:
+        run_sequential(video_captures[0], pipeline, uploader, timer, show_window=not args.headless)
+
+    if watcher:
+        watcher.close()
+    if stats_writer:
+        stats_writer.close()  # While the outbox is still open, so its pending count makes it into the file
+    if metrics_server:
+        metrics_server.shutdown()
+    uploader.close()
+    print("👋 Program terminated.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import requests
+
+from encoding_cache import ENCODING_SIZE
+from face_registry import unpack_gallery
+
+REMOTE_GALLERY_FILE = 'gallery_cache.npz'
+REQUEST_TIMEOUT_SECONDS = 10
+
+
+class RemoteGallery:
+    """
+    Edge-side copy of the server's encoding registry, kept in step through /api/gallery.
+
+    The first sync downloads every encoding; later ones send the local version and
+    apply just the rows and deletions made since (or get a 304 when nothing changed).
+    The copy is saved to disk, so the agent starts, and keeps recognizing, while the
+    server is unreachable. No photos are downloaded and nothing is encoded locally.
+    Offers the same gallery interface as EncodingCache (sync, filenames, names, encodings).
+    """
+
+    def __init__(self, url, cache_path=REMOTE_GALLERY_FILE, dtype='float16', timeout=REQUEST_TIMEOUT_SECONDS):
+        self.url = url
+        self.cache_path = cache_path
+        self.dtype = dtype
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.version = None
+        self.etag = None
+        self._rows = {}  # filename -> (name, float32 encoding)
+        self.load()
+
+    # --- Persistence ---
+    def load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with np.load(self.cache_path) as saved:
+                filenames, names, matrix = list(saved['filenames']), list(saved['names']), saved['matrix']
+                self.version = int(saved['version'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Warning: Saved gallery unreadable ({e}). Downloading it again.")
+            return
+        self._rows = {str(f): (str(n), row) for f, n, row in zip(filenames, names, matrix)}
+
+    def save(self):
+        filenames = self.filenames
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, version=self.version, filenames=np.array(filenames, dtype=str),
+                     names=np.array(self.names, dtype=str), matrix=self.encodings)
+        os.replace(tmp_path, self.cache_path)
+
+    # --- Sync ---
+    def refresh(self):
+        """Fetches changes from the server. Returns True if the gallery changed."""
+        params = {'dtype': self.dtype}
+        headers = {}
+        if self.version is not None:
+            params['since'] = self.version
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+        try:
+            response = self.session.get(self.url, params=params, headers=headers, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"🚨 Network Error: Could not fetch the gallery, keeping the current one. {e}")
+            return False
+        if response.status_code == 304:
+            return False
+        if response.status_code != 200:
+            print(f"⚠️ Gallery download failed. Server responded: {response.status_code} - {response.text[:200]}")
+            return False
+
+        header, matrix = unpack_gallery(response.content)
+        if header['since'] is None:
+            self._rows = {}
+        for filename in header['removed']:
+            self._rows.pop(filename, None)
+        for filename, name, row in zip(header['filenames'], header['names'], matrix):
+            self._rows[filename] = (name, row)
+        self.version, self.etag = header['version'], response.headers.get('ETag')
+        self.save()
+        return True
+
+    def sync(self, encode=None):
+        """Brings the gallery up to date and returns (encodings, names), like EncodingCache.sync()."""
+        self.refresh()
+        print(f"♻️ Gallery version {self.version}: {len(self._rows)} encodings from {self.url}.")
+        return self.encodings, self.names
+
+    # --- Gallery access ---
+    @property
+    def filenames(self):
+        return sorted(self._rows)
+
+    @property
+    def names(self):
+        return [self._rows[f][0] for f in self.filenames]
+
+    @property
+    def encodings(self):
+        if not self._rows:
+            return np.empty((0, ENCODING_SIZE), dtype=np.float32)
+        return np.stack([self._rows[f][1] for f in self.filenames])
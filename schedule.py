@@ -0,0 +1,129 @@
+import sqlite3
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+
+from db import get_connection
+
+# How often a Schedule asks the database whether the timetable has changed.
+# Between checks a lookup is a bisect over that weekday's slots and touches no I/O.
+CHECK_INTERVAL_SECONDS = 30
+
+# schedule_version is bumped by triggers whenever timetable or subjects change
+# (created by migration 6), so a reload check reads one row instead of the timetable.
+VERSION_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS schedule_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )""",
+    "INSERT OR IGNORE INTO schedule_version (id, version) VALUES (1, 0)",
+) + tuple(
+    f"""CREATE TRIGGER IF NOT EXISTS trg_schedule_version_{table}_{action.lower()} AFTER {action} ON {table}
+    BEGIN
+        UPDATE schedule_version SET version = version + 1 WHERE id = 1;
+    END"""
+    for table in ('timetable', 'subjects') for action in ('INSERT', 'UPDATE', 'DELETE')
+)
+
+
+def create_version_tracking(conn):
+    for statement in VERSION_SCHEMA:
+        conn.execute(statement)
+
+
+class DaySlots:
+    """One weekday's classes sorted by start time, for bisect lookups."""
+
+    def __init__(self, slots):
+        self.slots = sorted(slots, key=lambda slot: slot['start_time'])
+        self.starts = [slot['start_time'] for slot in self.slots]
+        # Latest end time among slots[:i + 1], so the search can stop as soon as no earlier slot can still be running
+        self.max_ends = []
+        for slot in self.slots:
+            self.max_ends.append(max(slot['end_time'], self.max_ends[-1]) if self.max_ends else slot['end_time'])
+
+    def at(self, hhmm):
+        # Same rule and tie-break as the old indexed SQL: start_time <= t <= end_time,
+        # and where back-to-back classes share a boundary minute the earlier one wins
+        index = bisect_right(self.starts, hhmm) - 1
+        found = None
+        while index >= 0 and self.max_ends[index] >= hhmm:
+            if self.slots[index]['end_time'] >= hhmm:
+                found = self.slots[index]
+            index -= 1
+        return found
+
+
+class Schedule:
+    """
+    The timetable held in memory as per-weekday sorted slots. Answers "which class
+    is live at time t" without touching the database, and reloads itself when the
+    schedule_version counter moves (checked at most every `check_interval` seconds).
+    Safe to share between threads.
+    """
+
+    def __init__(self, db_path, check_interval=CHECK_INTERVAL_SECONDS):
+        self.db_path = db_path
+        self.check_interval = check_interval
+        self.days = {}
+        self.version = None
+        self.next_check = 0.0
+        self.reload_lock = threading.Lock()
+
+    def _read_version(self, conn):
+        try:
+            return conn.execute("SELECT version FROM schedule_version WHERE id = 1").fetchone()[0]
+        except (sqlite3.OperationalError, TypeError):
+            return None  # Not migrated yet: fall back to reloading on every check
+
+    def reload(self):
+        conn = get_connection(self.db_path)
+        version = self._read_version(conn)
+        rows = conn.execute("""
+            SELECT t.day_of_week, t.start_time, t.end_time, t.subject_id, s.name as subject_name
+            FROM timetable t JOIN subjects s ON t.subject_id = s.id
+        """).fetchall()
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row['day_of_week'], []).append({
+                'subject_name': row['subject_name'],
+                'start_time': row['start_time'],
+                'end_time': row['end_time'],
+                'subject_id': row['subject_id'],
+            })
+        # Swapped in one assignment, so concurrent lookups see the old or the new timetable, never a mix
+        self.days = {day: DaySlots(slots) for day, slots in by_day.items()}
+        self.version = version
+
+    def _check(self):
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        # Only the first load makes other threads wait; later checks are skipped while one is running
+        if not self.reload_lock.acquire(blocking=self.next_check == 0.0):
+            return
+        try:
+            if now >= self.next_check:
+                # Set first so a failing database is retried after the interval, not on every lookup
+                self.next_check = now + self.check_interval
+                version = self._read_version(get_connection(self.db_path))
+                if version is None or version != self.version:
+                    self.reload()
+        finally:
+            self.reload_lock.release()
+
+    def current_class(self, when=None):
+        """The slot in session at `when` (default now) as a dict, or None."""
+        try:
+            self._check()
+        except sqlite3.Error as e:
+            # Keep answering from the last timetable that loaded
+            print(f"Database error checking schedule: {e}")
+        when = when or datetime.now()
+        day = self.days.get(when.weekday())
+        return day.at(when.strftime('%H:%M')) if day else None
+
+    def current_subject_id(self, when=None):
+        slot = self.current_class(when)
+        return slot['subject_id'] if slot else None
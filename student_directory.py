@@ -0,0 +1,155 @@
+import base64
+import binascii
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from db import get_connection
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Rendered pages kept in memory. Search-as-you-type asks for a new prefix on every
+# keystroke, so the cache is bounded and drops the least recently used page first.
+MAX_CACHED_PAGES = 512
+FILTER_COLUMNS = ('branch', 'section', 'year')
+
+# student_version is bumped by triggers whenever students change (created by migration 9),
+# so a cached page is checked against one row instead of the table. The NOCASE indexes
+# let SQLite answer `LIKE 'prefix%'` with an index range instead of a table scan; the
+# matches still need sorting by name, since they come from three indexes.
+STUDENT_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS student_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )""",
+    "INSERT OR IGNORE INTO student_version (id, version) VALUES (1, 0)",
+    "CREATE INDEX IF NOT EXISTS idx_students_name_nocase ON students (name COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_students_roll_number ON students (roll_number COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_students_college_id ON students (college_id COLLATE NOCASE)",
+    "CREATE INDEX IF NOT EXISTS idx_students_class ON students (branch, section, year, name)",
+) + tuple(
+    f"""CREATE TRIGGER IF NOT EXISTS trg_student_version_{action.lower()} AFTER {action} ON students
+    BEGIN
+        UPDATE student_version SET version = version + 1 WHERE id = 1;
+    END"""
+    for action in ('INSERT', 'UPDATE', 'DELETE')
+)
+
+
+def create_student_indexes(conn):
+    for statement in STUDENT_SCHEMA:
+        conn.execute(statement)
+
+
+def encode_cursor(name):
+    return base64.urlsafe_b64encode(name.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """The last name of the previous page. Raises ValueError for a cursor this module didn't make."""
+    try:
+        return base64.b64decode(cursor + '=' * (-len(cursor) % 4), altchars=b'-_', validate=True).decode('utf-8')
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+
+def _like_prefix(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def build_query(search=None, filters=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """SQL and parameters for one page of students in name order, fetching one extra row to tell if there is a next page."""
+    where, params = [], []
+    filters = {column: value for column, value in (filters or {}).items() if column in FILTER_COLUMNS and value}
+    # One whole class is walked in name order on idx_students_class, testing the prefix
+    # on each row. Otherwise a search reads the prefix indexes and sorts only the matches.
+    whole_class = len(filters) == len(FILTER_COLUMNS)
+    if search:
+        pattern = _like_prefix(search)
+        plus = '+' if whole_class else ''  # The unary + stops SQLite using an index for that term
+        where.append(f"({plus}name LIKE ? ESCAPE '\\' OR {plus}roll_number LIKE ? ESCAPE '\\' "
+                     f"OR {plus}college_id LIKE ? ESCAPE '\\')")
+        params += [pattern] * 3
+    for column in FILTER_COLUMNS:
+        if column in filters:
+            where.append(f"{column} = ?")
+            params.append(filters[column])
+    if after is not None:
+        # With a search across all students, the unary + keeps the planner on the prefix
+        # indexes instead of walking the name index from the cursor and testing every row after it
+        where.append("+name > ?" if search and not whole_class else "name > ?")
+        params.append(after)
+
+    sql = "SELECT name, roll_number, branch, section, year, college_id FROM students"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY name LIMIT ?"
+    params.append(limit + 1)
+    return sql, params
+
+
+class StudentDirectory:
+    """
+    Paginated, searchable student list for /api/students. Each page is rendered to
+    JSON once and kept in memory together with its ETag until the student_version
+    counter moves, which any insert, update or delete on students does. Serving a
+    cached page costs one single-row read. Safe to share between threads.
+    """
+
+    def __init__(self, db_path, max_pages=MAX_CACHED_PAGES):
+        self.db_path = db_path
+        self.max_pages = max_pages
+        self.pages = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _read_version(self, conn):
+        try:
+            return conn.execute("SELECT version FROM student_version WHERE id = 1").fetchone()[0]
+        except (sqlite3.OperationalError, TypeError):
+            return None  # Not migrated yet: nothing is cached
+
+    def _render(self, conn, search, filters, after, limit, version):
+        sql, params = build_query(search, filters, after, limit)
+        rows = conn.execute(sql, params).fetchall()
+        students = [dict(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(students[-1]['name']) if len(rows) > limit else None
+        body = json.dumps({'students': students, 'next_cursor': next_cursor, 'version': version})
+        return body, f'"students-{hashlib.sha1(body.encode("utf-8")).hexdigest()[:20]}"'
+
+    def page(self, search=None, filters=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Returns (json_body, etag) for one page of students in name order. `search`
+        matches the start of a name, roll number or college ID, ignoring ASCII case;
+        `filters` holds exact branch/section/year values. Raises ValueError for a bad cursor.
+        """
+        search = (search or '').strip()
+        filters = {column: (filters or {}).get(column) or None for column in FILTER_COLUMNS}
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        after = decode_cursor(cursor) if cursor else None
+        key = (search, tuple(filters.values()), after, limit)
+
+        conn = get_connection(self.db_path)
+        version = self._read_version(conn)
+        with self.lock:
+            if version is None or version != self.version:
+                self.pages.clear()
+                self.version = version
+            cached = self.pages.get(key)
+            if cached is not None:
+                self.pages.move_to_end(key)
+                self.hits += 1
+                return cached
+
+        rendered = self._render(conn, search, filters, after, limit, version)
+        with self.lock:
+            self.misses += 1
+            if version is not None and version == self.version:
+                self.pages[key] = rendered
+                if len(self.pages) > self.max_pages:
+                    self.pages.popitem(last=False)
+        return rendered
@@ -0,0 +1,150 @@
+import itertools
+from collections import Counter
+
+from face_matcher import UNKNOWN_NAME
+
+# A detection continues a track when their boxes overlap at least this much
+TRACK_IOU = 0.3
+# Detections a track may miss (detector flicker, a hand in front of the face) before it is dropped
+MAX_MISSED = 2
+# Matches that must agree before a track's identity is trusted...
+VOTES_TO_CONFIRM = 3
+# ...and the share of all its votes they must make up
+CONFIRM_SHARE = 0.6
+# A confirmed track is re-encoded once every this many detections, in case two
+# students swapped seats between boxes; a different confident match resets its votes
+REVERIFY_EVERY = 30
+
+
+def boxes_overlap(a, b):
+    return max(a[0], b[0]) < min(a[2], b[2]) and max(a[3], b[3]) < min(a[1], b[1])
+
+
+def box_iou(a, b):
+    """Intersection-over-union of two (top, right, bottom, left) boxes."""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    if inter == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+class FaceTrack:
+    """A face followed across frames, with the match votes it has collected so far."""
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box               # (top, right, bottom, left) in full-frame pixels
+        self.votes = Counter()       # name -> matches
+        self.name = UNKNOWN_NAME     # Only set once the votes confirm an identity
+        self.distance = None         # Distance of the latest match
+        self.confirmed = False
+        self.missed = 0              # Consecutive detections without this face
+        self.since_encode = 0        # Detections since it was last encoded
+        self.logged_subject = None   # Subject it was last reported for, so it's reported once per class
+        self.template = None         # Used by the template tracker in detection_pipeline.py
+        self.lost = False
+
+    def reset(self):
+        self.votes.clear()
+        self.name, self.confirmed = UNKNOWN_NAME, False
+        self.logged_subject = None
+
+
+class TrackManager:
+    """
+    Gives faces stable IDs across detections (greedy IoU association) and turns
+    per-frame matches into one identity per track by voting. Once a track is
+    confirmed it no longer needs encoding or matching, apart from an occasional
+    re-check, so a class sitting still for fifty minutes costs detection only.
+    """
+
+    def __init__(self, iou_threshold=TRACK_IOU, max_missed=MAX_MISSED,
+                 votes_to_confirm=VOTES_TO_CONFIRM, reverify_every=REVERIFY_EVERY):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.votes_to_confirm = votes_to_confirm
+        self.reverify_every = reverify_every
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    @property
+    def visible(self):
+        """Tracks seen in the latest detection."""
+        return [track for track in self.tracks if track.missed == 0]
+
+    @property
+    def settled(self):
+        """True when every visible face has a confirmed identity, so nothing needs detecting until something moves."""
+        return all(track.confirmed for track in self.visible)
+
+    def update(self, boxes, regions=None):
+        """
+        Associates a detection's boxes with tracks. Returns the track for each box, in order.
+        With `regions` (the only areas that were searched, see motion_gate.py), tracks
+        outside all of them were not looked for and stay as they are.
+        """
+        pairs = sorted(
+            ((box_iou(box, track.box), b, t) for b, box in enumerate(boxes) for t, track in enumerate(self.tracks)),
+            reverse=True
+        )
+        assigned, used = [None] * len(boxes), set()
+        for iou, b, t in pairs:
+            if iou < self.iou_threshold:
+                break
+            if assigned[b] is None and t not in used:
+                assigned[b] = self.tracks[t]
+                used.add(t)
+
+        for t, track in enumerate(self.tracks):
+            if t in used or (regions is not None and track.missed == 0
+                             and not any(boxes_overlap(track.box, region) for region in regions)):
+                continue
+            track.missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        for b, box in enumerate(boxes):
+            track = assigned[b]
+            if track is None:
+                track = assigned[b] = FaceTrack(next(self._ids), box)
+                self.tracks.append(track)
+            track.box, track.missed, track.lost = box, 0, False
+            track.since_encode += 1
+        return assigned
+
+    def needs_encoding(self, track):
+        return not track.confirmed or track.since_encode >= self.reverify_every
+
+    def skip_boxes(self):
+        """Boxes of visible tracks that won't need encoding at the next detection."""
+        return [track.box for track in self.visible
+                if track.confirmed and track.since_encode + 1 < self.reverify_every]
+
+    def record(self, track, name, distance):
+        """Adds one match result to a track's votes and confirms its identity once they agree."""
+        track.since_encode = 0
+        track.distance = distance
+        if track.confirmed:
+            # A bad angle shouldn't unseat a confirmed identity, but a confident different match should
+            if name == track.name or name == UNKNOWN_NAME:
+                return
+            track.reset()
+
+        track.votes[name] += 1
+        leader, count = track.votes.most_common(1)[0]
+        if (leader != UNKNOWN_NAME and count >= self.votes_to_confirm
+                and count >= CONFIRM_SHARE * sum(track.votes.values())):
+            track.name, track.confirmed = leader, True
+
+    def gallery_changed(self, removed_names):
+        """
+        Called when the matcher is swapped for one built from a changed gallery: tracks
+        confirmed as a removed student, and unconfirmed tracks (whose Unknown votes may
+        belong to a newly added one), start voting afresh.
+        """
+        for track in self.tracks:
+            if not track.confirmed or track.name in removed_names:
+                track.reset()